@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+Provides helpers that are shared by the benchmarks.
+"""
+from typing import Any, Callable, Dict, Iterator
+import contextlib
+import os
+import random
+import tempfile
+import time
+
+from loguru import logger
+
+from specminers.daikon import Declarations, ProgramPoint, TraceWriter
+
+DIR_HERE = os.path.dirname(__file__)
+DIR_EXAMPLES = os.path.join(DIR_HERE, '..', 'test', 'examples')
+FN_DECLS = os.path.join(DIR_EXAMPLES, 'ardu.decls')
+FN_TRACE = os.path.join(DIR_EXAMPLES, 'ardu.dtrace')
+FN_INVARIANTS = os.path.join(DIR_EXAMPLES, 'ardu.inv')
+
+_DEC_TYPE_TO_GENERATOR: Dict[str, Callable[[random.Random], Any]] = {
+    'float': lambda r: r.uniform(-200.0, 200.0),
+    'int': lambda r: r.randint(0, 360),
+    'boolean': lambda r: r.random() < 0.5,
+    'java.lang.String': lambda r: r.choice(['AUTO', 'GUIDED', 'LAND'])
+}
+
+# the parser is chatty at lower levels
+logger.remove()
+
+
+def load_declarations() -> Declarations:
+    return Declarations.load(FN_DECLS)
+
+
+def random_values(ppt: ProgramPoint, rng: random.Random) -> Dict[str, Any]:
+    """Generates a random set of values for the variables in a program
+    point."""
+    return {name: _DEC_TYPE_TO_GENERATOR[var.dec_type](rng)
+            for name, var in ppt.items()}
+
+
+def write_trace(declarations: Declarations,
+                filename: str,
+                num_records: int,
+                seed: int = 0
+                ) -> None:
+    """Writes a trace with a given number of records to a file.
+
+    If the example trace, :code:`ardu.dtrace`, is available, its records are
+    replicated until the desired number of records is reached. Otherwise,
+    the trace is synthesized from random values for the example declarations.
+    """
+    if os.path.exists(FN_TRACE):
+        with open(FN_TRACE, 'r') as fh:
+            records = fh.read().split('\n\n')
+        with open(filename, 'w') as fh:
+            for i in range(num_records):
+                fh.write('\n')
+                fh.write(records[i % len(records)].strip('\n'))
+                fh.write('\n')
+        return
+
+    rng = random.Random(seed)
+    ppts = list(declarations.values())
+    with TraceWriter.for_file(declarations, filename) as writer:
+        for _ in range(num_records):
+            ppt = rng.choice(ppts)
+            writer.write(ppt, **random_values(ppt, rng))
+
+
+@contextlib.contextmanager
+def temporary_trace(declarations: Declarations,
+                    num_records: int,
+                    suffix: str = '.dtrace'
+                    ) -> Iterator[str]:
+    """Provides a temporary trace file with a given number of records."""
+    with tempfile.TemporaryDirectory() as dir_tmp:
+        filename = os.path.join(dir_tmp, f'trace{suffix}')
+        write_trace(declarations, filename, num_records)
+        yield filename
+
+
+def write_declarations(filename: str, num_variables: int) -> None:
+    """Writes a declarations file that contains at least a given number of
+    variables by replicating the program points of the example declarations
+    under distinct names."""
+    with open(FN_DECLS, 'r') as fh:
+        header, *blocks = fh.read().rstrip('\n').split('\n\nppt ')
+    with open(filename, 'w') as fh:
+        fh.write(header)
+        written = 0
+        copy = 0
+        while written < num_variables:
+            for block in blocks:
+                name, rest = block.split('\n', 1)
+                fh.write(f'\n\nppt {name}#{copy}\n{rest}')
+                written += rest.count('\nvariable ') \
+                    + rest.startswith('variable ')
+            copy += 1
+        fh.write('\n')
+
+
+@contextlib.contextmanager
+def temporary_declarations(num_variables: int) -> Iterator[str]:
+    """Provides a temporary declarations file with at least a given number of
+    variables."""
+    with tempfile.TemporaryDirectory() as dir_tmp:
+        filename = os.path.join(dir_tmp, 'program.decls')
+        write_declarations(filename, num_variables)
+        yield filename
+
+
+def timed(func: Callable[[], Any], repeat: int = 3) -> float:
+    """Returns the best wall-clock time, in seconds, taken to call a function
+    across a number of repetitions."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
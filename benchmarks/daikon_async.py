@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compares the time taken to execute a number of mining jobs one after another
+with the time taken to execute them concurrently via the asyncio interface.
+
+Requires either a local installation of Daikon or Docker and the Daikon image
+(see Daikon.install).
+
+Usage: python benchmarks/daikon_async.py [num_jobs] [max_concurrency]
+"""
+import asyncio
+import sys
+import time
+
+from specminers import AsyncDaikon, Daikon
+
+from common import FN_DECLS
+
+
+async def run_concurrently(daikon: AsyncDaikon, num_jobs: int) -> None:
+    async with daikon:
+        await asyncio.gather(*[daikon(FN_DECLS) for _ in range(num_jobs)])
+
+
+def main(num_jobs: int, max_concurrency: int) -> None:
+    daikon = Daikon(backend='auto')
+    print(f'backend: {daikon.selected_backend}, {num_jobs} jobs')
+
+    start = time.perf_counter()
+    for _ in range(num_jobs):
+        daikon(FN_DECLS)
+    sequential = time.perf_counter() - start
+    print(f'{"sequential":<24} {sequential:8.3f} s')
+
+    start = time.perf_counter()
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(
+            run_concurrently(AsyncDaikon(daikon, max_concurrency), num_jobs))
+    finally:
+        loop.close()
+    duration = time.perf_counter() - start
+    print(f'{f"async ({max_concurrency})":<24} {duration:8.3f} s '
+          f'{sequential / duration:6.2f}x')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 8,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 4)
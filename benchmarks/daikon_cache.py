@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compares the time taken to mine a trace without a result cache, with a cold
+cache, and with a warm cache.
+
+Requires either a local installation of Daikon or Docker and the Daikon image
+(see Daikon.install).
+
+Usage: python benchmarks/daikon_cache.py [num_records]
+"""
+import sys
+import tempfile
+import time
+
+from specminers import Daikon
+from specminers.cache import DiskCache
+
+from common import FN_DECLS, load_declarations, temporary_trace, timed
+
+
+def main(num_records: int) -> None:
+    declarations = load_declarations()
+    with temporary_trace(declarations, num_records) as trace_filename, \
+            tempfile.TemporaryDirectory() as dir_cache:
+        cache = DiskCache(dir_cache)
+        uncached = Daikon(backend='auto')
+        cached = Daikon(backend='auto', cache=cache)
+        print(f'backend: {uncached.selected_backend}')
+
+        start = time.perf_counter()
+        uncached(FN_DECLS, trace_filename)
+        duration_uncached = time.perf_counter() - start
+        start = time.perf_counter()
+        cached(FN_DECLS, trace_filename)
+        duration_cold = time.perf_counter() - start
+        duration_warm = timed(lambda: cached(FN_DECLS, trace_filename))
+        for name, duration in [('uncached', duration_uncached),
+                               ('cold cache', duration_cold),
+                               ('warm cache', duration_warm)]:
+            print(f'{name:<24} {duration:8.3f} s')
+        print(f'hits: {cache.hits}, misses: {cache.misses}, '
+              f'size: {cache.size} bytes')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Measures the time taken to partition a trace into shards, and the time taken
+to mine it as a whole and in parallel with an increasing number of workers.
+
+Requires either a local installation of Daikon or Docker and the Daikon image
+(see Daikon.install).
+
+Usage: python benchmarks/daikon_parallel.py [num_records] [max_workers]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from specminers import Daikon
+from specminers.daikon import InvariantMap
+from specminers.daikon.sharding import write_shards
+
+from common import FN_DECLS, load_declarations, temporary_trace, timed
+
+
+def main(num_records: int, max_workers: int) -> None:
+    declarations = load_declarations()
+    daikon = Daikon(backend='auto')
+    print(f'backend: {daikon.selected_backend}')
+    with temporary_trace(declarations, num_records) as trace_filename:
+        def shard() -> None:
+            with tempfile.TemporaryDirectory() as directory:
+                write_shards(declarations, FN_DECLS, [trace_filename],
+                             max_workers, directory)
+        duration = timed(shard)
+        print(f'{"shard":<24} {duration:8.3f} s')
+
+        start = time.perf_counter()
+        InvariantMap.from_stream(declarations,
+                                 daikon.invariants(declarations, FN_DECLS,
+                                                   trace_filename))
+        serial = time.perf_counter() - start
+        print(f'{"serial":<24} {serial:8.3f} s')
+
+        workers = 1
+        while workers <= max_workers:
+            start = time.perf_counter()
+            daikon.mine_parallel(FN_DECLS, trace_filename, workers=workers)
+            duration = time.perf_counter() - start
+            print(f'{f"parallel ({workers})":<24} {duration:8.3f} s '
+                  f'{serial / duration:6.2f}x')
+            workers *= 2
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else (os.cpu_count() or 1))
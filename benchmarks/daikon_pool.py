@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Measures the throughput of many small mining jobs when each job is given a
+fresh container and when containers are taken from a warm pool.
+
+Requires Docker and the Daikon image (see Daikon.install).
+
+Usage: python benchmarks/daikon_pool.py [num_jobs] [num_records]
+"""
+import sys
+import time
+
+import dockerblade
+
+from specminers import ContainerPool, Daikon
+
+from common import FN_DECLS, load_declarations, temporary_trace
+
+
+def main(num_jobs: int, num_records: int) -> None:
+    declarations = load_declarations()
+    with dockerblade.DockerDaemon() as daemon, \
+            temporary_trace(declarations, num_records) as trace_filename:
+        for pooled in (False, True):
+            with ContainerPool(daemon, Daikon.IMAGE) as pool:
+                daikon = Daikon(client=daemon,
+                                pool=pool if pooled else None)
+                if pooled:
+                    pool.warm()
+                start = time.perf_counter()
+                for _ in range(num_jobs):
+                    daikon(FN_DECLS, trace_filename)
+                duration = time.perf_counter() - start
+            mode = 'pool' if pooled else 'fresh'
+            print(f'{mode:<24} {duration:8.3f} s '
+                  f'{num_jobs / duration:8.2f} jobs/s')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 100)
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compares the time taken to generate and mine a trace by first writing it to
+a file with the time taken to stream it to Daikon via a trace session, in
+which generating the trace overlaps with mining it.
+
+Requires either a local installation of Daikon or Docker and the Daikon image
+(see Daikon.install).
+
+Usage: python benchmarks/daikon_session.py [num_records]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+from specminers import Daikon
+from specminers.daikon import InvariantMap, TraceWriter
+
+from common import FN_DECLS, load_declarations, random_values
+
+
+def main(num_records: int) -> None:
+    declarations = load_declarations()
+    ppts = list(declarations.values())
+    daikon = Daikon(backend='auto')
+    print(f'backend: {daikon.selected_backend}')
+
+    def generate(writer: TraceWriter) -> None:
+        rng = random.Random(0)
+        for _ in range(num_records):
+            ppt = rng.choice(ppts)
+            writer.write(ppt, **random_values(ppt, rng))
+
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory() as directory:
+        trace_filename = os.path.join(directory, 'trace.dtrace')
+        with TraceWriter.for_file(declarations, trace_filename) as writer:
+            generate(writer)
+        file_based = InvariantMap.from_stream(
+            declarations,
+            daikon.invariants(declarations, FN_DECLS, trace_filename))
+    duration_file = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with daikon.session(declarations) as session:
+        generate(session.writer)
+    duration_session = time.perf_counter() - start
+
+    assert session.invariants.size == file_based.size
+    print(f'{num_records} records, {file_based.size} invariants')
+    print(f'{"file":<24} {duration_file:8.3f} s')
+    print(f'{"session":<24} {duration_session:8.3f} s '
+          f'{duration_file / duration_session:6.2f}x')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Measures the latency of a mining job when the text invariants are printed
+by a separate invocation of PrintInvariants, and when they are printed by
+Daikon itself, in a single JVM.
+
+Requires either a local installation of Daikon or Docker and the Daikon image
+(see Daikon.install).
+
+Usage: python benchmarks/daikon_single_jvm.py [num_records] [num_jobs]
+"""
+import statistics
+import sys
+import time
+
+from specminers import Daikon
+
+from common import FN_DECLS, load_declarations, temporary_trace
+
+
+def main(num_records: int, num_jobs: int) -> None:
+    declarations = load_declarations()
+    with temporary_trace(declarations, num_records) as trace_filename:
+        for name, single_jvm in [('print-invariants', False),
+                                 ('single-jvm', True)]:
+            daikon = Daikon(backend='auto', single_jvm=single_jvm)
+            durations = []
+            for _ in range(num_jobs):
+                start = time.perf_counter()
+                daikon(FN_DECLS, trace_filename)
+                durations.append(time.perf_counter() - start)
+            print(f'{name:<24} median {statistics.median(durations):8.3f} s '
+                  f'min {min(durations):8.3f} s')
+        print(f'backend: {daikon.selected_backend}, {num_jobs} jobs, '
+              f'{num_records} records')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 5)
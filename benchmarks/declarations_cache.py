@@ -0,0 +1,35 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compares the time taken to load a declarations file with a cold and a warm
+declarations cache.
+
+Usage: python benchmarks/declarations_cache.py [num_variables]
+"""
+import sys
+import tempfile
+
+from specminers.cache import DiskCache
+from specminers.daikon import Declarations
+
+from common import temporary_declarations, timed
+
+
+def main(num_variables: int) -> None:
+    with temporary_declarations(num_variables) as filename, \
+            tempfile.TemporaryDirectory() as dir_cache:
+        cache = DiskCache(dir_cache)
+        uncached = timed(lambda: Declarations.load(filename))
+        cold = timed(lambda: (cache.clear(),
+                              Declarations.load(filename, cache=cache)))
+        warm = timed(lambda: Declarations.load(filename, cache=cache))
+        num_ppts = len(Declarations.load(filename, cache=cache))
+        print(f'{num_ppts} program points, {num_variables} variables')
+        for name, duration in [('uncached', uncached),
+                               ('cold cache', cold),
+                               ('warm cache', warm)]:
+            print(f'{name:<24} {duration:8.3f} s')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
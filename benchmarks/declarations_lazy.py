@@ -0,0 +1,31 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compares the time taken to load a declarations file and access a handful of
+its program points using eager and lazy declarations.
+
+Usage: python benchmarks/declarations_lazy.py [num_variables] [num_accessed]
+"""
+import sys
+
+from specminers.daikon import Declarations
+
+from common import temporary_declarations, timed
+
+
+def main(num_variables: int, num_accessed: int) -> None:
+    with temporary_declarations(num_variables) as filename:
+        names = list(Declarations.load(filename, lazy=True))[:num_accessed]
+        for lazy in (False, True):
+            def load() -> None:
+                declarations = Declarations.load(filename, lazy=lazy)
+                for name in names:
+                    declarations[name]
+            duration = timed(load)
+            mode = 'lazy' if lazy else 'eager'
+            print(f'{mode:<24} {duration:8.3f} s')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 10)
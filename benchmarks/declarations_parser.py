@@ -0,0 +1,28 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compares the time taken to parse a declarations file using DeclarationsLoader
+and the single-pass declarations parser.
+
+Usage: python benchmarks/declarations_parser.py [num_variables]
+"""
+import sys
+
+from specminers.daikon.declarations import DeclarationsLoader
+from specminers.daikon.decl_parser import parse_declarations_file
+
+from common import temporary_declarations, timed
+
+
+def main(num_variables: int) -> None:
+    with temporary_declarations(num_variables) as filename:
+        parsers = [('DeclarationsLoader', DeclarationsLoader.from_file),
+                   ('parse_declarations_file', parse_declarations_file)]
+        for name, parse in parsers:
+            duration = timed(lambda: parse(filename))
+            print(f'{name:<24} {duration:8.3f} s '
+                  f'{num_variables / duration:12,.0f} variables/s')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Measures the time taken to compile the example invariants and to check a
+trace against them.
+
+Usage: python benchmarks/invariant_checker.py [num_records]
+"""
+import sys
+import time
+
+from specminers.daikon import InvariantMap, InvariantReader
+from specminers.daikon.checker import InvariantChecker
+
+from common import FN_INVARIANTS, load_declarations, temporary_trace, timed
+
+
+def main(num_records: int) -> None:
+    declarations = load_declarations()
+    reader = InvariantReader(declarations)
+    invariants = InvariantMap.from_stream(declarations,
+                                          reader.read_file(FN_INVARIANTS))
+    start = time.perf_counter()
+    checker = InvariantChecker(declarations, invariants)
+    duration = time.perf_counter() - start
+    print(f'{"compile":<24} {duration:8.3f} s '
+          f'{invariants.size:>8} invariants '
+          f'({checker.num_skipped} skipped)')
+
+    with temporary_trace(declarations, num_records) as filename:
+        duration = timed(lambda: checker.check_files([filename]), repeat=1)
+        results = checker.check_files([filename])
+        num_violations = sum(r.num_violations for r in results.values())
+        print(f'{"check":<24} {duration:8.3f} s '
+              f'{num_records / duration:12,.0f} records/s '
+              f'{num_violations:>12,} violations')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Measures the time taken to compare two large invariant maps, built from
+several copies of the example invariants, where the new map differs from the
+old map by a small fraction of its invariants.
+
+Usage: python benchmarks/invariant_diff.py [num_copies]
+"""
+import random
+import sys
+import time
+
+from specminers.daikon import (Invariant, InvariantMap, InvariantReader,
+                               diff_invariants)
+
+from common import FN_INVARIANTS, load_declarations
+
+
+def main(num_copies: int) -> None:
+    declarations = load_declarations()
+    reader = InvariantReader(declarations)
+    original = InvariantMap.from_stream(declarations,
+                                        reader.read_file(FN_INVARIANTS))
+
+    # each copy is treated as a separate set of program points, and one in
+    # every hundred invariants is replaced in the new map
+    rng = random.Random(0)
+    old = {}
+    new = {}
+    for i in range(num_copies):
+        for name, invariants in original.items():
+            old[f'{name}#{i}'] = list(invariants)
+            new[f'{name}#{i}'] = [
+                Invariant(f'{inv.text} + 0') if rng.random() < 0.01 else inv
+                for inv in invariants]
+    size = original.size * num_copies
+
+    start = time.perf_counter()
+    num_added = num_removed = num_unchanged = 0
+    for diff in diff_invariants(old, new):
+        num_added += len(diff.added)
+        num_removed += len(diff.removed)
+        num_unchanged += len(diff.unchanged)
+    duration = time.perf_counter() - start
+    print(f'{"diff":<24} {duration:8.3f} s '
+          f'{size:>10,} invariants '
+          f'{size / duration:12,.0f} invariants/s')
+    print(f'{"":<24} {num_added:>10,} added '
+          f'{num_removed:>10,} removed '
+          f'{num_unchanged:>10,} unchanged')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 40)
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Measures the time taken to build an inverted index over several copies of
+the example invariants, and to answer queries using that index.
+
+Usage: python benchmarks/invariant_index.py [num_copies]
+"""
+import sys
+import time
+
+from specminers.daikon import (InvariantIndex, InvariantMap, InvariantReader,
+                               InvariantTable)
+
+from common import FN_INVARIANTS, load_declarations, timed
+
+QUERIES = [
+    (('latitude',), {}),
+    (('orig(altitude)',), {}),
+    (('altitude',), {'include_orig': True}),
+    (('latitude', 'longitude'), {}),
+    (('altitude', 'orig(altitude)'), {'kind': 'linear'}),
+    ((), {'kind': 'one_of'}),
+]
+
+
+def main(num_copies: int) -> None:
+    declarations = load_declarations()
+    reader = InvariantReader(declarations)
+    original = InvariantMap.from_stream(declarations,
+                                        reader.read_file(FN_INVARIANTS),
+                                        table=InvariantTable())
+
+    # each copy is treated as a separate set of program points
+    contents = {f'{name}#{i}': invariants
+                for i in range(num_copies)
+                for name, invariants in original.items()}
+    invariants = InvariantMap(contents, original.size * num_copies)
+
+    start = time.perf_counter()
+    index = InvariantIndex(invariants)
+    duration = time.perf_counter() - start
+    print(f'{"build":<24} {duration:8.3f} s '
+          f'{len(index):>10,} invariants')
+
+    for variables, options in QUERIES:
+        duration = timed(lambda: index.find(*variables, **options),
+                         repeat=10)
+        num_found = index.count(*variables, **options)
+        query = ' & '.join(list(variables) + [options.get('kind', '')])
+        query = query.strip(' &') + ('*' if options.get('include_orig')
+                                     else '')
+        print(f'{query:<40} {duration * 1000:8.3f} ms '
+              f'{num_found:>10,} invariants')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
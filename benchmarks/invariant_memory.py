@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compares the memory used to hold several copies of the example invariants,
+as if they were the results of separate mining runs, when the invariants are
+held as lists of :class:`Invariant` objects and when they are interned into
+a shared :class:`InvariantTable`.
+
+Usage: python benchmarks/invariant_memory.py [num_copies]
+"""
+import gc
+import sys
+import tracemalloc
+
+from specminers.daikon import InvariantMap, InvariantReader, InvariantTable
+
+from common import FN_INVARIANTS, load_declarations
+
+
+def main(num_copies: int) -> None:
+    declarations = load_declarations()
+    reader = InvariantReader(declarations)
+    for interned in (False, True):
+        gc.collect()
+        tracemalloc.start()
+        table = InvariantTable() if interned else None
+        maps = [InvariantMap.from_stream(declarations,
+                                         reader.read_file(FN_INVARIANTS),
+                                         table=table)
+                for _ in range(num_copies)]
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        num_invariants = sum(m.size for m in maps)
+        mode = 'interned' if interned else 'lists'
+        print(f'{mode:<24} {current / 2**20:8.1f} MiB '
+              f'(peak {peak / 2**20:8.1f} MiB) '
+              f'{num_invariants:>10,} invariants')
+        del maps
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10)
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Measures the latency of checking each record against the example invariants
+as it is written to a trace, and reports its median and 99th percentile.
+
+Usage: python benchmarks/invariant_monitor.py [num_records]
+"""
+import io
+import random
+import sys
+import time
+
+from specminers.daikon import InvariantMap, InvariantReader, TraceWriter
+from specminers.daikon.monitor import InvariantMonitor
+
+from common import FN_INVARIANTS, load_declarations, random_values
+
+
+def main(num_records: int) -> None:
+    declarations = load_declarations()
+    reader = InvariantReader(declarations)
+    invariants = InvariantMap.from_stream(declarations,
+                                          reader.read_file(FN_INVARIANTS))
+    start = time.perf_counter()
+    monitor = InvariantMonitor(declarations, invariants)
+    duration = time.perf_counter() - start
+    print(f'{"compile":<24} {duration:8.3f} s '
+          f'{invariants.size:>8} invariants '
+          f'({monitor.num_skipped_invariants} skipped)')
+
+    rng = random.Random(0)
+    ppts = list(declarations.values())
+    records = []
+    for _ in range(num_records):
+        ppt = rng.choice(ppts)
+        records.append((ppt, random_values(ppt, rng)))
+
+    latencies = []
+    observe = monitor.observe
+
+    def timed_observe(ppt, nonce, values):
+        start = time.perf_counter_ns()
+        observe(ppt, nonce, values)
+        latencies.append(time.perf_counter_ns() - start)
+
+    writer = TraceWriter(declarations, io.StringIO())
+    writer.add_observer(timed_observe)
+    for ppt, values in records:
+        writer.write(ppt, **values)
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] / 1000
+    p99 = latencies[int(len(latencies) * 0.99)] / 1000
+    print(f'{"observe":<24} {p50:8.1f} us (p50) {p99:8.1f} us (p99) '
+          f'{monitor.num_violations:>10,} violations')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
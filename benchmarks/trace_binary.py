@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compares the size and read throughput of text and binary traces.
+
+Usage: python benchmarks/trace_binary.py [num_records]
+"""
+import collections
+import os
+import sys
+import tempfile
+
+from specminers.daikon import BulkTraceFileReader
+from specminers.daikon.trace import TraceBinaryReader, text_to_binary
+
+from common import load_declarations, temporary_trace, timed
+
+
+def main(num_records: int) -> None:
+    declarations = load_declarations()
+    with temporary_trace(declarations, num_records) as filename:
+        fd, binary_filename = tempfile.mkstemp(suffix='.dtrace.bin')
+        os.close(fd)
+        try:
+            duration = timed(lambda: text_to_binary(declarations,
+                                                    filename,
+                                                    binary_filename),
+                             repeat=1)
+            print(f'{"convert":<24} {duration:8.3f} s')
+            readers = [('text', BulkTraceFileReader(declarations), filename),
+                       ('binary', TraceBinaryReader(binary_filename), None)]
+            for name, reader, argument in readers:
+                path = argument or binary_filename
+                size = os.path.getsize(path)
+                args = (argument,) if argument else ()
+                duration = timed(lambda: collections.deque(reader.read(*args),
+                                                           maxlen=0))
+                print(f'{name:<24} {duration:8.3f} s '
+                      f'{num_records / duration:12,.0f} records/s '
+                      f'{size / 1024 ** 2:10.1f} MiB')
+        finally:
+            os.remove(binary_filename)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
@@ -0,0 +1,37 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Measures how parsing a single trace file scales with the number of worker
+processes used by TraceFileReader.read_file_parallel.
+
+Usage: python benchmarks/trace_parallel.py [num_records]
+"""
+import collections
+import sys
+
+from specminers.daikon import BulkTraceFileReader, TraceFileReader
+
+from common import load_declarations, temporary_trace, timed
+
+
+def main(num_records: int) -> None:
+    declarations = load_declarations()
+    reader = TraceFileReader(declarations)
+    with temporary_trace(declarations, num_records) as filename:
+        bulk = BulkTraceFileReader(declarations)
+        baseline = timed(lambda: collections.deque(bulk.read(filename),
+                                                   maxlen=0))
+        print(f'{"serial (bulk)":<16} {baseline:8.3f} s '
+              f'{num_records / baseline:12,.0f} records/s')
+        for workers in (1, 2, 4, 8):
+            records = lambda: reader.read_file_parallel(filename,
+                                                        workers=workers,
+                                                        chunk_size=4 << 20)
+            duration = timed(lambda: collections.deque(records(), maxlen=0))
+            print(f'{f"{workers} workers":<16} {duration:8.3f} s '
+                  f'{num_records / duration:12,.0f} records/s '
+                  f'{baseline / duration:6.2f}x')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 400000)
@@ -0,0 +1,30 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compares the throughput of TraceFileReader and BulkTraceFileReader.
+
+Usage: python benchmarks/trace_reader.py [num_records]
+"""
+import collections
+import sys
+
+from specminers.daikon import BulkTraceFileReader, TraceFileReader
+
+from common import load_declarations, temporary_trace, timed
+
+
+def main(num_records: int) -> None:
+    declarations = load_declarations()
+    readers = [TraceFileReader(declarations),
+               BulkTraceFileReader(declarations)]
+    with temporary_trace(declarations, num_records) as filename:
+        for reader in readers:
+            duration = timed(lambda: collections.deque(reader.read(filename),
+                                                       maxlen=0))
+            name = reader.__class__.__name__
+            print(f'{name:<24} {duration:8.3f} s '
+                  f'{num_records / duration:12,.0f} records/s')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
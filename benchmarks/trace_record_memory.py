@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compares the memory footprint of TraceRecord and CompactTraceRecord when a
+trace file is held in memory.
+
+Usage: python benchmarks/trace_record_memory.py [num_records]
+"""
+import gc
+import sys
+import time
+import tracemalloc
+
+from specminers.daikon import BulkTraceFileReader
+
+from common import load_declarations, temporary_trace
+
+
+def main(num_records: int) -> None:
+    declarations = load_declarations()
+    reader = BulkTraceFileReader(declarations)
+    with temporary_trace(declarations, num_records) as filename:
+        for name, read in [('TraceRecord', reader.read),
+                           ('CompactTraceRecord', reader.read_compact)]:
+            gc.collect()
+            tracemalloc.start()
+            start = time.perf_counter()
+            records = list(read(filename))
+            duration = time.perf_counter() - start
+            size, _ = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f'{name:<20} {size / 2 ** 20:10.1f} MiB '
+                  f'{size / len(records):8.0f} bytes/record '
+                  f'{duration:8.3f} s to load')
+            del records
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compares the throughput of TraceWriter.write, TraceWriter.write_many, and the
+line-by-line writer that TraceWriter previously used.
+
+Usage: python benchmarks/trace_writer.py [num_records]
+"""
+from typing import Any, Dict
+import io
+import random
+import sys
+
+from specminers.daikon import ProgramPoint, TraceWriter
+
+from common import load_declarations, random_values, timed
+
+
+def write_line_by_line(output: io.StringIO,
+                       ppt: ProgramPoint,
+                       nonce: int,
+                       values: Dict[str, Any]
+                       ) -> None:
+    """Writes a record in the same way as the original TraceWriter."""
+    w = lambda s: output.write(f'{s}\n')
+    w('')
+    w(ppt.name)
+    w('this_invocation_nonce')
+    w(nonce)
+    for name, var in ppt.items():
+        w(name)
+        w(var.encode(values[name]))
+        w(0)
+
+
+def main(num_records: int) -> None:
+    declarations = load_declarations()
+    ppt = declarations['factory.MAV_CMD_NAV_TAKEOFF:::ENTER']
+    rng = random.Random(0)
+    rows = [random_values(ppt, rng) for _ in range(num_records)]
+
+    def line_by_line() -> None:
+        output = io.StringIO()
+        for nonce, row in enumerate(rows, 1):
+            write_line_by_line(output, ppt, nonce, row)
+
+    def write() -> None:
+        writer = TraceWriter(declarations, io.StringIO(), buffer_size=1 << 20)
+        for row in rows:
+            writer.write(ppt, **row)
+        writer.flush()
+
+    def write_many() -> None:
+        writer = TraceWriter(declarations, io.StringIO(), buffer_size=1 << 20)
+        writer.write_many(ppt, rows)
+        writer.flush()
+
+    for name, func in [('line-by-line', line_by_line),
+                       ('write', write),
+                       ('write_many', write_many)]:
+        duration = timed(func)
+        print(f'{name:<16} {duration:8.3f} s '
+              f'{num_records / duration:12,.0f} records/s')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
@@ -3,4 +3,5 @@
 specminers provides a Python wrapper around several popular specification
 mining tools.
 """
-from .daikon import Daikon
+from .daikon import AsyncDaikon, Daikon
+from .container_pool import ContainerPool
@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+"""
+This module provides a simple, size-bounded on-disk cache that is used to
+persist expensive results across processes.
+"""
+__all__ = ('DiskCache', 'FileLock', 'content_key')
+
+from types import TracebackType
+from typing import IO, Iterable, List, Optional, Tuple, Type
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import threading
+
+from loguru import logger
+import attr
+
+from .version import __version__
+
+DEFAULT_MAX_SIZE = 256 * 1024 * 1024
+
+
+def content_key(filenames: Iterable[str], *parts: str) -> str:
+    """Computes a cache key from the contents of the given files, the
+    version of this package, and any number of additional strings."""
+    digest = hashlib.sha256(__version__.encode('utf-8'))
+    for part in parts:
+        digest.update(b'\0' + part.encode('utf-8'))
+    for filename in filenames:
+        digest.update(b'\0')
+        with open(filename, 'rb') as fh:
+            for chunk in iter(lambda: fh.read(1024 * 1024), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+# the platform-specific locking modules are imported only when a lock is used,
+# so that importing this package does not depend on them
+def _lock_file(fh: IO[str]) -> None:
+    """Blocks until an exclusive lock on a given open file is acquired."""
+    if sys.platform == 'win32':
+        import msvcrt
+        fh.seek(0)
+        while True:
+            try:
+                # gives up after ten attempts, one second apart
+                msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                continue
+    else:
+        import fcntl
+        fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+
+
+def _unlock_file(fh: IO[str]) -> None:
+    """Releases the lock on a given open file."""
+    if sys.platform == 'win32':
+        import msvcrt
+        fh.seek(0)
+        msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        import fcntl
+        fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+
+
+@attr.s(eq=False, slots=True)
+class FileLock:
+    """An exclusive lock that is shared between processes on the same host
+    via a given file, which is created if it does not exist. The file is
+    locked via :code:`fcntl.flock`, or :code:`msvcrt.locking` on Windows.
+    The lock is acquired upon entering its context, and released upon
+    leaving it.
+
+    Attributes
+    ----------
+    filename: str
+        The name of the lock file.
+    """
+    filename: str = attr.ib()
+    _fh: Optional[IO[str]] = attr.ib(default=None, init=False, repr=False)
+
+    def __enter__(self) -> 'FileLock':
+        if self._fh is not None:
+            raise RuntimeError(f'lock is already held: {self.filename}')
+        fh = open(self.filename, 'a')
+        try:
+            _lock_file(fh)
+        except BaseException:
+            fh.close()
+            raise
+        self._fh = fh
+        return self
+
+    def __exit__(self,
+                 ex_type: Optional[Type[BaseException]],
+                 ex_val: Optional[BaseException],
+                 ex_tb: Optional[TracebackType]
+                 ) -> None:
+        fh, self._fh = self._fh, None
+        if fh is not None:
+            _unlock_file(fh)
+            fh.close()
+
+
+@attr.s(eq=False, slots=True)
+class DiskCache:
+    """A cache that stores each of its entries as a file within a given
+    directory.
+
+    Entries are written atomically. When the total size of the entries
+    exceeds :attr:`max_size`, the least recently used entries are evicted,
+    where the recency of an entry is given by its modification time.
+
+    The cache may be shared by several processes on the same host. Eviction
+    is serialized via a lock on the cache directory, and :meth:`lock`
+    provides a lock for a given key, which may be used to avoid computing
+    the same entry in several processes at once.
+
+    Attributes
+    ----------
+    directory: str
+        The directory in which entries are stored. It is created if it does
+        not exist.
+    max_size: int
+        The maximum total size of the entries in bytes.
+    hits: int
+        The number of lookups, within this process, that found an entry.
+    misses: int
+        The number of lookups, within this process, that found no entry.
+    """
+    directory: str = attr.ib(converter=os.path.abspath)
+    max_size: int = attr.ib(default=DEFAULT_MAX_SIZE)
+    hits: int = attr.ib(init=False, default=0)
+    misses: int = attr.ib(init=False, default=0)
+    _lock: threading.Lock = \
+        attr.ib(init=False, repr=False, factory=threading.Lock)
+
+    def __attrs_post_init__(self) -> None:
+        if self.max_size < 0:
+            raise ValueError('max_size must not be negative')
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        if not key or not key.isalnum():
+            raise ValueError(f'illegal cache key: {key}')
+        return os.path.join(self.directory, key)
+
+    def _entries(self) -> List[Tuple[float, int, str]]:
+        """Returns the modification time, size, and path of each entry."""
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.startswith('.') or not entry.is_file():
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    @property
+    def size(self) -> int:
+        """The total size of the entries in this cache, in bytes."""
+        return sum(size for _, size, _ in self._entries())
+
+    def __len__(self) -> int:
+        return len(self._entries())
+
+    def record_lookup(self, hit: bool) -> None:
+        """Counts a lookup that was not counted by :meth:`get`, :meth:`open`,
+        or :meth:`get_file` (e.g., a lookup of several related entries)."""
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def __contains__(self, key: str) -> bool:
+        return os.path.isfile(self._path(key))
+
+    def lock(self, key: str) -> FileLock:
+        """Returns an inter-process lock for the entry with a given key.
+        Lock files are hidden, and are not counted as entries."""
+        self._path(key)
+        return FileLock(os.path.join(self.directory, f'.{key}.lock'))
+
+    def get(self, key: str, *, record: bool = True) -> Optional[bytes]:
+        """Retrieves the contents of the entry with a given key, or
+        :code:`None` if there is no such entry. Unless :code:`record` is
+        unset, the lookup is counted as a hit or a miss."""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as fh:
+                contents = fh.read()
+        except FileNotFoundError:
+            if record:
+                self.record_lookup(False)
+            return None
+        if record:
+            self.record_lookup(True)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return contents
+
+    def put(self, key: str, contents: bytes) -> None:
+        """Stores an entry with a given key, replacing any existing entry,
+        and evicts entries as necessary."""
+        path = self._path(key)
+        fd, temporary = tempfile.mkstemp(dir=self.directory, prefix='.')
+        try:
+            with os.fdopen(fd, 'wb') as fh:
+                fh.write(contents)
+            os.replace(temporary, path)
+        except BaseException:
+            os.remove(temporary)
+            raise
+        self.evict()
+
+    def open(self, key: str, *, record: bool = True) -> Optional[IO[bytes]]:
+        """Opens the entry with a given key for reading, or returns
+        :code:`None` if there is no such entry. The contents that are read
+        are unaffected by later changes to the entry. See :meth:`get`."""
+        path = self._path(key)
+        try:
+            fh = open(path, 'rb')
+        except FileNotFoundError:
+            if record:
+                self.record_lookup(False)
+            return None
+        if record:
+            self.record_lookup(True)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return fh
+
+    def get_file(self,
+                 key: str,
+                 destination: str,
+                 *,
+                 record: bool = True
+                 ) -> bool:
+        """Copies the contents of the entry with a given key to a given file,
+        and indicates whether there was such an entry. See :meth:`get`."""
+        fh = self.open(key, record=record)
+        if fh is None:
+            return False
+        with fh, open(destination, 'wb') as out:
+            shutil.copyfileobj(fh, out)
+        return True
+
+    def put_file(self, key: str, filename: str) -> None:
+        """Stores the contents of a given file as the entry with a given key,
+        replacing any existing entry, and evicts entries as necessary."""
+        path = self._path(key)
+        fd, temporary = tempfile.mkstemp(dir=self.directory, prefix='.')
+        try:
+            with os.fdopen(fd, 'wb') as out, open(filename, 'rb') as fh:
+                shutil.copyfileobj(fh, out)
+            os.replace(temporary, path)
+        except BaseException:
+            os.remove(temporary)
+            raise
+        self.evict()
+
+    def discard(self, key: str) -> None:
+        """Removes the entry with a given key, if it exists."""
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def evict(self) -> None:
+        """Evicts the least recently used entries until the total size of
+        the cache is within its bound."""
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_size:
+            return
+        with FileLock(os.path.join(self.directory, '.evict.lock')):
+            entries = self._entries()
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_size:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                logger.trace(f'evicted cache entry: {path}')
+                total -= size
+
+    def clear(self) -> None:
+        """Removes all entries from this cache."""
+        for _, _, path in self._entries():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+"""
+This module provides a pool of warm, reusable containers for running tools
+within Docker, which avoids the cost of provisioning and destroying a fresh
+container for each job.
+"""
+__all__ = ('ContainerPool', 'PoolJob')
+
+from types import TracebackType
+from typing import List, Optional, Sequence, Tuple, Type
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+
+from loguru import logger
+import attr
+import dockerblade
+
+# the directory at which the pool workspace is mounted inside each container
+_CONTAINER_WORKSPACE = '/tmp/.specminers'
+
+
+@attr.s(frozen=True, slots=True)
+class PoolJob:
+    """Describes a job that has been assigned a container by a pool.
+
+    Upon leaving the context of a job, its directory is removed and its
+    container is returned to the pool. If the context is left because of an
+    exception other than a failed command, the container is destroyed rather
+    than reused.
+
+    Attributes
+    ----------
+    container: dockerblade.Container
+        The container in which the job should be executed.
+    shell: dockerblade.Shell
+        A shell for the container.
+    directory: str
+        The absolute path of the job directory inside the container. The
+        directory is removed once the job has finished.
+    filenames: Tuple[str, ...]
+        The absolute paths of the input files for the job, inside the
+        container, in the order that they were given.
+    """
+    container: dockerblade.Container = attr.ib()
+    shell: dockerblade.Shell = attr.ib()
+    directory: str = attr.ib()
+    filenames: Tuple[str, ...] = attr.ib()
+    _pool: 'ContainerPool' = attr.ib(repr=False)
+    _host_directory: str = attr.ib(repr=False)
+
+    def __enter__(self) -> 'PoolJob':
+        return self
+
+    @property
+    def host_directory(self) -> str:
+        """The absolute path of the job directory on the host."""
+        return self._host_directory
+
+    def __exit__(self,
+                 ex_type: Optional[Type[BaseException]],
+                 ex_val: Optional[BaseException],
+                 ex_tb: Optional[TracebackType]
+                 ) -> None:
+        shutil.rmtree(self._host_directory, ignore_errors=True)
+        discard = ex_type is not None \
+            and not issubclass(ex_type, dockerblade.CalledProcessError)
+        self._pool.release(self.container, discard=discard)
+
+
+@attr.s(eq=False)
+class ContainerPool:
+    """Maintains a pool of warm containers for a given image.
+
+    Each container has a shared workspace directory on the host mounted
+    inside it. Each job is given its own subdirectory of that workspace, into
+    which its input files are linked (or copied, if they cannot be linked),
+    and which is removed once the job has finished. Containers are returned
+    to the pool after each job and are reused by later jobs.
+
+    Containers that have been idle for longer than :attr:`idle_timeout` are
+    destroyed the next time that the pool is used. Before an idle container
+    is reused, :attr:`health_check` is executed inside it; if the check
+    fails, the container is destroyed and another is used instead.
+
+    This class is thread-safe.
+
+    Attributes
+    ----------
+    daemon: dockerblade.DockerDaemon
+        The Docker daemon that is used to provision containers.
+    image: str
+        The name of the image for the containers.
+    size: int
+        The maximum number of idle containers that are kept. Jobs are never
+        blocked waiting for a container: if no idle container is available,
+        a new container is provisioned, and it is destroyed after its job if
+        the pool is already full.
+    idle_timeout: float, optional
+        The number of seconds that a container may remain idle before it is
+        destroyed. If :code:`None`, idle containers are kept until the pool
+        is closed.
+    health_check: str, optional
+        A command that must succeed inside an idle container before it is
+        reused. If :code:`None`, no check is performed.
+    num_provisioned: int
+        The number of containers that have been provisioned.
+    num_reused: int
+        The number of jobs that were given an idle container.
+    num_unhealthy: int
+        The number of idle containers that failed their health check.
+    """
+    daemon: dockerblade.DockerDaemon = attr.ib()
+    image: str = attr.ib()
+    size: int = attr.ib(default=2)
+    idle_timeout: Optional[float] = attr.ib(default=300.0)
+    health_check: Optional[str] = attr.ib(default='true')
+    num_provisioned: int = attr.ib(init=False, default=0)
+    num_reused: int = attr.ib(init=False, default=0)
+    num_unhealthy: int = attr.ib(init=False, default=0)
+    _workspace: str = attr.ib(init=False, repr=False)
+    _idle: List[Tuple[dockerblade.Container, float]] = \
+        attr.ib(init=False, repr=False, factory=list)
+    _lock: threading.Lock = \
+        attr.ib(init=False, repr=False, factory=threading.Lock)
+    _closed: bool = attr.ib(init=False, repr=False, default=False)
+
+    @size.validator
+    def _check_size(self, attribute: 'attr.Attribute', value: int) -> None:
+        if value < 0:
+            raise ValueError('pool size must be non-negative')
+
+    def __attrs_post_init__(self) -> None:
+        self._workspace = tempfile.mkdtemp(prefix='specminers-pool-')
+
+    def __enter__(self) -> 'ContainerPool':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    @property
+    def workspace(self) -> str:
+        """The workspace directory on the host."""
+        return self._workspace
+
+    @property
+    def num_idle(self) -> int:
+        """The number of idle containers within the pool."""
+        with self._lock:
+            return len(self._idle)
+
+    def _provision(self) -> dockerblade.Container:
+        volumes = {self._workspace: {'bind': _CONTAINER_WORKSPACE,
+                                     'mode': 'rw'}}
+        container = self.daemon.provision(self.image,
+                                          volumes=volumes)  # type: ignore
+        with self._lock:
+            self.num_provisioned += 1
+        logger.debug(f'provisioned pooled container [{container.id}]')
+        return container
+
+    def _destroy(self, container: dockerblade.Container) -> None:
+        logger.debug(f'destroying pooled container [{container.id}]')
+        try:
+            container.remove()
+        except Exception:
+            logger.exception('failed to destroy pooled container '
+                             f'[{container.id}]')
+
+    def _evict_expired(self) -> None:
+        """Destroys all containers that have exceeded their idle timeout."""
+        if self.idle_timeout is None:
+            return
+        deadline = time.monotonic() - self.idle_timeout
+        with self._lock:
+            expired = [c for c, used in self._idle if used < deadline]
+            self._idle = [(c, used) for c, used in self._idle
+                          if used >= deadline]
+        for container in expired:
+            self._destroy(container)
+
+    def _is_healthy(self, container: dockerblade.Container) -> bool:
+        if self.health_check is None:
+            return True
+        try:
+            container.shell('/bin/sh').check_call(self.health_check)
+        except Exception:
+            logger.warning(f'pooled container [{container.id}] failed '
+                           'health check')
+            return False
+        return True
+
+    def acquire(self) -> dockerblade.Container:
+        """Takes a container from the pool, provisioning a new container if
+        no healthy idle container is available. The container should be
+        returned to the pool via :meth:`release`.
+
+        Raises
+        ------
+        RuntimeError
+            If the pool has been closed.
+        """
+        if self._closed:
+            raise RuntimeError('container pool is closed')
+        self._evict_expired()
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                # reuse the most recently used container
+                container, _ = self._idle.pop()
+            if self._is_healthy(container):
+                with self._lock:
+                    self.num_reused += 1
+                return container
+            with self._lock:
+                self.num_unhealthy += 1
+            self._destroy(container)
+        return self._provision()
+
+    def release(self,
+                container: dockerblade.Container,
+                *,
+                discard: bool = False
+                ) -> None:
+        """Returns a container to the pool, or destroys it if the pool is
+        closed or full, or if :code:`discard` is set."""
+        if not discard:
+            with self._lock:
+                if not self._closed and len(self._idle) < self.size:
+                    self._idle.append((container, time.monotonic()))
+                    container = None  # type: ignore
+        if container is not None:
+            self._destroy(container)
+        self._evict_expired()
+
+    def warm(self, num_containers: Optional[int] = None) -> None:
+        """Provisions containers until the pool holds a given number of idle
+        containers, or until it is full, if no number is given."""
+        if num_containers is None:
+            num_containers = self.size
+        num_containers = min(num_containers, self.size)
+        while self.num_idle < num_containers:
+            self.release(self._provision())
+
+    @staticmethod
+    def _link_or_copy(source: str, destination: str) -> None:
+        try:
+            os.link(source, destination)
+        except OSError:
+            shutil.copyfile(source, destination)
+
+    def job(self, filenames: Sequence[str]) -> PoolJob:
+        """Provides a container for a job whose inputs are given by a
+        sequence of files on the host. The job should be used as a context
+        manager, so that its container is returned to the pool.
+
+        Raises
+        ------
+        FileNotFoundError
+            If a given input file cannot be found.
+        RuntimeError
+            If the pool has been closed.
+        """
+        job_id = uuid.uuid4().hex
+        host_directory = os.path.join(self._workspace, job_id)
+        container_directory = f'{_CONTAINER_WORKSPACE}/{job_id}'
+        os.mkdir(host_directory)
+        try:
+            container_filenames: List[str] = []
+            for i, filename in enumerate(filenames):
+                # inputs are prefixed by their position to avoid collisions
+                basename = f'{i}-{os.path.basename(filename)}'
+                self._link_or_copy(filename,
+                                   os.path.join(host_directory, basename))
+                container_filenames.append(
+                    f'{container_directory}/{basename}')
+            container = self.acquire()
+        except BaseException:
+            shutil.rmtree(host_directory, ignore_errors=True)
+            raise
+        return PoolJob(container=container,
+                       shell=container.shell('/bin/sh'),
+                       directory=container_directory,
+                       filenames=tuple(container_filenames),
+                       pool=self,
+                       host_directory=host_directory)
+
+    def close(self) -> None:
+        """Destroys all idle containers and removes the workspace. Containers
+        that are in use are destroyed once they are released."""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for container, _ in idle:
+            self._destroy(container)
+        shutil.rmtree(self._workspace, ignore_errors=True)
@@ -3,9 +3,18 @@
 This module provides an interface for interacting with Daikon and
 reading/writing Daikon's .decl and .dtrace files.
 """
-from .daikon import Daikon
+from .async_daikon import AsyncDaikon
+from .daikon import Daikon, MiningSession, TraceSession
+from .diff import InvariantDiff, diff_invariants
 from .declarations import Declarations
-from .invariant import Invariant, InvariantMap, InvariantReader
+from .invariant import (Invariant, InvariantMap, InvariantReader,
+                        InvariantTable, InternedInvariants)
+from .index import InvariantIndex, InvariantKind
+from .lazy_declarations import LazyDeclarations
+from .monitor import InvariantMonitor, Violation
 from .ppt import PptType, VarDecl, ProgramPoint
-from .trace import (TraceFileReader, TraceWriter, TraceRecord,
+from .serialized import SerializedInvariants
+from .trace import (BackgroundTraceWriter, BulkTraceFileReader,
+                    OverflowPolicy, TraceBinaryReader, TraceBinaryWriter,
+                    TraceFileReader, TraceWriter, TraceRecord,
                     TraceRecordVariable)
@@ -0,0 +1,316 @@
+# -*- coding: utf-8 -*-
+"""
+This module provides an asyncio interface to Daikon, which executes mining
+jobs without blocking the event loop.
+"""
+__all__ = ('AsyncDaikon',)
+
+from typing import (Any, AsyncGenerator, AsyncIterator, Callable, List,
+                    Optional, Tuple)
+import asyncio
+import concurrent.futures
+import sys
+import threading
+import time
+
+from loguru import logger
+import attr
+import dockerblade
+
+from .daikon import Daikon, MiningSession
+from .declarations import Declarations
+from .helpers import aiter_lines
+from .invariant import InvariantMap, InvariantReader
+from ..local_shell import LocalShell
+
+# get_running_loop was added in Python 3.7, and is equivalent to
+# get_event_loop within a coroutine
+_get_running_loop = getattr(asyncio, 'get_running_loop',
+                            asyncio.get_event_loop)
+
+# marks the end of the output of a job
+_DONE = object()
+
+
+@attr.s(eq=False, slots=True)
+class _Job:
+    """The state of a job that is shared by the event loop and the worker
+    thread that executes the job."""
+    aborted: bool = attr.ib(default=False)
+    session: Optional[MiningSession] = attr.ib(default=None)
+    process: Optional[Any] = attr.ib(default=None)
+    _lock: threading.Lock = attr.ib(factory=threading.Lock, repr=False)
+
+    def attach_session(self, session: MiningSession) -> bool:
+        """Records the session for this job, unless the job was aborted."""
+        with self._lock:
+            if not self.aborted:
+                self.session = session
+            return not self.aborted
+
+    def attach_process(self, process: Any) -> bool:
+        """Records the running process for this job, unless the job was
+        aborted."""
+        with self._lock:
+            if not self.aborted:
+                self.process = process
+            return not self.aborted
+
+    def abort(self) -> None:
+        """Stops the running process for this job. Containers are killed,
+        rather than the process inside them, and are destroyed by the
+        worker thread."""
+        with self._lock:
+            self.aborted = True
+            session, process = self.session, self.process
+        if session is not None:
+            _stop(session, process)
+
+
+def _stop(session: MiningSession, process: Optional[Any]) -> None:
+    """Stops a given process, which runs within a given session."""
+    try:
+        if isinstance(session.shell, LocalShell):
+            if process is not None:
+                process.kill()
+        else:
+            container = session.shell.container
+            container.daemon.api.kill(container.id)
+    except Exception:
+        logger.opt(exception=True).debug('failed to stop Daikon job')
+
+
+class _Aborted(Exception):
+    """Raised within a worker thread when its job has been aborted."""
+
+
+@attr.s(eq=False)
+class AsyncDaikon:
+    """Provides an asyncio interface to Daikon.
+
+    Each job is executed by a worker thread, so that the blocking calls that
+    provision containers and execute commands do not block the event loop,
+    and the output of Daikon is passed to the event loop as it is produced.
+    At most :attr:`max_concurrency` jobs are executed at once by this
+    object, across all of its callers; other jobs wait until a slot is
+    free. Time spent waiting for a slot does not count towards the timeout
+    of a job.
+
+    If a job is cancelled, or exceeds its timeout, Daikon is stopped and its
+    container is destroyed (or discarded by the pool) before the
+    cancellation, or :class:`asyncio.TimeoutError`, is propagated.
+
+    Results are not retrieved from, or stored in, the cache of
+    :attr:`daikon`. This object should be used by a single event loop at a
+    time, and should be closed once it is no longer needed.
+
+    Attributes
+    ----------
+    daikon: Daikon
+        The interface to Daikon that is used to execute each job.
+    max_concurrency: int
+        The maximum number of jobs that are executed at once.
+    timeout: float, optional
+        The default number of seconds that a job may run for.
+    max_buffered_chunks: int
+        The maximum number of chunks of output that are held for each job
+        before its worker waits for them to be consumed.
+    """
+    daikon: Daikon = attr.ib(factory=Daikon)
+    max_concurrency: int = attr.ib(default=4)
+    timeout: Optional[float] = attr.ib(default=None)
+    max_buffered_chunks: int = attr.ib(default=64)
+    _executor: concurrent.futures.ThreadPoolExecutor = \
+        attr.ib(init=False, repr=False)
+    _semaphore: Optional[Tuple[Any, asyncio.Semaphore]] = \
+        attr.ib(init=False, default=None, repr=False)
+
+    @max_concurrency.validator
+    def _check_max_concurrency(self,
+                               attribute: 'attr.Attribute',
+                               value: int
+                               ) -> None:
+        if value < 1:
+            raise ValueError('max_concurrency must be positive')
+
+    def __attrs_post_init__(self) -> None:
+        # each job may need a second thread to abort it
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            2 * self.max_concurrency, thread_name_prefix='specminers-async')
+
+    async def __aenter__(self) -> 'AsyncDaikon':
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Releases the worker threads once their jobs have finished."""
+        self._executor.shutdown(wait=False)
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # semaphores are bound to the event loop on which they are created
+        loop = _get_running_loop()
+        if self._semaphore is None or self._semaphore[0] is not loop:
+            self._semaphore = (loop, asyncio.Semaphore(self.max_concurrency))
+        return self._semaphore[1]
+
+    def _execute(self,
+                 job: _Job,
+                 filenames: Tuple[str, ...],
+                 put: Callable[[Any], None]
+                 ) -> None:
+        """Executes a job within a worker thread, and passes each chunk of
+        its output to a given function."""
+        try:
+            session = self.daikon.open_session(*filenames)
+            if not job.attach_session(session):
+                session.__exit__(_Aborted, _Aborted(), None)
+                return
+            try:
+                commands = self.daikon.commands(session)
+                for i, command in enumerate(commands):
+                    started_at = time.monotonic()
+                    process = session.shell.popen(command, encoding=None)
+                    if not job.attach_process(process):
+                        _stop(session, process)
+                        raise _Aborted
+                    is_last = i == len(commands) - 1
+                    for chunk in process.stream:  # type: ignore
+                        if is_last:
+                            put(chunk)
+                    returncode = process.wait()
+                    if job.aborted:
+                        raise _Aborted
+                    if returncode != 0:
+                        duration = time.monotonic() - started_at
+                        raise dockerblade.CalledProcessError(
+                            cmd=command, returncode=returncode,
+                            duration=duration, output=None)
+            except BaseException:
+                ex_type, ex_val, ex_tb = sys.exc_info()
+                try:
+                    session.__exit__(ex_type, ex_val, ex_tb)
+                except Exception:
+                    if not job.aborted:
+                        raise
+                    logger.opt(exception=True).debug(
+                        'failed to clean up aborted Daikon job')
+                raise
+            session.__exit__(None, None, None)
+        finally:
+            put(_DONE)
+
+    async def _abort(self,
+                     job: _Job,
+                     worker: 'asyncio.Future[None]',
+                     queue: 'asyncio.Queue[Any]'
+                     ) -> None:
+        """Stops a job and waits for its worker to clean up."""
+        loop = _get_running_loop()
+        abort = loop.run_in_executor(self._executor, job.abort)
+        while not worker.done():
+            # the worker may be waiting for space in the queue
+            while not queue.empty():
+                queue.get_nowait()
+            await asyncio.wait([worker], timeout=0.05)
+        await abort
+        if not worker.cancelled() and worker.exception() is not None:
+            logger.debug(f'aborted Daikon job: {worker.exception()!r}')
+
+    async def _chunks(self,
+                      filenames: Tuple[str, ...],
+                      timeout: Optional[float]
+                      ) -> AsyncGenerator[bytes, None]:
+        """Executes a job and yields the chunks of its output."""
+        if timeout is None:
+            timeout = self.timeout
+        loop = _get_running_loop()
+        async with self._get_semaphore():
+            queue: 'asyncio.Queue[Any]' = \
+                asyncio.Queue(self.max_buffered_chunks)
+
+            def put(item: Any) -> None:
+                asyncio.run_coroutine_threadsafe(queue.put(item),
+                                                 loop).result()
+
+            job = _Job()
+            worker = loop.run_in_executor(self._executor, self._execute,
+                                          job, filenames, put)
+            deadline = None if timeout is None else loop.time() + timeout
+            try:
+                while True:
+                    remaining: Optional[float] = None
+                    if deadline is not None:
+                        remaining = max(deadline - loop.time(), 0.0)
+                    item = await asyncio.wait_for(queue.get(), remaining)
+                    if item is _DONE:
+                        break
+                    yield item
+                await worker
+            except BaseException:
+                if not worker.done():
+                    await asyncio.shield(self._abort(job, worker, queue))
+                raise
+
+    async def stream(self,
+                     *filenames: str,
+                     timeout: Optional[float] = None
+                     ) -> AsyncIterator[str]:
+        """Executes Daikon and yields the lines of its output as they are
+        produced. Closing the iterator before it is exhausted stops Daikon.
+
+        Parameters
+        ----------
+        filenames: str
+            The declarations and trace files.
+        timeout: float, optional
+            The number of seconds that the job may run for. Defaults to
+            :attr:`timeout`.
+
+        Raises
+        ------
+        asyncio.TimeoutError
+            If the job does not finish within its timeout.
+        dockerblade.CalledProcessError
+            If Daikon or PrintInvariants fails.
+
+        See :meth:`Daikon.__call__` for the remaining exceptions.
+        """
+        chunks = self._chunks(tuple(filenames), timeout)
+        try:
+            async for line in aiter_lines(chunks):
+                yield line
+        finally:
+            await chunks.aclose()
+
+    async def __call__(self,
+                       *filenames: str,
+                       timeout: Optional[float] = None
+                       ) -> str:
+        """Executes Daikon and returns its output.
+
+        Raises
+        ------
+        See :meth:`stream`.
+        """
+        chunks: List[bytes] = []
+        async for chunk in self._chunks(tuple(filenames), timeout):
+            chunks.append(chunk)
+        return b''.join(chunks).decode('utf-8', errors='replace')
+
+    async def invariants(self,
+                         declarations: Declarations,
+                         *filenames: str,
+                         timeout: Optional[float] = None
+                         ) -> InvariantMap:
+        """Executes Daikon and returns the invariants that it mined.
+
+        Raises
+        ------
+        See :meth:`stream`.
+        """
+        output = await self(*filenames, timeout=timeout)
+        reader = InvariantReader(declarations)
+        return InvariantMap.from_stream(
+            declarations, reader.read_lines(output.splitlines()))
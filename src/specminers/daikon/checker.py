@@ -0,0 +1,463 @@
+# -*- coding: utf-8 -*-
+"""
+This module compiles invariants, as written by Daikon, into checkers that are
+evaluated over entire columns of trace values at once.
+
+Invariants are parsed using the grammar given by :code:`daikon.lark`.
+Invariants that are not described by that grammar (e.g.,
+:code:`x one of { 1, 2 }`) cannot be compiled and are skipped.
+
+Note
+----
+This module requires NumPy, which can be installed via the :code:`numpy`
+extra (i.e., :code:`pip install specminers[numpy]`).
+"""
+__all__ = ('CompiledInvariant', 'InvariantChecker', 'PptCheckResult',
+           'compile_invariant')
+
+from typing import (Callable, Collection, Dict, FrozenSet, Iterable, List,
+                    Mapping, Optional, Tuple)
+import functools
+
+from loguru import logger
+import attr
+import numpy as np
+
+from .declarations import Declarations
+from .grammar import (DEFAULT_TOLERANCE, MAGNITUDE_OPERATIONS, OPERATORS,
+                      Syntax, parse_invariant, syntax_variables)
+from .invariant import Invariant, InvariantMap
+from .ppt import ProgramPoint, enter_ppt_name
+from .trace.columnar import Column, DictionaryColumn, TraceTable, read_tables
+
+
+class _Values:
+    """Provides the columns of values that an invariant is checked against.
+
+    Each column is paired with a mask that indicates which of its values are
+    present; values of :code:`orig(x)` are absent for records that lack a
+    matching entry record.
+    """
+    def __init__(self,
+                 table: TraceTable,
+                 enter_table: Optional[TraceTable]
+                 ) -> None:
+        self.table = table
+        self.enter_table = enter_table
+        self._enter_rows: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        self._cache: Dict[Tuple[str, bool], Tuple[np.ndarray, np.ndarray]] = {}
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+    @staticmethod
+    def _decode(column: Column) -> np.ndarray:
+        if isinstance(column, DictionaryColumn):
+            return column.decode()
+        return column
+
+    def _match_enter_rows(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Finds the row of the entry record for each record in the table."""
+        if self._enter_rows is None:
+            nonces = self.table.nonces
+            if self.enter_table is None or len(self.enter_table) == 0:
+                rows = np.zeros(len(nonces), dtype=np.int64)
+                matched = np.zeros(len(nonces), dtype=np.bool_)
+            else:
+                enter_nonces = self.enter_table.nonces
+                order = np.argsort(enter_nonces, kind='stable')
+                positions = np.searchsorted(enter_nonces[order], nonces)
+                positions = np.minimum(positions, len(order) - 1)
+                rows = order[positions]
+                matched = (enter_nonces[rows] == nonces) & (nonces >= 0)
+            self._enter_rows = (rows, matched)
+        return self._enter_rows
+
+    def get(self, name: str, orig: bool) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the values of a variable and a mask that indicates which
+        of those values are present.
+
+        Raises
+        ------
+        KeyError
+            If there is no such variable.
+        """
+        key = (name, orig)
+        try:
+            return self._cache[key]
+        except KeyError:
+            pass
+        if orig:
+            if self.enter_table is None:
+                raise KeyError(f'orig({name})')
+            rows, present = self._match_enter_rows()
+            values = self._decode(self.enter_table.columns[name])[rows]
+        else:
+            values = self._decode(self.table.columns[name])
+            present = np.ones(len(values), dtype=np.bool_)
+        if values.dtype == np.float64:
+            present = present & ~np.isnan(values)
+        self._cache[key] = (values, present)
+        return values, present
+
+
+# an expression evaluates to its values, the magnitude of the terms that
+# were used to compute those values, and a mask of the values that are present
+_Result = Tuple[np.ndarray, np.ndarray, np.ndarray]
+_Expression = Callable[[_Values], _Result]
+
+
+def _constant(value: object) -> _Expression:
+    # constants are broadcast against the columns that they are combined with
+    is_number = isinstance(value, (int, float))
+    magnitude = np.float64(abs(value) if is_number else 0)  # type: ignore
+    result = (np.asarray(value), magnitude, np.bool_(True))
+
+    def evaluate(values: _Values) -> _Result:
+        return result  # type: ignore
+    return evaluate
+
+
+def _variable(name: str, orig: bool) -> _Expression:
+    def evaluate(values: _Values) -> _Result:
+        column, present = values.get(name, orig)
+        if column.dtype.kind in 'fiub':
+            magnitude = np.abs(column.astype(np.float64))
+        else:
+            magnitude = np.zeros(len(column), dtype=np.float64)
+        return column, magnitude, present
+    return evaluate
+
+
+def _negate(operand: _Expression) -> _Expression:
+    def evaluate(values: _Values) -> _Result:
+        value, magnitude, present = operand(values)
+        return -value, magnitude, present
+    return evaluate
+
+
+def _arithmetic(op: Callable[[np.ndarray, np.ndarray], np.ndarray],
+                combine: Callable[[np.ndarray, np.ndarray], np.ndarray],
+                lhs: _Expression,
+                rhs: _Expression
+                ) -> _Expression:
+    def evaluate(values: _Values) -> _Result:
+        lhs_value, lhs_magnitude, lhs_present = lhs(values)
+        rhs_value, rhs_magnitude, rhs_present = rhs(values)
+        return (op(lhs_value, rhs_value),
+                combine(lhs_magnitude, rhs_magnitude),
+                lhs_present & rhs_present)
+    return evaluate
+
+
+def _comparison(name: str,
+                lhs: _Expression,
+                rhs: _Expression,
+                tolerance: float
+                ) -> _Expression:
+    """Builds an expression that evaluates to whether a comparison holds,
+    using the equality semantics that are described by :mod:`.grammar`."""
+    def approximately_equal(lhs_value: np.ndarray,
+                            lhs_magnitude: np.ndarray,
+                            rhs_value: np.ndarray,
+                            rhs_magnitude: np.ndarray
+                            ) -> np.ndarray:
+        if lhs_value.dtype.kind not in 'fiu' \
+           or rhs_value.dtype.kind not in 'fiu':
+            return lhs_value == rhs_value
+        difference = np.abs(lhs_value - rhs_value)
+        bound = tolerance * np.maximum(lhs_magnitude, rhs_magnitude)
+        return difference <= bound
+
+    _, compare = OPERATORS[name]
+
+    def evaluate(values: _Values) -> _Result:
+        lhs_value, lhs_magnitude, lhs_present = lhs(values)
+        rhs_value, rhs_magnitude, rhs_present = rhs(values)
+        if name in ('eq', 'neq'):
+            holds = approximately_equal(lhs_value, lhs_magnitude,
+                                        rhs_value, rhs_magnitude)
+            if name == 'neq':
+                holds = ~holds
+        else:
+            holds = compare(lhs_value, rhs_value)
+        present = lhs_present & rhs_present
+        return holds, np.float64(0), present  # type: ignore
+    return evaluate
+
+
+def _compile(syntax: Syntax, tolerance: float) -> _Expression:
+    """Compiles a syntax tree into an expression.
+
+    Raises
+    ------
+    ValueError
+        If the syntax tree contains an unknown kind of node.
+    """
+    kind = syntax[0]
+    if kind == 'const':
+        return _constant(syntax[1])
+    if kind == 'var':
+        return _variable(syntax[1], syntax[2])
+    if kind == 'neg':
+        return _negate(_compile(syntax[1], tolerance))
+    if kind not in OPERATORS:
+        raise ValueError(f'unknown syntax: {kind}')
+    lhs = _compile(syntax[1], tolerance)
+    rhs = _compile(syntax[2], tolerance)
+    if kind in MAGNITUDE_OPERATIONS:
+        _, op = OPERATORS[kind]
+        _, combine = OPERATORS[MAGNITUDE_OPERATIONS[kind]]
+        return _arithmetic(op, combine, lhs, rhs)
+    return _comparison(kind, lhs, rhs, tolerance)
+
+
+@attr.s(frozen=True, slots=True, auto_attribs=True)
+class CompiledInvariant:
+    """An invariant that has been compiled into a vectorized checker.
+
+    Attributes
+    ----------
+    invariant: Invariant
+        The invariant.
+    variables: FrozenSet[str]
+        The names of the variables whose current values are used by the
+        invariant.
+    orig_variables: FrozenSet[str]
+        The names of the variables whose values upon entry (i.e.,
+        :code:`orig(x)`) are used by the invariant.
+    """
+    invariant: Invariant
+    variables: FrozenSet[str]
+    orig_variables: FrozenSet[str]
+    _expression: _Expression = attr.ib(repr=False, eq=False)
+
+    def evaluate(self, values: _Values) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns a mask of the records that violate this invariant, and a
+        mask of the records for which the invariant could be evaluated."""
+        with np.errstate(all='ignore'):
+            holds, _, present = self._expression(values)
+        size = len(values)
+        violated = np.broadcast_to(present & ~holds, size)
+        return violated, np.broadcast_to(present, size)
+
+    def violations(self,
+                   table: TraceTable,
+                   enter_table: Optional[TraceTable] = None
+                   ) -> np.ndarray:
+        """Returns a mask of the records within a given table that violate
+        this invariant. Records that lack a value for any of the variables
+        that are used by the invariant (e.g., because the value is
+        nonsensical) are not considered violations.
+
+        Parameters
+        ----------
+        table: TraceTable
+            The records that should be checked.
+        enter_table: TraceTable, optional
+            The records for the corresponding entry program point, which
+            provide the values of :code:`orig(x)` for exit records with the
+            same nonce.
+
+        Raises
+        ------
+        KeyError
+            If the table does not provide a variable that is used by the
+            invariant.
+        """
+        violated, _ = self.evaluate(_Values(table, enter_table))
+        return violated
+
+
+@functools.lru_cache(maxsize=65536)
+def compile_invariant(invariant: Invariant,
+                      tolerance: float = DEFAULT_TOLERANCE
+                      ) -> CompiledInvariant:
+    """Compiles a given invariant. Compiled invariants are cached.
+
+    Parameters
+    ----------
+    invariant: Invariant
+        The invariant that should be compiled.
+    tolerance: float
+        The relative tolerance that is used for numeric equality.
+
+    Raises
+    ------
+    ValueError
+        If the invariant cannot be parsed.
+    """
+    syntax = parse_invariant(invariant.text)
+    expression = _compile(syntax, tolerance)
+    used = syntax_variables(syntax)
+    variables = frozenset(name for name, orig in used if not orig)
+    orig_variables = frozenset(name for name, orig in used if orig)
+    return CompiledInvariant(invariant, variables, orig_variables, expression)
+
+
+@attr.s(frozen=True, slots=True, auto_attribs=True)
+class PptCheckResult:
+    """Describes the violations of the invariants for a program point.
+
+    Attributes
+    ----------
+    ppt: ProgramPoint
+        The program point.
+    nonces: np.ndarray
+        The nonce of each record that was checked.
+    violations: Mapping[Invariant, np.ndarray]
+        The positions of the records that violate each invariant, indexed by
+        invariant. Invariants that were not violated are omitted.
+    num_checked: Mapping[Invariant, int]
+        The number of records that each invariant was evaluated against.
+    """
+    ppt: ProgramPoint
+    nonces: np.ndarray
+    violations: Mapping[Invariant, np.ndarray]
+    num_checked: Mapping[Invariant, int]
+
+    @property
+    def counts(self) -> Dict[Invariant, int]:
+        """The number of violations of each violated invariant."""
+        return {inv: len(rows) for inv, rows in self.violations.items()}
+
+    @property
+    def num_violations(self) -> int:
+        """The total number of violations across all invariants."""
+        return sum(len(rows) for rows in self.violations.values())
+
+    def violating_records(self) -> np.ndarray:
+        """Returns the positions of the records that violate at least one
+        invariant."""
+        if not self.violations:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(list(self.violations.values())))
+
+
+@attr.s(eq=False)
+class InvariantChecker:
+    """Checks traces against a set of invariants.
+
+    The invariants for each program point are compiled upon construction.
+    Invariants that cannot be compiled, or that refer to variables that are
+    not declared by their program point, are skipped.
+
+    Attributes
+    ----------
+    declarations: Declarations
+        The declarations for the program points within the traces.
+    invariants: InvariantMap
+        The invariants that traces should be checked against.
+    tolerance: float
+        The relative tolerance that is used for numeric equality.
+    """
+    declarations: Declarations = attr.ib()
+    invariants: InvariantMap = attr.ib()
+    tolerance: float = attr.ib(default=DEFAULT_TOLERANCE)
+    _compiled: Dict[str, List[CompiledInvariant]] = \
+        attr.ib(init=False, repr=False)
+    _skipped: Dict[str, List[Invariant]] = attr.ib(init=False, repr=False)
+
+    def __attrs_post_init__(self) -> None:
+        self._compiled = {}
+        self._skipped = {}
+        for ppt_name, invariants in self.invariants.items():
+            compiled, skipped = self._compile_ppt(ppt_name, invariants)
+            self._compiled[ppt_name] = compiled
+            if skipped:
+                self._skipped[ppt_name] = skipped
+        num_skipped = self.num_skipped
+        if num_skipped:
+            logger.debug(f'skipped {num_skipped} invariants that could not '
+                         'be compiled')
+
+    def _compile_ppt(self,
+                     ppt_name: str,
+                     invariants: Collection[Invariant]
+                     ) -> Tuple[List[CompiledInvariant], List[Invariant]]:
+        ppt = self.declarations.get(ppt_name)
+        enter_name = enter_ppt_name(ppt_name)
+        enter_ppt = self.declarations.get(enter_name) if enter_name else None
+        available = set(ppt) if ppt is not None else set()
+        available_orig = set(enter_ppt) if enter_ppt is not None else set()
+        compiled: List[CompiledInvariant] = []
+        skipped: List[Invariant] = []
+        for invariant in invariants:
+            try:
+                checker = compile_invariant(invariant, self.tolerance)
+            except ValueError:
+                skipped.append(invariant)
+                continue
+            if checker.variables.issubset(available) \
+               and checker.orig_variables.issubset(available_orig):
+                compiled.append(checker)
+            else:
+                skipped.append(invariant)
+        return compiled, skipped
+
+    def compiled(self, ppt_name: str) -> List[CompiledInvariant]:
+        """Returns the compiled invariants for a given program point."""
+        return self._compiled.get(ppt_name, [])
+
+    @property
+    def skipped(self) -> Mapping[str, List[Invariant]]:
+        """The invariants that could not be compiled, indexed by the name of
+        their program point."""
+        return self._skipped
+
+    @property
+    def num_skipped(self) -> int:
+        """The number of invariants that could not be compiled."""
+        return sum(len(invs) for invs in self._skipped.values())
+
+    def check_table(self,
+                    table: TraceTable,
+                    enter_table: Optional[TraceTable] = None
+                    ) -> PptCheckResult:
+        """Checks the records for a program point against its invariants.
+
+        Parameters
+        ----------
+        table: TraceTable
+            The records for the program point.
+        enter_table: TraceTable, optional
+            The records for the corresponding entry program point, which are
+            required to check invariants that refer to :code:`orig(x)`.
+            Invariants that refer to :code:`orig(x)` are not checked if this
+            table is not provided.
+        """
+        values = _Values(table, enter_table)
+        violations: Dict[Invariant, np.ndarray] = {}
+        num_checked: Dict[Invariant, int] = {}
+        for checker in self.compiled(table.ppt.name):
+            if checker.orig_variables and enter_table is None:
+                continue
+            violated, present = checker.evaluate(values)
+            num_checked[checker.invariant] = int(np.count_nonzero(present))
+            rows = np.flatnonzero(violated)
+            if len(rows):
+                violations[checker.invariant] = rows
+        return PptCheckResult(table.ppt, table.nonces, violations, num_checked)
+
+    def check_tables(self,
+                     tables: Mapping[str, TraceTable]
+                     ) -> Dict[str, PptCheckResult]:
+        """Checks a table of records for each of a number of program points,
+        indexed by name, against the invariants for those program points.
+        Values of :code:`orig(x)` are obtained from the table for the
+        corresponding entry program point, if it is provided."""
+        results: Dict[str, PptCheckResult] = {}
+        for ppt_name, table in tables.items():
+            enter_name = enter_ppt_name(ppt_name)
+            enter_table = tables.get(enter_name) if enter_name else None
+            results[ppt_name] = self.check_table(table, enter_table)
+        return results
+
+    def check_files(self,
+                    filenames: Iterable[str]
+                    ) -> Dict[str, PptCheckResult]:
+        """Reads the given trace files and checks their records against the
+        invariants for their program points."""
+        tables = read_tables(self.declarations, filenames,
+                             strings='dictionary')
+        return self.check_tables(tables)
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+This module provides transparent streaming (de)compression of Daikon files,
+where the compression method is determined by the extension of the file.
+"""
+__all__ = ('DEFAULT_BUFFER_SIZE', 'ensure_uncompressed', 'is_compressed',
+           'open_file')
+
+from typing import IO, Optional, Union
+import bz2
+import gzip
+import io
+import lzma
+import os
+
+DEFAULT_BUFFER_SIZE = 1024 * 1024
+
+COMPRESSED_EXTENSIONS = ('.gz', '.bz2', '.xz')
+
+
+def is_compressed(filename: str) -> bool:
+    """Determines whether a given file is compressed, based on its
+    extension."""
+    return os.path.splitext(filename)[1] in COMPRESSED_EXTENSIONS
+
+
+def ensure_uncompressed(filename: str) -> None:
+    """Ensures that a given file is not compressed.
+
+    Raises
+    ------
+    ValueError
+        If the file is compressed.
+    """
+    if is_compressed(filename):
+        message = ('operation is not supported for compressed files: '
+                   f'{filename}')
+        raise ValueError(message)
+
+
+def open_file(filename: str,
+              mode: str = 'r',
+              *,
+              compresslevel: Optional[int] = None,
+              buffer_size: int = DEFAULT_BUFFER_SIZE
+              ) -> IO[str]:
+    """Opens a text file for reading or writing. Files that end in
+    :code:`.gz`, :code:`.bz2`, or :code:`.xz` are transparently compressed
+    and decompressed using gzip, bzip2, or LZMA, respectively.
+
+    Parameters
+    ----------
+    filename: str
+        The name of the file.
+    mode: str
+        The mode that should be used to open the file: :code:`r`, :code:`w`,
+        :code:`a`, or :code:`x`.
+    compresslevel: int, optional
+        The compression level that should be used when writing a compressed
+        file. If unspecified, the default level for the compression method is
+        used.
+    buffer_size: int
+        The size of the buffer, in bytes, that is used for reading from and
+        writing to the file.
+
+    Raises
+    ------
+    ValueError
+        If an unsupported mode is given.
+    """
+    mode = mode.replace('t', '')
+    if mode not in ('r', 'w', 'a', 'x'):
+        raise ValueError(f'unsupported mode: {mode}')
+
+    extension = os.path.splitext(filename)[1]
+    raw: Union[gzip.GzipFile, bz2.BZ2File, lzma.LZMAFile]
+    if extension == '.gz':
+        level = 9 if compresslevel is None else compresslevel
+        raw = gzip.GzipFile(filename, mode + 'b', compresslevel=level)
+    elif extension == '.bz2':
+        level = 9 if compresslevel is None else compresslevel
+        raw = bz2.BZ2File(filename, mode, compresslevel=level)  # type: ignore
+    elif extension == '.xz':
+        preset = compresslevel if mode != 'r' else None
+        raw = lzma.LZMAFile(filename, mode, preset=preset)
+    else:
+        return open(filename, mode, buffering=buffer_size)
+
+    buffered: IO[bytes]
+    if mode == 'r':
+        buffered = io.BufferedReader(raw, buffer_size)  # type: ignore
+    else:
+        buffered = io.BufferedWriter(raw, buffer_size)  # type: ignore
+    return io.TextIOWrapper(buffered)  # type: ignore
@@ -1,42 +1,456 @@
 # -*- coding: utf-8 -*-
-__all__ = ('Daikon',)
+__all__ = ('Daikon', 'MiningSession', 'TraceSession')
 
+from types import TracebackType
+from typing import (IO, Callable, Collection, Dict, Iterable, Iterator, List,
+                    Optional, Sequence, Tuple, Type, Union)
+import concurrent.futures
 import contextlib
+import functools
+import hashlib
+import io
 import pkg_resources
 import os
 import shlex
+import shutil
+import sys
+import tempfile
+import time
 
 from loguru import logger
 import dockerblade
 import attr
 
+from .compression import DEFAULT_BUFFER_SIZE, is_compressed
+from .declarations import Declarations
+from .helpers import iter_lines
+from .invariant import Invariant, InvariantMap, InvariantReader
+from .ppt import ProgramPoint
+from .serialized import SerializedInvariants
+from .sharding import Shard, write_shards
+from .trace import TraceWriter
+from ..cache import DiskCache, content_key
+from ..container_pool import ContainerPool
+from ..docker_exec import ExecProcess, exec_with_stdin
 from ..docker_tool import DockerTool
+from ..local_shell import LocalPopen, LocalShell
+
+BACKENDS = ('auto', 'docker', 'local')
+
+_Shell = Union[dockerblade.Shell, LocalShell]
+_StdinProcess = Union[ExecProcess, LocalPopen]
+
+_DAIKON_FLAGS = '--no_show_progress --noversion'
+
+# the version of the layout of cached results, which is included in their key
+_CACHE_FORMAT = '1'
+
+
+def _tee(chunks: Iterable[bytes], fh: IO[bytes]) -> Iterator[bytes]:
+    """Writes each of the given chunks to a file as it is yielded."""
+    for chunk in chunks:
+        fh.write(chunk)
+        yield chunk
+
+
+def _copy_from_container(container: dockerblade.Container,
+                         path: str,
+                         destination: str
+                         ) -> None:
+    container.filesystem().copy_to_host(path, destination)
+
+
+def _print_invariants(java: str,
+                      filename: str,
+                      ppt_select_pattern: Optional[str] = None
+                      ) -> str:
+    """Returns the command that prints the serialized invariants within a
+    given file, using a given command to launch the JVM."""
+    command = f'{java} daikon.PrintInvariants'
+    if ppt_select_pattern is not None:
+        pattern = shlex.quote(f'--ppt-select-pattern={ppt_select_pattern}')
+        command += f' {pattern}'
+    return f'{command} {shlex.quote(filename)}'
+
+
+def _merge_invariants(java: str,
+                      filenames: Sequence[str],
+                      output_filename: str
+                      ) -> str:
+    """Returns the command that merges the serialized invariants within the
+    given files into a given file, using a given command to launch the
+    JVM."""
+    return (f'{java} daikon.MergeInvariants '
+            f'-o {shlex.quote(output_filename)} '
+            f"{' '.join(shlex.quote(f) for f in filenames)}")
+
+
+def _run_daikon(java: str,
+                filenames: Sequence[str],
+                output_filename: str,
+                *,
+                text_output: bool = False
+                ) -> str:
+    """Returns the command that mines invariants from the given files and
+    serializes them to a given file, using a given command to launch the
+    JVM. If :code:`text_output` is set, the invariants are also printed."""
+    flags = _DAIKON_FLAGS if text_output \
+        else f'{_DAIKON_FLAGS} --no_text_output'
+    return (f'{java} daikon.Daikon {flags} '
+            f'-o {shlex.quote(output_filename)} '
+            f"{' '.join(shlex.quote(f) for f in filenames)}")
+
+
+def _stream_lines(shell: _Shell,
+                  command: str,
+                  tee: Optional[IO[bytes]] = None
+                  ) -> Iterator[str]:
+    """Yields the lines of the output of a command as they are produced,
+    and optionally writes the output to a given file.
+
+    Raises
+    ------
+    dockerblade.CalledProcessError
+        If the command fails.
+    """
+    started_at = time.monotonic()
+    process = shell.popen(command, encoding=None)
+    chunks: Iterable[bytes] = process.stream  # type: ignore
+    if tee is not None:
+        chunks = _tee(chunks, tee)
+    yield from iter_lines(chunks)
+    returncode = process.wait()
+    if returncode != 0:
+        duration = time.monotonic() - started_at
+        raise dockerblade.CalledProcessError(cmd=command,
+                                             returncode=returncode,
+                                             duration=duration,
+                                             output=None)
+
+
+def _print_lines(session: 'MiningSession',
+                 tee: Optional[IO[bytes]] = None
+                 ) -> Iterator[str]:
+    """Yields the lines of the text invariants that are printed by
+    PrintInvariants for a given session. See :func:`_stream_lines`."""
+    command = _print_invariants(session.java, session.output_filename)
+    yield from _stream_lines(session.shell, command, tee)
+
+
+@attr.s(frozen=True, slots=True)
+class MiningSession:
+    """Provides access to the environment in which Daikon is executed, and
+    to the invariants that were mined by Daikon, until it is closed.
+    Sessions are created by :meth:`Daikon.open_session`, and are closed
+    by using them as a context manager.
+
+    Attributes
+    ----------
+    shell: Union[dockerblade.Shell, LocalShell]
+        The shell in which Daikon was executed.
+    java: str
+        The command that launches the JVM within that shell.
+    filenames: Tuple[str, ...]
+        The paths of the input files within that shell.
+    output_filename: str
+        The path of the serialized invariants within that shell.
+
+    Note
+    ----
+    This is implemented as a class, rather than a generator-based context
+    manager, since :class:`dockerblade.CalledProcessError` is immutable and
+    so cannot be thrown through a generator.
+    """
+    _stack: contextlib.ExitStack = attr.ib()
+    shell: _Shell = attr.ib()
+    java: str = attr.ib()
+    filenames: Tuple[str, ...] = attr.ib()
+    output_filename: str = attr.ib()
+    _fetch: Callable[[str], None] = attr.ib(repr=False)
+
+    def __enter__(self) -> 'MiningSession':
+        return self
+
+    def fetch(self, destination: str) -> None:
+        """Copies the serialized invariants to a given file on the host."""
+        self._fetch(destination)
+
+    def __exit__(self,
+                 ex_type: Optional[Type[BaseException]],
+                 ex_val: Optional[BaseException],
+                 ex_tb: Optional[TracebackType]
+                 ) -> None:
+        self._stack.__exit__(ex_type, ex_val, ex_tb)
+
+
+def _popen_stdin(shell: _Shell, command: str) -> _StdinProcess:
+    """Executes a command within a given shell, without waiting for it to
+    finish, and attaches to its standard input. The output of the command is
+    discarded."""
+    if isinstance(shell, LocalShell):
+        return shell.popen(command, stdin=True, stdout=False)
+    return exec_with_stdin(shell.container, command)
+
+
+class _StdinStream(io.RawIOBase):
+    """Writes to the standard input of a process, which is closed when this
+    stream is closed."""
+    def __init__(self, process: _StdinProcess) -> None:
+        self._process = process
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:  # type: ignore
+        self._process.write(bytes(data))
+        return len(data)
+
+    def close(self) -> None:
+        if not self.closed:
+            super().close()
+            self._process.close_stdin()
+
+
+@attr.s(eq=False, repr=False)
+class TraceSession:
+    """A running Daikon process that reads its trace from its standard
+    input, rather than from a file.
+
+    Records that are written via :attr:`writer` are sent to Daikon as they
+    are written, so that generating the trace overlaps with mining it, and
+    no trace file is written to disk. Closing the session, or leaving its
+    context, waits for Daikon to finish and reads the invariants that it
+    mined. If the context is left because of an exception, Daikon is
+    stopped instead.
+
+    Attributes
+    ----------
+    declarations: Declarations
+        The declarations for the trace.
+    writer: TraceWriter
+        The writer for the records of the trace. It should only be used
+        while the session is open.
+    """
+    declarations: Declarations = attr.ib()
+    writer: TraceWriter = attr.ib()
+    _stack: contextlib.ExitStack = attr.ib()
+    _session: MiningSession = attr.ib()
+    _process: _StdinProcess = attr.ib()
+    _command: str = attr.ib()
+    _started_at: float = attr.ib(factory=time.monotonic)
+    _invariants: Optional[InvariantMap] = attr.ib(init=False, default=None)
+    _closed: bool = attr.ib(init=False, default=False)
+
+    def __enter__(self) -> 'TraceSession':
+        return self
+
+    def __exit__(self,
+                 ex_type: Optional[Type[BaseException]],
+                 ex_val: Optional[BaseException],
+                 ex_tb: Optional[TracebackType]
+                 ) -> None:
+        if ex_type is None:
+            self.close()
+        elif not self._closed:
+            self._abort(ex_type, ex_val, ex_tb)
+
+    @property
+    def invariants(self) -> InvariantMap:
+        """The invariants that were mined by Daikon.
+
+        Raises
+        ------
+        RuntimeError
+            If the session has not been closed.
+        """
+        if self._invariants is None:
+            raise RuntimeError('invariants are not available until the '
+                               'session has been closed')
+        return self._invariants
+
+    def _abort(self,
+               ex_type: Optional[Type[BaseException]],
+               ex_val: Optional[BaseException],
+               ex_tb: Optional[TracebackType]
+               ) -> None:
+        """Stops Daikon and closes the session."""
+        self._closed = True
+        logger.debug(f'stopping Daikon trace session: {self._command}')
+        if isinstance(self._process, LocalPopen):
+            self._process.kill()
+        # containers are destroyed, or discarded by the pool, and so the
+        # process inside them is stopped
+        self._stack.__exit__(ex_type, ex_val, ex_tb)
+
+    def abort(self) -> None:
+        """Stops Daikon without waiting for it to finish."""
+        if not self._closed:
+            self._abort(None, None, None)
+
+    def close(self) -> InvariantMap:
+        """Closes the trace, waits for Daikon to finish, and returns the
+        invariants that it mined.
+
+        Raises
+        ------
+        RuntimeError
+            If the session was aborted.
+        dockerblade.CalledProcessError
+            If Daikon fails.
+        """
+        if self._invariants is not None:
+            return self._invariants
+        if self._closed:
+            raise RuntimeError('trace session was aborted')
+        self._closed = True
+        try:
+            self.writer.flush()
+            self.writer.output.close()
+            returncode = self._process.wait()
+            if returncode != 0:
+                duration = time.monotonic() - self._started_at
+                raise dockerblade.CalledProcessError(cmd=self._command,
+                                                     returncode=returncode,
+                                                     duration=duration,
+                                                     output=None)
+            reader = InvariantReader(self.declarations)
+            lines = _print_lines(self._session)
+            self._invariants = InvariantMap.from_stream(
+                self.declarations, reader.read_lines(lines))
+        except BaseException:
+            self._stack.__exit__(*sys.exc_info())
+            raise
+        self._stack.close()
+        return self._invariants
 
 
 @attr.s(frozen=True)
 class Daikon(DockerTool):
+    """Provides an interface to Daikon.
+
+    By default, Daikon is executed within a Docker container (the
+    :code:`docker` backend). Alternatively, it may be executed directly on
+    the host, using an existing installation of Java and Daikon (the
+    :code:`local` backend), or on the host if the :code:`java` executable
+    and the Daikon classpath can be found, and within Docker otherwise (the
+    :code:`auto` backend).
+
+    Attributes
+    ----------
+    client: dockerblade.DockerDaemon
+        The Docker daemon that is used to provision containers.
+    pool: ContainerPool, optional
+        If given, Daikon is executed within warm containers that are taken
+        from this pool, rather than a fresh container for each job.
+    backend: str
+        The backend that is used to execute Daikon: :code:`auto`,
+        :code:`docker`, or :code:`local`.
+    java: str
+        The name or path of the :code:`java` executable on the host.
+    classpath: str, optional
+        The classpath for Daikon on the host. If unspecified, the
+        :code:`daikon.jar` within :code:`$DAIKONDIR` is used, if it exists;
+        otherwise, the classpath is determined by :code:`$CLASSPATH`.
+    jvm_flags: Tuple[str, ...]
+        Additional flags for the JVM (e.g., :code:`-Xmx4g`), which are used
+        by both backends.
+    cache: DiskCache, optional
+        If given, the results of each run are retrieved from, or else stored
+        in, this cache. Results are keyed by the contents of the input files,
+        the options for Daikon, and the identity of the Daikon installation
+        (i.e., the Dockerfile for the image, or the java executable and
+        classpath on the host). Cached results are returned without
+        consulting Docker.
+    single_jvm: bool
+        If :code:`True`, the text invariants are printed by Daikon itself,
+        rather than by a separate invocation of PrintInvariants on the
+        serialized invariants, so that a single JVM is launched for each
+        run. The output may include the progress messages of Daikon before
+        the first program point, which are ignored by
+        :class:`InvariantReader`.
+    """
     client: dockerblade.DockerDaemon = \
         attr.ib(default=dockerblade.DockerDaemon())
+    pool: Optional[ContainerPool] = attr.ib(default=None)
+    backend: str = attr.ib(default='docker',
+                           validator=attr.validators.in_(BACKENDS))
+    java: str = attr.ib(default='java')
+    classpath: Optional[str] = attr.ib(default=None)
+    jvm_flags: Tuple[str, ...] = attr.ib(default=(), converter=tuple)
+    cache: Optional[DiskCache] = attr.ib(default=None)
+    single_jvm: bool = attr.ib(default=False)
     IMAGE = 'specminers/daikon'
     _DOCKER_DIRECTORY = os.path.dirname(pkg_resources.resource_filename(__name__, 'Dockerfile'))  # noqa
 
-    def __call__(self, *filenames: str) -> str:
-        """Executes the Daikon binary.
+    def _local_classpath(self) -> Optional[str]:
+        """Returns the classpath for Daikon on the host, if it is known."""
+        if self.classpath is not None:
+            return self.classpath
+        daikon_dir = os.environ.get('DAIKONDIR')
+        if daikon_dir:
+            filename = os.path.join(daikon_dir, 'daikon.jar')
+            if os.path.isfile(filename):
+                return filename
+        return None
 
-        Raises
-        ------
-        ValueError
-            If no filenames are provided as input.
-        FileNotFoundError
-            If a given input file cannot be found.
-        RuntimeError
-            If the image for the tool has not been installed.
-        """
-        if not self.is_installed():
-            message = f'image for tool is not installed [{self.IMAGE}]'
-            raise RuntimeError(message)
+    def _has_local_installation(self) -> bool:
+        if shutil.which(self.java) is None:
+            return False
+        if self._local_classpath() is not None:
+            return True
+        return 'daikon.jar' in os.environ.get('CLASSPATH', '')
 
-        logger.debug(f"running Daikon on files: {', '.join(filenames)}")
+    @property
+    def selected_backend(self) -> str:
+        """The backend that is used to execute Daikon: either
+        :code:`docker` or :code:`local`."""
+        if self.backend != 'auto':
+            return self.backend
+        return 'local' if self._has_local_installation() else 'docker'
+
+    def _java_command(self, backend: str) -> str:
+        """Returns the command that launches the JVM for a given backend."""
+        args: List[str] = ['java' if backend == 'docker' else self.java]
+        args += self.jvm_flags
+        classpath = self._local_classpath() if backend == 'local' else None
+        if classpath is not None:
+            args += ['-cp', classpath]
+        return ' '.join(shlex.quote(arg) for arg in args)
+
+    def _identity(self, backend: str) -> str:
+        """Describes the Daikon installation that is used by a given backend,
+        without consulting Docker."""
+        if backend == 'docker':
+            dockerfile = os.path.join(self._DOCKER_DIRECTORY, 'Dockerfile')
+            with open(dockerfile, 'rb') as fh:
+                digest = hashlib.sha256(fh.read()).hexdigest()
+            return f'{self.IMAGE}@{digest}'
+        java = shutil.which(self.java) or self.java
+        classpath = self._local_classpath()
+        if classpath is None:
+            classpath = os.environ.get('CLASSPATH', '')
+        parts = [os.path.realpath(java), classpath]
+        for path in [java] + classpath.split(os.pathsep):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            parts.append(f'{stat.st_size}:{stat.st_mtime_ns}')
+        return '\0'.join(parts)
+
+    def _cache_key(self, backend: str, filenames: Sequence[str]) -> str:
+        """Computes the key for the results of mining the given files."""
+        # Daikon determines the kind of each file from its name
+        kinds = ' '.join(os.path.basename(fn).partition('.')[2]
+                         for fn in filenames)
+        mode = 'single-jvm' if self.single_jvm else 'print-invariants'
+        return content_key(filenames, 'daikon', _CACHE_FORMAT, backend,
+                           self._identity(backend),
+                           self._java_command(backend), _DAIKON_FLAGS, mode,
+                           kinds)
+
+    def _check_inputs(self, filenames: Sequence[str]) -> Tuple[str, ...]:
+        """Checks the given input files and returns their absolute paths."""
         if not filenames:
             raise ValueError('expected one or more filenames as input')
 
@@ -46,30 +460,472 @@ class Daikon(DockerTool):
         for filename in filenames:
             if not os.path.isfile(filename):
                 raise FileNotFoundError(filename)
+            if is_compressed(filename) and not filename.endswith('.gz'):
+                message = ('Daikon only supports gzip-compressed input files: '
+                           f'{filename}')
+                raise ValueError(message)
+        return filenames
 
-        ctr_dir = '/tmp/.specminers'
-        host_to_ctr_fn = {fn: os.path.join(ctr_dir, os.path.basename(fn))
-                          for fn in filenames}
-        ctr_filenames = [fn for fn in host_to_ctr_fn.values()]
-        volumes = {fn_host: {'bind': fn_ctr, 'mode': 'ro'}
-                   for fn_host, fn_ctr in host_to_ctr_fn.items()}
+    def open_session(self, *filenames: str) -> MiningSession:
+        """Prepares an environment in which Daikon can be executed on the
+        given files and returns a session that provides a shell for that
+        environment, together with the paths of the input files and of the
+        serialized invariants within it. The container is destroyed, or
+        returned to the pool, once the session is closed. The commands that
+        mine invariants within the session are given by :meth:`commands`.
 
-        # launch container
-        with contextlib.ExitStack() as stack:
-            container = self.client.provision(self.IMAGE, volumes=volumes)
-            shell = container.shell('/bin/sh')
-            stack.callback(container.remove)
+        Raises
+        ------
+        RuntimeError
+            If the selected backend is unavailable.
+        FileNotFoundError
+            If an input file does not exist.
+        ValueError
+            If an input file is compressed using a format other than gzip.
+        """
+        backend = self.selected_backend
+        if backend == 'local' and shutil.which(self.java) is None:
+            message = f'java executable not found [{self.java}]'
+            raise RuntimeError(message)
+        if backend == 'docker' and not self.is_installed():
+            message = f'image for tool is not installed [{self.IMAGE}]'
+            raise RuntimeError(message)
+
+        filenames = self._check_inputs(filenames)
+        logger.debug(f"running Daikon on files: {', '.join(filenames)}")
+        java = self._java_command(backend)
+        stack = contextlib.ExitStack()
+        try:
+            shell: _Shell
+            fetch: Callable[[str], None]
+            if backend == 'local':
+                shell = LocalShell()
+                ctr_filenames: Sequence[str] = filenames
+                output_dir = stack.enter_context(
+                    tempfile.TemporaryDirectory(prefix='specminers-'))
+                output_filename = os.path.join(output_dir, 'mined.inv.gz')
+                fetch = functools.partial(shutil.copyfile, output_filename)
+            elif self.pool is not None:
+                job = stack.enter_context(self.pool.job(filenames))
+                shell = job.shell
+                ctr_filenames = job.filenames
+                output_filename = f'{job.directory}/mined.inv.gz'
+                fetch = functools.partial(
+                    shutil.copyfile,
+                    os.path.join(job.host_directory, 'mined.inv.gz'))
+            else:
+                ctr_dir = '/tmp/.specminers'
+                host_to_ctr_fn = {
+                    fn: os.path.join(ctr_dir, os.path.basename(fn))
+                    for fn in filenames}
+                ctr_filenames = [fn for fn in host_to_ctr_fn.values()]
+                volumes = {fn_host: {'bind': fn_ctr, 'mode': 'ro'}
+                           for fn_host, fn_ctr in host_to_ctr_fn.items()}
+
+                # launch container
+                container = self.client.provision(self.IMAGE,
+                                                  volumes=volumes)
+                stack.callback(container.remove)
+                shell = container.shell('/bin/sh')
+                output_filename = '/tmp/mined.inv.tgz'
+                fetch = functools.partial(_copy_from_container, container,
+                                          output_filename)
+        except BaseException:
+            stack.__exit__(*sys.exc_info())
+            raise
+        return MiningSession(stack, shell, java, tuple(ctr_filenames),
+                             output_filename, fetch)
 
+    def _mine(self, filenames: Sequence[str]) -> MiningSession:
+        """Mines invariants from the given files and returns a session that
+        provides access to the serialized invariants. See
+        :meth:`open_session`."""
+        session = self.open_session(*filenames)
+        try:
             # generate invariants
-            command = ('java daikon.Daikon '
-                       '--no_show_progress --no_text_output --noversion '
-                       '-o /tmp/mined.inv.tgz '
-                       f"{' '.join(shlex.quote(f) for f in ctr_filenames)}")
-            shell.check_call(command)
+            session.shell.check_call(_run_daikon(session.java,
+                                                 session.filenames,
+                                                 session.output_filename))
+        except BaseException:
+            session.__exit__(*sys.exc_info())
+            raise
+        return session
+
+    def commands(self, session: MiningSession) -> List[str]:
+        """Returns the commands that mine invariants within a given session
+        and print them, in the order in which they should be executed. The
+        text invariants are given by the output of the last command."""
+        command = _run_daikon(session.java, session.filenames,
+                              session.output_filename,
+                              text_output=self.single_jvm)
+        if self.single_jvm:
+            return [command]
+        return [command,
+                _print_invariants(session.java, session.output_filename)]
+
+    def _run(self, session: MiningSession) -> str:
+        """Mines invariants within a given session and returns the text
+        invariants."""
+        *commands, last = self.commands(session)
+        for command in commands:
+            session.shell.check_call(command)
+        return session.shell.check_output(last)
+
+    def _run_lines(self,
+                   session: MiningSession,
+                   tee: Optional[IO[bytes]] = None
+                   ) -> Iterator[str]:
+        """Mines invariants within a given session and yields the lines of
+        the text invariants as they are produced."""
+        *commands, last = self.commands(session)
+        for command in commands:
+            session.shell.check_call(command)
+        yield from _stream_lines(session.shell, last, tee)
+
+    def _store_serialized(self, key: str, session: MiningSession) -> None:
+        """Stores the serialized invariants for a session in the cache."""
+        assert self.cache is not None
+        with tempfile.TemporaryDirectory(prefix='specminers-') as directory:
+            filename = os.path.join(directory, 'mined.inv.gz')
+            session.fetch(filename)
+            self.cache.put_file(f'{key}inv', filename)
+
+    def __call__(self, *filenames: str) -> str:
+        """Executes the Daikon binary.
+
+        Declarations and trace files that are compressed using gzip (i.e.,
+        that end in :code:`.gz`) are read by Daikon directly, without being
+        decompressed on the host.
 
-            # read invariants
-            command = 'java daikon.PrintInvariants /tmp/mined.inv.tgz'
-            output = shell.check_output(command)
+        Raises
+        ------
+        ValueError
+            If no filenames are provided as input, or if an input file is
+            compressed using a method other than gzip.
+        FileNotFoundError
+            If a given input file cannot be found.
+        RuntimeError
+            If the image for the tool has not been installed, or, when using
+            the local backend, if the java executable cannot be found.
+        """
+        if self.cache is None:
+            with self.open_session(*filenames) as session:
+                output = self._run(session)
+            logger.debug(f"daikon output:\n{output}")
+            return output
 
+        # the lock prevents other processes from mining the same inputs
+        filenames = self._check_inputs(filenames)
+        key = self._cache_key(self.selected_backend, filenames)
+        with self.cache.lock(key):
+            contents = self.cache.get(f'{key}out')
+            if contents is not None:
+                logger.debug('using cached Daikon output')
+                return contents.decode('utf-8')
+            with self.open_session(*filenames) as session:
+                output = self._run(session)
+                self._store_serialized(key, session)
+            self.cache.put(f'{key}out', output.encode('utf-8'))
         logger.debug(f"daikon output:\n{output}")
         return output
+
+    def serialize(self, destination: str, *filenames: str) -> None:
+        """Executes the Daikon binary and writes the serialized invariants
+        (i.e., the :code:`.inv.gz` file that is produced by Daikon) to a
+        given file on the host.
+
+        Raises
+        ------
+        See :meth:`__call__`.
+        """
+        if self.cache is None:
+            with self._mine(filenames) as session:
+                session.fetch(destination)
+            return
+
+        filenames = self._check_inputs(filenames)
+        key = self._cache_key(self.selected_backend, filenames)
+        with self.cache.lock(key):
+            if self.cache.get_file(f'{key}inv', destination):
+                logger.debug('using cached serialized invariants')
+                return
+            with self._mine(filenames) as session:
+                session.fetch(destination)
+            self.cache.put_file(f'{key}inv', destination)
+
+    def mine(self,
+             destination: str,
+             *filenames: str
+             ) -> Tuple[str, SerializedInvariants]:
+        """Executes Daikon in a single JVM, regardless of
+        :attr:`single_jvm`, and returns its text output together with a
+        handle for the serialized invariants, which are written to a given
+        file on the host. The handle can be used to reprint, filter, or
+        merge the invariants without mining them again.
+
+        Raises
+        ------
+        See :meth:`__call__`.
+        """
+        daikon = self if self.single_jvm else attr.evolve(self,
+                                                          single_jvm=True)
+        handle = SerializedInvariants(os.path.abspath(destination), self)
+        if daikon.cache is None:
+            with daikon.open_session(*filenames) as session:
+                output = daikon._run(session)
+                session.fetch(destination)
+            return output, handle
+
+        filenames = daikon._check_inputs(filenames)
+        key = daikon._cache_key(daikon.selected_backend, filenames)
+        with daikon.cache.lock(key):
+            # the output and the serialized invariants are counted as a
+            # single lookup
+            contents = daikon.cache.get(f'{key}out', record=False)
+            hit = contents is not None and daikon.cache.get_file(
+                f'{key}inv', destination, record=False)
+            daikon.cache.record_lookup(hit)
+            if contents is not None and hit:
+                logger.debug('using cached Daikon output')
+                return contents.decode('utf-8'), handle
+            with daikon.open_session(*filenames) as session:
+                output = daikon._run(session)
+                session.fetch(destination)
+            daikon.cache.put_file(f'{key}inv', destination)
+            daikon.cache.put(f'{key}out', output.encode('utf-8'))
+        return output, handle
+
+    def print_invariants(self,
+                         filename: str,
+                         *,
+                         ppt_select_pattern: Optional[str] = None
+                         ) -> str:
+        """Prints the serialized invariants within a given file on the host
+        via PrintInvariants.
+
+        Parameters
+        ----------
+        filename: str
+            The serialized invariants (e.g., from :meth:`mine`).
+        ppt_select_pattern: str, optional
+            If given, only the program points whose names match this regular
+            expression are printed.
+
+        Raises
+        ------
+        See :meth:`__call__`.
+        """
+        with self.open_session(filename) as session:
+            command = _print_invariants(session.java, session.filenames[0],
+                                        ppt_select_pattern)
+            return session.shell.check_output(command)
+
+    def merge_invariants(self,
+                         destination: str,
+                         *filenames: str
+                         ) -> SerializedInvariants:
+        """Merges the serialized invariants within the given files on the
+        host via MergeInvariants, and writes the result to a given file.
+
+        Raises
+        ------
+        See :meth:`__call__`.
+        """
+        with self.open_session(*filenames) as session:
+            session.shell.check_call(_merge_invariants(
+                session.java, session.filenames, session.output_filename))
+            session.fetch(destination)
+        return SerializedInvariants(os.path.abspath(destination), self)
+
+    def _stream_cached(self, key: str) -> Optional[Iterator[str]]:
+        """Returns the lines of the cached output for a given key, if any."""
+        assert self.cache is not None
+        fh = self.cache.open(f'{key}out')
+        if fh is None:
+            return None
+        logger.debug('using cached Daikon output')
+
+        def read() -> Iterator[str]:
+            with fh:
+                chunks = iter(lambda: fh.read(65536), b'')
+                yield from iter_lines(chunks)
+        return read()
+
+    def stream(self, *filenames: str) -> Iterator[str]:
+        """Executes the Daikon binary and yields the lines of its output as
+        they are produced, without holding the entire output in memory.
+        The container is destroyed once the output has been consumed or the
+        iterator is closed.
+
+        If a cache is used, the output is stored in the cache only once it
+        has been consumed in full.
+
+        Raises
+        ------
+        ValueError
+            If no filenames are provided as input, or if an input file is
+            compressed using a method other than gzip.
+        FileNotFoundError
+            If a given input file cannot be found.
+        RuntimeError
+            If the image for the tool has not been installed, or, when using
+            the local backend, if the java executable cannot be found.
+        dockerblade.CalledProcessError
+            If Daikon or PrintInvariants fails.
+        """
+        key: Optional[str] = None
+        if self.cache is not None:
+            filenames = self._check_inputs(filenames)
+            key = self._cache_key(self.selected_backend, filenames)
+            cached = self._stream_cached(key)
+            if cached is not None:
+                yield from cached
+                return
+
+        with contextlib.ExitStack() as stack:
+            tee: Optional[IO[bytes]] = None
+            if key is not None:
+                tee = stack.enter_context(
+                    tempfile.NamedTemporaryFile(prefix='specminers-'))
+            with self.open_session(*filenames) as session:
+                yield from self._run_lines(session, tee)
+                if key is not None:
+                    self._store_serialized(key, session)
+            if tee is not None and key is not None:
+                assert self.cache is not None
+                tee.flush()
+                self.cache.put_file(f'{key}out', tee.name)
+
+    def session(self,
+                declarations: Declarations,
+                *,
+                buffer_size: int = DEFAULT_BUFFER_SIZE
+                ) -> TraceSession:
+        """Starts Daikon on a trace that is written via the returned session,
+        whose records are piped to the standard input of Daikon, rather than
+        written to a file. The declarations are written to a temporary file.
+
+        Parameters
+        ----------
+        declarations: Declarations
+            The declarations for the trace.
+        buffer_size: int
+            The number of characters that are buffered by the writer for the
+            session before they are sent to Daikon.
+
+        Raises
+        ------
+        RuntimeError
+            If the image for the tool has not been installed, or, when using
+            the local backend, if the java executable cannot be found.
+        """
+        stack = contextlib.ExitStack()
+        try:
+            directory = stack.enter_context(
+                tempfile.TemporaryDirectory(prefix='specminers-'))
+            decls_filename = os.path.join(directory, 'trace.decls')
+            declarations.save(decls_filename)
+            session = stack.enter_context(self.open_session(decls_filename))
+            # Daikon reads the trace from its standard input, given by '-'
+            command = _run_daikon(session.java,
+                                  session.filenames + ('-',),
+                                  session.output_filename)
+            process = _popen_stdin(session.shell, command)
+            stream = io.TextIOWrapper(
+                io.BufferedWriter(_StdinStream(process)),  # type: ignore
+                encoding='utf-8')
+            writer = TraceWriter(declarations, stream,
+                                 buffer_size=buffer_size)
+        except BaseException:
+            stack.__exit__(*sys.exc_info())
+            raise
+        return TraceSession(declarations, writer, stack, session, process,
+                            command)
+
+    def invariants(self,
+                   declarations: Declarations,
+                   *filenames: str
+                   ) -> Iterator[Tuple[ProgramPoint, List[Invariant]]]:
+        """Executes the Daikon binary and yields each program point and its
+        invariants as they are read from its output. The results can be
+        collected via :meth:`InvariantMap.from_stream`.
+
+        Raises
+        ------
+        See :meth:`stream`.
+        """
+        reader = InvariantReader(declarations)
+        yield from reader.read_lines(self.stream(*filenames))
+
+    def _mine_shard(self,
+                    declarations: Declarations,
+                    shard: Shard
+                    ) -> Dict[str, Collection[Invariant]]:
+        filenames = (shard.declarations_filename,) + shard.trace_filenames
+        return {ppt.name: invariants for ppt, invariants
+                in self.invariants(declarations, *filenames)}
+
+    def mine_parallel(self,
+                      declarations_filename: str,
+                      *trace_filenames: str,
+                      workers: Optional[int] = None,
+                      num_shards: Optional[int] = None
+                      ) -> InvariantMap:
+        """Mines invariants from a declarations file and a number of trace
+        files by partitioning their program points into shards, mining each
+        shard concurrently, and merging the results.
+
+        The program points of each method are kept within the same shard,
+        and shards are balanced by their number of trace records. The merged
+        invariants are the same as those that are obtained by mining the
+        files as a whole, provided that the declarations do not contain class
+        or object program points; if they do, the files are mined as a single
+        shard.
+
+        Parameters
+        ----------
+        declarations_filename: str
+            The declarations file. Declarations that are embedded within
+            trace files are not supported.
+        trace_filenames: str
+            The trace files.
+        workers: int, optional
+            The maximum number of shards that are mined at once. Defaults to
+            the number of CPUs.
+        num_shards: int, optional
+            The maximum number of shards. Defaults to the number of workers.
+
+        Raises
+        ------
+        ValueError
+            If a trace contains a record for an unknown program point.
+        RuntimeError
+            If the image for the tool has not been installed, or, when using
+            the local backend, if the java executable cannot be found.
+        dockerblade.CalledProcessError
+            If Daikon fails on a shard.
+        """
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if num_shards is None:
+            num_shards = workers
+        declarations = Declarations.load(declarations_filename)
+        ppt_to_invariants: Dict[str, Collection[Invariant]] = {}
+        with tempfile.TemporaryDirectory(prefix='specminers-') as directory:
+            shards = write_shards(declarations,
+                                  declarations_filename,
+                                  trace_filenames,
+                                  num_shards,
+                                  directory)
+            with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+                futures = [executor.submit(self._mine_shard, declarations,
+                                           shard)
+                           for shard in shards]
+                try:
+                    for future in concurrent.futures.as_completed(futures):
+                        ppt_to_invariants.update(future.result())
+                except BaseException:
+                    for future in futures:
+                        future.cancel()
+                    raise
+        return InvariantMap.build(declarations, ppt_to_invariants)
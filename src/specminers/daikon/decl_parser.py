@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+This module provides a fast, single-pass parser for Daikon declarations files.
+
+Unlike :class:`DeclarationsLoader`, which dispatches each line through a
+chain of loader objects, the parser reads the lines of a file in a single
+loop and dispatches each of them via a static table of keywords.
+"""
+__all__ = ('parse_declarations', 'parse_declarations_file')
+
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .compression import open_file
+from .declarations import Declarations
+from .ppt import ProgramPoint, PptType
+from .vardecl import VarDecl
+
+# the position of each variable attribute within its list of fields, and the
+# function that is used to convert its value
+_NAME, _KIND, _DEC_TYPE, _REP_TYPE, _COMPARABILITY, _CONSTANT, _FLAGS = \
+    range(7)
+
+_VARIABLE_FIELDS: Dict[str, Tuple[int, Callable[[str], Any]]] = {
+    'var-kind': (_KIND, str),
+    'dec-type': (_DEC_TYPE, str),
+    'rep-type': (_REP_TYPE, str),
+    'comparability': (_COMPARABILITY, int),
+    'constant': (_CONSTANT, str),
+    'flags': (_FLAGS, lambda s: tuple(s.split()))
+}
+
+# top-level keywords
+_PPT, _PPT_TYPE, _VARIABLE, _IGNORED = range(4)
+
+_KEYWORDS: Dict[str, int] = {
+    'ppt': _PPT,
+    'ppt-type': _PPT_TYPE,
+    'variable': _VARIABLE,
+    'decl-version': _IGNORED,
+    'input-language': _IGNORED,
+    'var-comparability': _IGNORED
+}
+
+_PPT_TYPES: Dict[str, PptType] = {t.value: t for t in PptType}
+
+
+class _Builder:
+    """Accumulates the program points within a declarations file."""
+    def __init__(self) -> None:
+        self.ppts: List[ProgramPoint] = []
+        self.name: Optional[str] = None
+        self.typ: Optional[PptType] = None
+        self.variables: List[VarDecl] = []
+        self.fields: Optional[List[Any]] = None
+
+    def finish_variable(self) -> None:
+        fields = self.fields
+        if fields is None:
+            return
+        self.fields = None
+        name = fields[_NAME]
+        if not (fields[_KIND] and fields[_DEC_TYPE] and fields[_REP_TYPE]):
+            message = ('incomplete declaration for variable '
+                       f'[{name}] in program point [{self.name}]')
+            raise ValueError(message)
+        self.variables.append(VarDecl(name,
+                                      fields[_DEC_TYPE],
+                                      fields[_REP_TYPE],
+                                      fields[_COMPARABILITY],
+                                      fields[_CONSTANT],
+                                      fields[_FLAGS]))
+
+    def finish_ppt(self) -> None:
+        self.finish_variable()
+        if self.name is None:
+            return
+        if self.typ is None:
+            message = f'missing type for program point [{self.name}]'
+            raise ValueError(message)
+        self.ppts.append(ProgramPoint.build(self.name,
+                                            self.variables,
+                                            self.typ))
+        self.name = None
+        self.typ = None
+        self.variables = []
+
+
+def parse_declarations(lines: Iterable[str]) -> Declarations:
+    """Parses the declarations described by a sequence of lines.
+
+    Lines that begin with :code:`#` are treated as comments. Keywords that
+    do not affect the contents of :class:`Declarations` (e.g.,
+    :code:`enclosing-var`) are ignored.
+
+    Raises
+    ------
+    ValueError
+        If the lines do not describe a valid set of declarations.
+    """
+    builder = _Builder()
+    keywords = _KEYWORDS
+    variable_fields = _VARIABLE_FIELDS
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if not line or line[0] == '#':
+            continue
+
+        # variable attributes are indented
+        if line[0] == ' ':
+            fields = builder.fields
+            if fields is None:
+                continue
+            keyword, _, value = line.lstrip(' ').partition(' ')
+            try:
+                position, convert = variable_fields[keyword]
+            except KeyError:
+                continue
+            fields[position] = convert(value)
+            continue
+
+        keyword, _, value = line.partition(' ')
+        code = keywords.get(keyword, _IGNORED)
+        if code == _VARIABLE:
+            builder.finish_variable()
+            if builder.name is None:
+                message = f'variable declared outside program point: {value}'
+                raise ValueError(message)
+            builder.fields = [value, None, None, None, None, None, ()]
+        elif code == _PPT:
+            builder.finish_ppt()
+            builder.name = value
+        elif code == _PPT_TYPE:
+            try:
+                builder.typ = _PPT_TYPES[value]
+            except KeyError:
+                raise ValueError(f'unknown program point type: {value}')
+        else:
+            # any other top-level keyword ends the current variable
+            builder.finish_variable()
+    builder.finish_ppt()
+    return Declarations(builder.ppts)
+
+
+def parse_declarations_file(filename: str) -> Declarations:
+    """Parses the declarations within a given file, which may be compressed.
+
+    Raises
+    ------
+    ValueError
+        If the file does not describe a valid set of declarations.
+    """
+    with open_file(filename, 'r') as fh:
+        return parse_declarations(fh.read().split('\n'))
@@ -3,12 +3,19 @@ __all__ = ('Declarations', 'DeclarationsLoader')
 
 from typing import Iterator, List, Mapping, Optional, Sequence
 import collections
+import pickle
 
 from loguru import logger
 import attr
 
+from .compression import open_file
 from .loader import LineBuffer, LineLoader
 from .ppt import ProgramPoint, ProgramPointLoader
+from ..cache import DiskCache, content_key
+
+# identifies the layout of cached declarations, and must be changed whenever
+# the attributes of ProgramPoint or VarDecl change
+_CACHE_FORMAT = '2'
 
 
 class Declarations(Mapping[str, ProgramPoint]):
@@ -38,15 +45,64 @@ class Declarations(Mapping[str, ProgramPoint]):
         return '\n'.join(self.lines)
 
     @classmethod
-    def load(cls, filename: str) -> 'Declarations':
+    def load(cls,
+             filename: str,
+             *,
+             cache: Optional[DiskCache] = None,
+             lazy: bool = False
+             ) -> 'Declarations':
+        """Loads the declarations within a given file.
+
+        Parameters
+        ----------
+        filename: str
+            The name of the declarations file.
+        cache: DiskCache, optional
+            If given, the parsed declarations are retrieved from, or else
+            stored in, this cache, keyed by the contents of the file and the
+            version of this package.
+        lazy: bool
+            If :code:`True`, the file is scanned rather than parsed, and each
+            program point is parsed when it is first accessed. See
+            :class:`LazyDeclarations`. Cannot be combined with a cache.
+
+        Raises
+        ------
+        ValueError
+            If both a cache and lazy loading are requested.
+        """
+        if lazy:
+            if cache is not None:
+                raise ValueError('lazy declarations cannot be cached')
+            from .lazy_declarations import LazyDeclarations
+            return LazyDeclarations.from_file(filename)
+
+        key: Optional[str] = None
+        if cache is not None:
+            key = content_key([filename], 'declarations', _CACHE_FORMAT)
+            contents = cache.get(key)
+            if contents is not None:
+                logger.trace('loading cached declarations for file: '
+                             f'{filename}')
+                try:
+                    return pickle.loads(contents)
+                except Exception:
+                    logger.warning('ignoring corrupt cached declarations '
+                                   f'for file: {filename}')
+                    cache.discard(key)
+
+        from .decl_parser import parse_declarations_file
         logger.trace(f'loading declarations from file: {filename}')
-        declarations = DeclarationsLoader.from_file(filename)
+        declarations = parse_declarations_file(filename)
         logger.trace(f'loaded {len(declarations)} declarations from file')
+        if cache is not None and key is not None:
+            contents = pickle.dumps(declarations, pickle.HIGHEST_PROTOCOL)
+            cache.put(key, contents)
         return declarations
 
     def save(self, filename: str) -> None:
         """Saves the variable declarations to a given file on disk."""
-        with open(filename, 'w') as f:
+        with open_file(filename, 'w') as f:
             f.write(str(self))
 
 
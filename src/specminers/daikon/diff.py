@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+This module compares the invariants for each program point within two
+invariant maps (e.g., the results of two mining runs).
+
+Invariants are compared by their normalised forms, which are hashed, so that
+the cost of comparing two maps is linear in the number of invariants.
+"""
+__all__ = ('InvariantDiff', 'diff_invariants', 'normalise_invariant')
+
+from typing import (Collection, Dict, Iterator, List, Mapping, Optional,
+                    Tuple)
+import re
+
+import attr
+
+from .helpers import normalise_orig
+from .invariant import Invariant
+
+_NUMBER = re.compile(r'(?<![A-Za-z0-9_$.])'
+                     r'[0-9]+(?:\.[0-9]*)?(?:[eE][-+]?[0-9]+)?'
+                     r'(?![A-Za-z0-9_$])')
+_ONE_OF = re.compile(r'^(.*) one of \{(.*)\}$')
+
+
+def _normalise_number(match: 're.Match[str]') -> str:
+    text = match.group(0)
+    if '.' in text or 'e' in text or 'E' in text:
+        return repr(float(text))
+    return str(int(text))
+
+
+def normalise_invariant(text: str) -> str:
+    """Returns the normalised form of an invariant, such that invariants
+    that differ only in their whitespace, in the spelling of their numeric
+    constants (e.g., :code:`1.50` and :code:`1.5`), or in the order of the
+    elements of a :code:`one of` set, have the same normalised form."""
+    text = ' '.join(text.split())
+    text = normalise_orig(text)
+    text = _NUMBER.sub(_normalise_number, text)
+    match = _ONE_OF.match(text)
+    if match:
+        elements = sorted(e.strip() for e in match.group(2).split(','))
+        text = f'{match.group(1)} one of {{ {", ".join(elements)} }}'
+    return text
+
+
+def _shape(form: str) -> str:
+    """Returns the shape of a normalised invariant, in which each of its
+    numeric constants is replaced by a placeholder."""
+    match = _ONE_OF.match(form)
+    if match:
+        return f'{match.group(1)} one of {{ # }}'
+    return _NUMBER.sub('#', form)
+
+
+@attr.s(frozen=True, slots=True, auto_attribs=True)
+class InvariantDiff:
+    """Describes the differences between the invariants for a program point
+    within two invariant maps.
+
+    Attributes
+    ----------
+    ppt: str
+        The name of the program point.
+    added: List[Invariant]
+        The invariants that appear only within the new map.
+    removed: List[Invariant]
+        The invariants that appear only within the old map.
+    changed: List[Tuple[Invariant, Invariant]]
+        The pairs of old and new invariants that differ only in their
+        constants (e.g., :code:`x >= 0` and :code:`x >= 1`). An invariant is
+        paired only if it is the sole added or removed invariant of its
+        shape, and paired invariants are not reported as added or removed.
+    unchanged: List[Invariant]
+        The invariants that appear within both maps, as given by the new map.
+    """
+    ppt: str
+    added: List[Invariant]
+    removed: List[Invariant]
+    changed: List[Tuple[Invariant, Invariant]]
+    unchanged: List[Invariant]
+
+    @property
+    def is_empty(self) -> bool:
+        """Indicates whether the invariants for the program point are the
+        same within both maps."""
+        return not (self.added or self.removed or self.changed)
+
+
+def _pair_changes(added: List[Invariant],
+                  removed: List[Invariant],
+                  forms: Mapping[str, str]
+                  ) -> List[Tuple[Invariant, Invariant]]:
+    """Pairs added and removed invariants that share a unique shape, and
+    removes them from the given lists."""
+    added_by_shape: Dict[str, List[Invariant]] = {}
+    for invariant in added:
+        shape = _shape(forms[invariant.text])
+        added_by_shape.setdefault(shape, []).append(invariant)
+    removed_by_shape: Dict[str, List[Invariant]] = {}
+    for invariant in removed:
+        shape = _shape(forms[invariant.text])
+        removed_by_shape.setdefault(shape, []).append(invariant)
+
+    changed: List[Tuple[Invariant, Invariant]] = []
+    for shape, old in removed_by_shape.items():
+        new = added_by_shape.get(shape)
+        if new is not None and len(old) == 1 and len(new) == 1:
+            changed.append((old[0], new[0]))
+    if changed:
+        paired_old = {id(old) for old, _ in changed}
+        paired_new = {id(new) for _, new in changed}
+        removed[:] = [inv for inv in removed if id(inv) not in paired_old]
+        added[:] = [inv for inv in added if id(inv) not in paired_new]
+    return changed
+
+
+def _diff_ppt(ppt: str,
+              old: Collection[Invariant],
+              new: Collection[Invariant],
+              forms: Dict[str, str]
+              ) -> InvariantDiff:
+    def form(invariant: Invariant) -> str:
+        text = invariant.text
+        try:
+            return forms[text]
+        except KeyError:
+            result = forms[text] = normalise_invariant(text)
+            return result
+
+    old_by_form: Dict[str, Invariant] = {}
+    for invariant in old:
+        old_by_form.setdefault(form(invariant), invariant)
+
+    added: List[Invariant] = []
+    unchanged: List[Invariant] = []
+    new_forms = set()
+    for invariant in new:
+        new_form = form(invariant)
+        new_forms.add(new_form)
+        if new_form in old_by_form:
+            unchanged.append(invariant)
+        else:
+            added.append(invariant)
+    removed = [invariant for old_form, invariant in old_by_form.items()
+               if old_form not in new_forms]
+    changed = _pair_changes(added, removed, forms)
+    return InvariantDiff(ppt, added, removed, changed, unchanged)
+
+
+def diff_invariants(old: Mapping[str, Collection[Invariant]],
+                    new: Mapping[str, Collection[Invariant]],
+                    *,
+                    include_unchanged: bool = True
+                    ) -> Iterator[InvariantDiff]:
+    """Compares the invariants for each program point within two invariant
+    maps, and yields the differences for each program point, one program
+    point at a time.
+
+    Program points are visited in the order of the old map, followed by any
+    program points that appear only within the new map. Program points that
+    are missing from a map are treated as having no invariants.
+
+    Parameters
+    ----------
+    old: Mapping[str, Collection[Invariant]]
+        The old invariant map (e.g., the results of a previous run).
+    new: Mapping[str, Collection[Invariant]]
+        The new invariant map.
+    include_unchanged: bool
+        If :code:`False`, program points whose invariants are the same
+        within both maps are not reported.
+    """
+    # the normalised form of each distinct text, which is shared across
+    # program points, since the same texts are frequently repeated
+    forms: Dict[str, str] = {}
+    empty: Tuple[Invariant, ...] = ()
+    for ppt in old:
+        new_invariants: Optional[Collection[Invariant]] = new.get(ppt)
+        diff = _diff_ppt(ppt, old[ppt], new_invariants or empty, forms)
+        if include_unchanged or not diff.is_empty:
+            yield diff
+    for ppt in new:
+        if ppt not in old:
+            diff = _diff_ppt(ppt, empty, new[ppt], forms)
+            if include_unchanged or not diff.is_empty:
+                yield diff
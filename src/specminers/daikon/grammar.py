@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+This module provides access to the grammar for the invariants that are
+reported by Daikon, given by :code:`daikon.lark`, and to the syntax trees
+and equality semantics that are shared by the checkers and monitors that
+are compiled from those invariants.
+
+Syntax trees are nested tuples whose first element gives the kind of node:
+
+* :code:`('const', value)` for numbers and strings (strings retain their
+  surrounding quotes);
+* :code:`('var', name, orig)` for variables, where :code:`orig` indicates
+  whether the node refers to the value of the variable upon entry (i.e.,
+  :code:`orig(x)`);
+* :code:`('neg', operand)` for negation; and
+* :code:`(operation, lhs, rhs)` for each operation in :data:`OPERATORS`.
+
+Numeric equality is approximate: two values are considered equal if they
+differ by no more than a fraction, given by the tolerance, of the larger of
+their magnitudes. The magnitude of a constant or variable is its absolute
+value, and the magnitude of the result of an arithmetic operation is given
+by combining the magnitudes of its operands via the operation given by
+:data:`MAGNITUDE_OPERATIONS`.
+"""
+__all__ = ('DEFAULT_TOLERANCE', 'MAGNITUDE_OPERATIONS', 'OPERATORS', 'Syntax',
+           'build_parser', 'load_grammar', 'parse_invariant',
+           'syntax_variables')
+
+from typing import Any, Callable, FrozenSet, List, Mapping, Optional, Tuple
+import functools
+import operator
+import pkg_resources
+
+import lark
+
+DEFAULT_TOLERANCE = 1e-4
+
+Syntax = Tuple[Any, ...]
+
+# the Python operator for each binary operation, given by its source and
+# its implementation
+OPERATORS: Mapping[str, Tuple[str, Callable[[Any, Any], Any]]] = {
+    'add': ('+', operator.add),
+    'sub': ('-', operator.sub),
+    'mul': ('*', operator.mul),
+    'div': ('/', operator.truediv),
+    'lt': ('<', operator.lt),
+    'leq': ('<=', operator.le),
+    'eq': ('==', operator.eq),
+    'neq': ('!=', operator.ne),
+    'geq': ('>=', operator.ge),
+    'gt': ('>', operator.gt)
+}
+
+# the operation that combines the magnitudes of the operands of each
+# arithmetic operation
+MAGNITUDE_OPERATIONS: Mapping[str, str] = {
+    'add': 'add',
+    'sub': 'add',
+    'mul': 'mul',
+    'div': 'div'
+}
+
+
+@functools.lru_cache(maxsize=None)
+def load_grammar() -> str:
+    """Returns the text of the invariant grammar."""
+    grammar = pkg_resources.resource_string(__name__, 'daikon.lark')
+    return grammar.decode('utf-8')
+
+
+def build_parser(transformer: Optional[lark.Transformer] = None) -> lark.Lark:
+    """Builds an LALR parser for the invariant grammar. If a transformer is
+    given, it is applied to each rule as it is parsed, and no parse tree is
+    constructed. Parsers are expensive to build and should be reused."""
+    return lark.Lark(load_grammar(),
+                     parser='lalr',
+                     lexer='standard',
+                     transformer=transformer)
+
+
+class _SyntaxBuilder(lark.Transformer):
+    """Converts invariants to syntax trees as they are parsed."""
+    def number(self, children: List[lark.Token]) -> Syntax:
+        text = str(children[0])
+        try:
+            return ('const', int(text))
+        except ValueError:
+            return ('const', float(text))
+
+    def string(self, children: List[lark.Token]) -> Syntax:
+        # string values retain their surrounding quotes within traces
+        return ('const', str(children[0]))
+
+    def var(self, children: List[lark.Token]) -> Syntax:
+        return ('var', str(children[0]), False)
+
+    def orig(self, children: List[lark.Token]) -> Syntax:
+        return ('var', str(children[-1]), True)
+
+    def neg(self, children: List[Syntax]) -> Syntax:
+        return ('neg', children[0])
+
+    def _binary(self, operation: str, children: List[Syntax]) -> Syntax:
+        return (operation, children[0], children[1])
+
+    def add(self, children: List[Syntax]) -> Syntax:
+        return self._binary('add', children)
+
+    def sub(self, children: List[Syntax]) -> Syntax:
+        return self._binary('sub', children)
+
+    def mul(self, children: List[Syntax]) -> Syntax:
+        return self._binary('mul', children)
+
+    def div(self, children: List[Syntax]) -> Syntax:
+        return self._binary('div', children)
+
+    def lt(self, children: List[Syntax]) -> Syntax:
+        return self._binary('lt', children)
+
+    def leq(self, children: List[Syntax]) -> Syntax:
+        return self._binary('leq', children)
+
+    def eq(self, children: List[Syntax]) -> Syntax:
+        return self._binary('eq', children)
+
+    def neq(self, children: List[Syntax]) -> Syntax:
+        return self._binary('neq', children)
+
+    def geq(self, children: List[Syntax]) -> Syntax:
+        return self._binary('geq', children)
+
+    def gt(self, children: List[Syntax]) -> Syntax:
+        return self._binary('gt', children)
+
+
+@functools.lru_cache(maxsize=None)
+def _syntax_parser() -> lark.Lark:
+    return build_parser(_SyntaxBuilder())
+
+
+def parse_invariant(text: str) -> Syntax:
+    """Parses the text of an invariant into a syntax tree.
+
+    Raises
+    ------
+    ValueError
+        If the invariant is not described by the grammar.
+    """
+    try:
+        return _syntax_parser().parse(text)  # type: ignore
+    except lark.exceptions.LarkError as err:
+        raise ValueError(f'failed to parse invariant: {text}') from err
+
+
+def syntax_variables(syntax: Syntax) -> FrozenSet[Tuple[str, bool]]:
+    """Returns the variables that are used by a syntax tree, each given by
+    its name and whether it refers to the value of the variable upon
+    entry."""
+    kind = syntax[0]
+    if kind == 'var':
+        return frozenset([(syntax[1], syntax[2])])
+    if kind == 'const':
+        return frozenset()
+    used: FrozenSet[Tuple[str, bool]] = frozenset()
+    for child in syntax[1:]:
+        used |= syntax_variables(child)
+    return used
@@ -1,7 +1,14 @@
 # -*- coding: utf-8 -*-
-__all__ = ('escape', 'escape_if_not_none')
+__all__ = ('aiter_lines', 'escape', 'escape_if_not_none', 'iter_lines',
+           'normalise_orig', 'unescape')
 
-from typing import Any, Optional
+from typing import (Any, AsyncIterable, AsyncIterator, Iterable, Iterator,
+                    List, Optional)
+import codecs
+import re
+
+_ORIG = re.compile(r'orig\(\s*([^()\s]+)\s*\)')
+_ESCAPED = re.compile(r'\\(.)', re.DOTALL)
 
 
 def escape(val: Any) -> str:
@@ -16,3 +23,65 @@ def escape(val: Any) -> str:
 
 def escape_if_not_none(val: Any) -> Optional[str]:
     return val if val is None else escape(val)
+
+
+def unescape(val: Any) -> Any:
+    """Returns the primitive value that was escaped by :func:`escape`."""
+    if isinstance(val, str):
+        if len(val) >= 2 and val[0] == val[-1] == '"':
+            return _ESCAPED.sub(r'\1', val[1:-1])
+        if val in ('true', 'false'):
+            return val == 'true'
+    return val
+
+
+def normalise_orig(text: str) -> str:
+    """Normalises the spelling of each :code:`orig(x)` within a given text
+    (e.g., :code:`orig( x )`)."""
+    return _ORIG.sub(r'orig(\1)', text)
+
+
+class _LineSplitter:
+    """Splits chunks of encoded output into lines, without their line
+    endings, as the chunks arrive."""
+    def __init__(self, encoding: str) -> None:
+        decoder = codecs.getincrementaldecoder(encoding)
+        self._decoder = decoder(errors='replace')
+        self._remainder = ''
+
+    def feed(self, chunk: bytes) -> List[str]:
+        """Returns the lines that are completed by a given chunk."""
+        text = self._remainder + self._decoder.decode(chunk)
+        *lines, self._remainder = text.split('\n')
+        return [line.rstrip('\r') for line in lines]
+
+    def finish(self) -> List[str]:
+        """Returns the final line, if it was not terminated."""
+        remainder = self._remainder + self._decoder.decode(b'', final=True)
+        self._remainder = ''
+        return [remainder.rstrip('\r')] if remainder else []
+
+
+def iter_lines(chunks: Iterable[bytes],
+               encoding: str = 'utf-8'
+               ) -> Iterator[str]:
+    """Splits a stream of arbitrarily sized chunks of encoded output (e.g.,
+    from a process) into lines, without their line endings, as the chunks
+    arrive."""
+    splitter = _LineSplitter(encoding)
+    for chunk in chunks:
+        yield from splitter.feed(chunk)
+    yield from splitter.finish()
+
+
+async def aiter_lines(chunks: AsyncIterable[bytes],
+                      encoding: str = 'utf-8'
+                      ) -> AsyncIterator[str]:
+    """Splits an asynchronous stream of chunks into lines. See
+    :func:`iter_lines`."""
+    splitter = _LineSplitter(encoding)
+    async for chunk in chunks:
+        for line in splitter.feed(chunk):
+            yield line
+    for line in splitter.finish():
+        yield line
@@ -0,0 +1,300 @@
+# -*- coding: utf-8 -*-
+"""
+This module provides an inverted index from variables and kinds of invariant
+to the invariants that mention or are of them, allowing questions such as
+"which invariants mention :code:`latitude`?" to be answered without scanning
+every invariant within an :class:`InvariantMap`.
+"""
+__all__ = ('InvariantIndex', 'InvariantKind', 'analyse_invariant')
+
+from typing import (AbstractSet, Dict, FrozenSet, Iterable, List, Optional,
+                    Set, Tuple, Union)
+import enum
+import re
+
+from loguru import logger
+import attr
+
+from .declarations import Declarations
+from .helpers import normalise_orig
+from .invariant import Invariant, InvariantMap
+from .ppt import enter_ppt_name
+
+_TOKEN = re.compile(r'''
+    (?P<string>"(?:[^"\\]|\\.)*")
+  | orig\(\s*(?P<orig>[^()\s]+)\s*\)
+  | (?P<name>[A-Za-z_$][A-Za-z0-9_$.]*(?:\[[^\]]*\])?)
+  | (?P<number>[0-9]+(?:\.[0-9]*)?(?:[eE][-+]?[0-9]+)?)
+  | (?P<op>==|!=|<=|>=|<|>|[-+*/%])
+  | (?P<open>[({])
+  | (?P<close>[)}])
+''', re.VERBOSE)
+
+# words that appear in invariants but are not variables, which are ignored
+# when the variables of a program point are not known
+_KEYWORDS = frozenset(['one', 'of', 'has', 'only', 'elements', 'null',
+                       'true', 'false', 'sorted', 'by'])
+
+
+class InvariantKind(enum.Enum):
+    """Describes the form of an invariant.
+
+    Comparisons between two expressions, at least one of which involves
+    arithmetic, are classified as :attr:`linear`. Invariants that do not
+    take any of the listed forms are classified as :attr:`other`.
+    """
+    eq = 'eq'
+    neq = 'neq'
+    lt = 'lt'
+    leq = 'leq'
+    gt = 'gt'
+    geq = 'geq'
+    linear = 'linear'
+    one_of = 'one_of'
+    other = 'other'
+
+
+_COMPARISONS: Dict[str, InvariantKind] = {
+    '==': InvariantKind.eq,
+    '!=': InvariantKind.neq,
+    '<': InvariantKind.lt,
+    '<=': InvariantKind.leq,
+    '>': InvariantKind.gt,
+    '>=': InvariantKind.geq
+}
+
+
+def analyse_invariant(text: str) -> Tuple[InvariantKind, Tuple[str, ...]]:
+    """Determines the kind of an invariant and the names of the variables
+    that it mentions, in order of their first appearance. References to the
+    value of a variable :code:`x` upon entry are named :code:`orig(x)`.
+
+    Note
+    ----
+    Invariants are tokenized rather than parsed, and so any word that is not
+    a known keyword is treated as a variable.
+    """
+    kind: Optional[InvariantKind] = None
+    arithmetic = False
+    after_operand = False
+    variables: Dict[str, None] = {}
+    for match in _TOKEN.finditer(text):
+        group = match.lastgroup
+        if group == 'orig':
+            variables[f'orig({match.group("orig")})'] = None
+            after_operand = True
+        elif group == 'name':
+            name = match.group('name')
+            if name == 'one' and text[match.end():].startswith(' of'):
+                kind = InvariantKind.one_of
+            elif name not in _KEYWORDS:
+                variables[name] = None
+            after_operand = True
+        elif group == 'op':
+            op = match.group('op')
+            if op in _COMPARISONS:
+                if kind is None:
+                    kind = _COMPARISONS[op]
+            elif after_operand:
+                arithmetic = True
+            after_operand = False
+        elif group == 'open':
+            after_operand = False
+        else:
+            after_operand = True
+    if kind is None:
+        kind = InvariantKind.other
+    elif arithmetic and kind in _COMPARISONS.values():
+        kind = InvariantKind.linear
+    return kind, tuple(variables)
+
+
+def _normalise_variable(name: str) -> str:
+    """Normalises the spelling of a variable name (e.g., orig( x ))."""
+    return normalise_orig(name.strip())
+
+
+@attr.s(eq=False)
+class InvariantIndex:
+    """An inverted index from variables and kinds to the invariants within an
+    :class:`InvariantMap`.
+
+    Each invariant within the map is given a position, in the order that the
+    map is iterated, and each variable and kind is mapped to the set of
+    positions of its invariants. Queries intersect those sets, starting from
+    the smallest, and so their cost is bounded by the number of invariants
+    that mention the rarest of the queried variables.
+
+    Since invariant texts are frequently repeated across program points, the
+    text of each distinct invariant is analysed only once.
+
+    Attributes
+    ----------
+    invariants: InvariantMap
+        The indexed invariants.
+    declarations: Declarations, optional
+        If given, only the declared variables of each program point (and of
+        its entry point, for :code:`orig(x)`) are indexed. Otherwise, each
+        word within an invariant that is not a keyword is indexed.
+    """
+    invariants: InvariantMap = attr.ib()
+    declarations: Optional[Declarations] = attr.ib(default=None)
+    _entries: List[Tuple[str, Invariant]] = attr.ib(init=False, repr=False)
+    _by_variable: Dict[str, List[int]] = attr.ib(init=False, repr=False)
+    _by_kind: Dict[InvariantKind, List[int]] = \
+        attr.ib(init=False, repr=False)
+    _sets: Dict[Union[str, InvariantKind], FrozenSet[int]] = \
+        attr.ib(init=False, repr=False)
+    _with_orig: Dict[str, List[int]] = attr.ib(init=False, repr=False)
+
+    def __attrs_post_init__(self) -> None:
+        self._entries = []
+        self._by_variable = {}
+        self._by_kind = {kind: [] for kind in InvariantKind}
+        self._sets = {}
+        self._with_orig = {}
+        analysed: Dict[str, Tuple[InvariantKind, Tuple[str, ...]]] = {}
+        by_variable = self._by_variable
+        by_kind = self._by_kind
+        entries = self._entries
+        for ppt_name, invariants in self.invariants.items():
+            declared = self._declared_variables(ppt_name)
+            for invariant in invariants:
+                text = invariant.text
+                try:
+                    kind, variables = analysed[text]
+                except KeyError:
+                    kind, variables = analyse_invariant(text)
+                    analysed[text] = (kind, variables)
+                position = len(entries)
+                entries.append((ppt_name, invariant))
+                by_kind[kind].append(position)
+                for variable in variables:
+                    if declared is not None and variable not in declared:
+                        continue
+                    try:
+                        by_variable[variable].append(position)
+                    except KeyError:
+                        by_variable[variable] = [position]
+        logger.debug(f'indexed {len(entries)} invariants '
+                     f'({len(analysed)} distinct) over '
+                     f'{len(by_variable)} variables')
+
+    def _declared_variables(self, ppt_name: str) -> Optional[AbstractSet[str]]:
+        if self.declarations is None:
+            return None
+        declared: Set[str] = set()
+        ppt = self.declarations.get(ppt_name)
+        if ppt is not None:
+            declared.update(ppt)
+        enter_name = enter_ppt_name(ppt_name)
+        enter_ppt = self.declarations.get(enter_name) if enter_name else None
+        if enter_ppt is not None:
+            declared.update(f'orig({name})' for name in enter_ppt)
+        return declared
+
+    def __len__(self) -> int:
+        """Returns the number of indexed invariants."""
+        return len(self._entries)
+
+    @property
+    def variables(self) -> FrozenSet[str]:
+        """The names of the variables that are mentioned by at least one
+        invariant."""
+        return frozenset(self._by_variable)
+
+    def _set(self, key: Union[str, InvariantKind]) -> FrozenSet[int]:
+        """Returns the positions for a given variable or kind as a set, which
+        is built when it is first needed."""
+        try:
+            return self._sets[key]
+        except KeyError:
+            if isinstance(key, InvariantKind):
+                positions = self._by_kind[key]
+            else:
+                positions = self._by_variable.get(key, [])
+            result = self._sets[key] = frozenset(positions)
+            return result
+
+    def _positions(self,
+                   variables: Iterable[str],
+                   kind: Optional[Union[InvariantKind, str]],
+                   include_orig: bool
+                   ) -> List[int]:
+        # each posting list is sorted, since positions are assigned in order
+        candidates: List[Tuple[List[int], List[Union[str, InvariantKind]]]]
+        candidates = []
+        for variable in variables:
+            variable = _normalise_variable(variable)
+            positions = self._by_variable.get(variable, [])
+            keys: List[Union[str, InvariantKind]] = [variable]
+            if include_orig and not variable.startswith('orig('):
+                orig = f'orig({variable})'
+                keys.append(orig)
+                try:
+                    positions = self._with_orig[variable]
+                except KeyError:
+                    positions = sorted(self._set(variable) | self._set(orig))
+                    self._with_orig[variable] = positions
+            candidates.append((positions, keys))
+        if kind is not None:
+            kind = InvariantKind(kind)
+            candidates.append((self._by_kind[kind], [kind]))
+        if not candidates:
+            return list(range(len(self._entries)))
+
+        candidates.sort(key=lambda candidate: len(candidate[0]))
+        result, _ = candidates[0]
+        for _, keys in candidates[1:]:
+            if not result:
+                break
+            sets = [self._set(key) for key in keys]
+            if len(sets) == 1:
+                members = sets[0]
+                result = [p for p in result if p in members]
+            else:
+                result = [p for p in result if any(p in s for s in sets)]
+        return result
+
+    def find(self,
+             *variables: str,
+             kind: Optional[Union[InvariantKind, str]] = None,
+             include_orig: bool = False
+             ) -> List[Tuple[str, Invariant]]:
+        """Finds the invariants that mention all of the given variables and,
+        optionally, are of a given kind.
+
+        Parameters
+        ----------
+        variables: str
+            The names of the variables. The value of a variable :code:`x`
+            upon entry is named :code:`orig(x)`.
+        kind: Union[InvariantKind, str], optional
+            If given, only invariants of this kind are returned.
+        include_orig: bool
+            If :code:`True`, invariants that mention :code:`orig(x)` are also
+            considered to mention :code:`x`.
+
+        Returns
+        -------
+        List[Tuple[str, Invariant]]
+            The name of the program point and the invariant for each match,
+            in the order that they appear within the indexed map.
+
+        Raises
+        ------
+        ValueError
+            If the given kind is unknown.
+        """
+        entries = self._entries
+        positions = self._positions(variables, kind, include_orig)
+        return [entries[position] for position in positions]
+
+    def count(self,
+              *variables: str,
+              kind: Optional[Union[InvariantKind, str]] = None,
+              include_orig: bool = False
+              ) -> int:
+        """Returns the number of invariants that would be returned by
+        :meth:`find`."""
+        return len(self._positions(variables, kind, include_orig))
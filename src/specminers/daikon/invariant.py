@@ -3,22 +3,28 @@
 This module provides data structures for representing invariants and reading
 invariants from a given input stream (e.g., a file or the output of a process).
 """
-__all__ = ('Invariant', 'InvariantMap', 'InvariantReader')
+__all__ = ('Invariant', 'InvariantMap', 'InvariantReader', 'InvariantTable',
+           'InternedInvariants')
 
-from typing import Collection, Dict, Iterator, Mapping, Tuple
+from typing import (Collection, Dict, Iterable, Iterator, List, Mapping,
+                    Optional, Sequence, Tuple, Union, overload)
+import array
 
 from loguru import logger
 import attr
 
 from .declarations import Declarations
 from .ppt import ProgramPoint
-from .loader import LineBuffer
+from .compression import open_file
 
 
 _PPT_DELIMITER = '=' * 75
 
+# the final line of the output of PrintInvariants
+_END_OF_OUTPUT = 'Exiting Daikon.'
 
-@attr.s(frozen=True, auto_attribs=True, str=False)
+
+@attr.s(frozen=True, auto_attribs=True, str=False, slots=True)
 class Invariant:
     """An invariant that has been inferred by Daikon."""
     text: str
@@ -27,6 +33,127 @@ class Invariant:
         return self.text
 
 
+class InvariantTable:
+    """A table of interned invariant texts, each of which is identified by a
+    unique integer. A table may be shared by several invariant maps, in which
+    case each distinct text is stored once, regardless of the number of
+    program points and maps in which it appears.
+
+    Warning
+    -------
+    This class is not thread-safe.
+    """
+    def __init__(self) -> None:
+        self.__texts: List[str] = []
+        self.__ids: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        """Returns the number of distinct texts within this table."""
+        return len(self.__texts)
+
+    def __contains__(self, text: object) -> bool:
+        return text in self.__ids
+
+    def intern(self, text: str) -> int:
+        """Returns the identifier for a given text, adding the text to this
+        table if it is not already present."""
+        try:
+            return self.__ids[text]
+        except KeyError:
+            identifier = len(self.__texts)
+            self.__texts.append(text)
+            self.__ids[text] = identifier
+            return identifier
+
+    def find(self, text: str) -> Optional[int]:
+        """Returns the identifier for a given text, or :code:`None` if the
+        text is not within this table."""
+        return self.__ids.get(text)
+
+    def intern_all(self, invariants: Iterable[Invariant]) -> 'array.array':
+        """Returns an array of the identifiers for a sequence of
+        invariants."""
+        intern = self.intern
+        return array.array('I', [intern(inv.text) for inv in invariants])
+
+    def text(self, identifier: int) -> str:
+        """Returns the text with a given identifier.
+
+        Raises
+        ------
+        IndexError
+            If there is no text with the given identifier.
+        """
+        return self.__texts[identifier]
+
+    def texts(self, identifiers: Iterable[int]) -> Iterator[str]:
+        """Returns the texts for a sequence of identifiers."""
+        texts = self.__texts
+        return (texts[identifier] for identifier in identifiers)
+
+
+@attr.s(frozen=True, slots=True, eq=False)
+class InternedInvariants(Sequence[Invariant]):
+    """A compact sequence of invariants that are stored as identifiers within
+    an :class:`InvariantTable`. :class:`Invariant` objects are created only
+    when they are accessed.
+
+    Attributes
+    ----------
+    table: InvariantTable
+        The table that holds the text of each invariant.
+    ids: array.array
+        The identifier of each invariant, in order.
+    """
+    table: InvariantTable = attr.ib()
+    ids: 'array.array' = attr.ib()
+
+    @classmethod
+    def build(cls,
+              table: InvariantTable,
+              invariants: Iterable[Invariant]
+              ) -> 'InternedInvariants':
+        return InternedInvariants(table, table.intern_all(invariants))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @overload
+    def __getitem__(self, index: int) -> Invariant:
+        ...
+
+    @overload
+    def __getitem__(self, index: slice) -> 'InternedInvariants':
+        ...
+
+    def __getitem__(self,
+                    index: Union[int, slice]
+                    ) -> Union[Invariant, 'InternedInvariants']:
+        if isinstance(index, slice):
+            return InternedInvariants(self.table, self.ids[index])
+        return Invariant(self.table.text(self.ids[index]))
+
+    def __iter__(self) -> Iterator[Invariant]:
+        for text in self.table.texts(self.ids):
+            yield Invariant(text)
+
+    def __contains__(self, invariant: object) -> bool:
+        if not isinstance(invariant, Invariant):
+            return False
+        identifier = self.table.find(invariant.text)
+        return identifier is not None and identifier in self.ids
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, InternedInvariants) and other.table is self.table:
+            return self.ids == other.ids
+        if isinstance(other, Sequence):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f'InternedInvariants({list(self)!r})'
+
+
 @attr.s(frozen=True, auto_attribs=True, slots=True)
 class InvariantMap(Mapping[str, Collection[Invariant]]):
     """Provides a mapping from program points to their likely invariants."""
@@ -43,6 +170,55 @@ class InvariantMap(Mapping[str, Collection[Invariant]]):
         size = sum(len(contents[name]) for name in contents)
         return InvariantMap(contents, size)
 
+    @classmethod
+    def from_stream(cls,
+                    decls: Declarations,
+                    stream: Iterable[Tuple[ProgramPoint,
+                                           Collection[Invariant]]],
+                    *,
+                    table: Optional[InvariantTable] = None
+                    ) -> 'InvariantMap':
+        """Builds an invariant map incrementally from a stream of program
+        points and their invariants, such as that produced by
+        :meth:`InvariantReader.read_lines`.
+
+        Parameters
+        ----------
+        decls: Declarations
+            The declarations for the program points.
+        stream: Iterable[Tuple[ProgramPoint, Collection[Invariant]]]
+            The stream of program points and their invariants.
+        table: InvariantTable, optional
+            If given, the invariants for each program point are interned
+            into this table as they are read, and are stored as
+            :class:`InternedInvariants`.
+        """
+        ppt_to_invariants: Dict[str, Collection[Invariant]] = {}
+        for ppt, invariants in stream:
+            if table is not None:
+                invariants = InternedInvariants.build(table, invariants)
+            ppt_to_invariants[ppt.name] = invariants
+        return cls.build(decls, ppt_to_invariants)
+
+    def intern(self, table: Optional[InvariantTable] = None) -> 'InvariantMap':
+        """Returns a compact copy of this map, in which the invariants for
+        each program point are stored as :class:`InternedInvariants`.
+
+        Parameters
+        ----------
+        table: InvariantTable, optional
+            The table into which the invariants should be interned. Sharing
+            a table between several maps avoids storing the texts of their
+            common invariants more than once. If no table is given, a new
+            table is used.
+        """
+        if table is None:
+            table = InvariantTable()
+        contents: Dict[str, Collection[Invariant]] = \
+            {name: InternedInvariants.build(table, invariants)
+             for name, invariants in self._ppt_to_invariants.items()}
+        return InvariantMap(contents, self.size)
+
     def __len__(self) -> int:
         return len(self._ppt_to_invariants)
 
@@ -65,65 +241,65 @@ class InvariantReader:
     declarations: Declarations
 
     def from_file(self, filename: str) -> InvariantMap:
-        """Reads an invariant map from a provided file."""
+        """Reads an invariant map from a provided file, which may be
+        compressed. See :meth:`read_lines`."""
         logger.debug(f'reading invariants from file: {filename}')
-        with LineBuffer.for_file(filename) as lines:
-            invariants = self._from_line_buffer(lines)
-        logger.debug(f'read invariants from file: {filename}')
+        invariants = InvariantMap.from_stream(self.declarations,
+                                              self.read_file(filename))
+        logger.debug(f'read {invariants.size:d} invariants from file: '
+                     f'{filename}')
         return invariants
 
     def from_file_contents(self, contents: str) -> InvariantMap:
-        """Reads an invariant map from the contents of a file."""
-        lines = LineBuffer.for_file_contents(contents)
-        return self._from_line_buffer(lines)
+        """Reads an invariant map from the contents of a file. See
+        :meth:`read_lines`."""
+        return InvariantMap.from_stream(self.declarations,
+                                        self.read_lines(contents.split('\n')))
 
-    def _from_line_buffer(self, lines: LineBuffer) -> InvariantMap:
-        num_invariants = 0
-        ppt_to_invariants: Dict[str, Collection[Invariant]] = {}
-        try:
-            while True:
-                ppt, invariants = self._read_ppt_invariants(lines)
-                ppt_to_invariants[ppt.name] = invariants
-                num_invariants += len(invariants)
-        except StopIteration:
-            logger.debug(f'finished reading {num_invariants:d} invariants '
-                         'from line stream')
-        return InvariantMap.build(self.declarations, ppt_to_invariants)
-
-    def _read_ppt_invariants(self,
-                             lines: LineBuffer
-                             ) -> Tuple[ProgramPoint, Collection[Invariant]]:
-        """Reads the next set of invariants for a program point.
+    def read_lines(self,
+                   lines: Iterable[str]
+                   ) -> Iterator[Tuple[ProgramPoint, List[Invariant]]]:
+        """Reads the invariants for each program point from a stream of
+        lines, such as the output of PrintInvariants, one program point at a
+        time. Only the invariants for the current program point are held in
+        memory.
+
+        Lines may end with a line break. Any lines that precede the first
+        program point and the line that marks the end of the output of
+        PrintInvariants are ignored.
 
         Raises
         ------
-        StopIteration
-            If there are no invariants left to process in the line buffer.
+        ValueError
+            If the invariants belong to an unknown program point.
         """
-        delimiter_line = lines.pop()
-        if delimiter_line != _PPT_DELIMITER:
-            error = f'expected delimiter line (actual line: {delimiter_line}'
-            raise Exception(error)
-
-        ppt_name = lines.pop()
-        if ppt_name not in self.declarations:
-            error = f'unknown program point: {ppt_name}'
-            raise Exception(error)
-        ppt: ProgramPoint = self.declarations[ppt_name]
-
-        logger.debug(f'reading invariants for program point [{ppt_name}]')
-        invariants = []
-        while True:
-            if lines.peek() == _PPT_DELIMITER:
+        ppt: Optional[ProgramPoint] = None
+        invariants: List[Invariant] = []
+        expecting_name = False
+        for line in lines:
+            line = line.rstrip('\r\n')
+            if expecting_name:
+                if line not in self.declarations:
+                    raise ValueError(f'unknown program point: {line}')
+                ppt = self.declarations[line]
+                expecting_name = False
+            elif line == _PPT_DELIMITER:
+                if ppt is not None:
+                    yield ppt, invariants
+                    ppt = None
+                    invariants = []
+                expecting_name = True
+            elif line == _END_OF_OUTPUT:
                 break
-            invariant_line = lines.pop()
-            invariant = self._read_invariant(invariant_line)
-            invariants.append(invariant)
-        logger.debug(f'read {len(invariants):d} invariants for '
-                     f'program point [{ppt_name}]')
-
-        return ppt, invariants
+            elif ppt is not None and line:
+                invariants.append(Invariant(line))
+        if ppt is not None:
+            yield ppt, invariants
 
-    def _read_invariant(self, line: str) -> Invariant:
-        """Reads an invariant from a given line."""
-        return Invariant(text=line)
+    def read_file(self,
+                  filename: str
+                  ) -> Iterator[Tuple[ProgramPoint, List[Invariant]]]:
+        """Reads the invariants for each program point within a given file,
+        which may be compressed, one program point at a time."""
+        with open_file(filename, 'r') as fh:
+            yield from self.read_lines(fh)
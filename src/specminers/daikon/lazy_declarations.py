@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+This module provides declarations that parse each of their program points
+only when it is first accessed.
+"""
+__all__ = ('LazyDeclarations',)
+
+from typing import Dict, Iterator, List, Tuple
+import re
+
+from .compression import open_file
+from .decl_parser import parse_declarations
+from .declarations import Declarations
+from .ppt import ProgramPoint
+
+_PPT_LINE = re.compile(r'^ppt ([^\n]*)$', re.MULTILINE)
+
+
+class LazyDeclarations(Declarations):
+    """A set of declarations that is backed by the text of a declarations
+    file.
+
+    On construction, the text is scanned once to find the name and position
+    of each program point. A program point is parsed, together with its
+    variables, when it is first retrieved, and is then kept in memory. The
+    number and names of the program points are available without parsing
+    any of them.
+
+    Since program points are immutable, :attr:`lines` and :meth:`save`
+    reproduce the source text verbatim rather than reformatting it.
+    """
+    def __init__(self, text: str) -> None:
+        super().__init__([])
+        self.__text = text
+        self.__spans: Dict[str, Tuple[int, int]] = {}
+        self.__parsed: Dict[str, ProgramPoint] = {}
+        starts = [(m.start(), m.group(1).rstrip('\r'))
+                  for m in _PPT_LINE.finditer(text)]
+        ends = [start for start, _ in starts[1:]] + [len(text)]
+        for (start, name), end in zip(starts, ends):
+            self.__spans.setdefault(name, (start, end))
+        self.__header_end = starts[0][0] if starts else len(text)
+
+    @classmethod
+    def from_file(cls, filename: str) -> 'LazyDeclarations':
+        """Scans the program points within a given file, which may be
+        compressed."""
+        with open_file(filename, 'r') as fh:
+            return LazyDeclarations(fh.read())
+
+    @property
+    def header(self) -> str:
+        """The source text that precedes the first program point (e.g., the
+        version and comparability declarations)."""
+        return self.__text[:self.__header_end]
+
+    def source(self, name: str) -> str:
+        """Returns the source text of the program point with a given name,
+        including the blank lines that follow it, without parsing it.
+
+        Raises
+        ------
+        KeyError
+            If there is no program point with the given name.
+        """
+        start, end = self.__spans[name]
+        return self.__text[start:end]
+
+    @property
+    def num_parsed(self) -> int:
+        """The number of program points that have been parsed."""
+        return len(self.__parsed)
+
+    def __len__(self) -> int:
+        return len(self.__spans)
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self.__spans
+
+    def __contains__(self, name: object) -> bool:
+        return name in self.__spans
+
+    def __getitem__(self, name: str) -> ProgramPoint:
+        """Retrieves a program point with a given name, parsing it if it has
+        not been parsed already.
+
+        Raises
+        ------
+        KeyError
+            If there is no program point with the given name.
+        ValueError
+            If the declaration of the program point is malformed.
+        """
+        try:
+            return self.__parsed[name]
+        except KeyError:
+            pass
+        lines = self.source(name).split('\n')
+        ppt = parse_declarations(lines)[name]
+        self.__parsed[name] = ppt
+        return ppt
+
+    @property
+    def lines(self) -> List[str]:
+        return self.__text.rstrip('\n').split('\n')
+
+    def __str__(self) -> str:
+        return self.__text
+
+    def save(self, filename: str) -> None:
+        """Saves the source text of these declarations to a given file."""
+        with open_file(filename, 'w') as f:
+            f.write(self.__text)
@@ -9,6 +9,8 @@ import itertools
 from loguru import logger
 import attr
 
+from .compression import open_file
+
 T = TypeVar('T')
 
 
@@ -20,7 +22,7 @@ class LineBuffer:
     @classmethod
     @contextlib.contextmanager
     def for_file(cls, filename: str) -> Iterator['LineBuffer']:
-        with open(filename, 'r') as fh:
+        with open_file(filename, 'r') as fh:
             lines = map(lambda l: l.strip('\n'), fh)
             yield LineBuffer(lines)
 
@@ -74,7 +76,7 @@ class LineLoader(Generic[T]):
     @classmethod
     def from_file(cls, filename: str, **kwargs) -> T:
         logger.trace(f'loading from file [{filename}] using [{cls.__name__}]')
-        with open(filename, 'r') as fh:
+        with open_file(filename, 'r') as fh:
             return cls.from_file_handle(fh, **kwargs)
 
     @classmethod
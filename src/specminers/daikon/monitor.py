@@ -0,0 +1,399 @@
+# -*- coding: utf-8 -*-
+"""
+This module provides a monitor that checks trace records against a set of
+invariants as the records are produced.
+
+The invariants for each program point are compiled into a single Python
+function that checks the values of one record against all of them, so that
+the cost of checking a record is bounded by the number of invariants for its
+program point.
+"""
+__all__ = ('InvariantMonitor', 'Violation')
+
+from typing import (Any, Callable, Collection, Dict, List, Mapping,
+                    Optional, Set, Tuple, Union)
+import collections
+
+from loguru import logger
+import attr
+
+from .declarations import Declarations
+from .grammar import (DEFAULT_TOLERANCE, MAGNITUDE_OPERATIONS, OPERATORS,
+                      Syntax, parse_invariant, syntax_variables)
+from .invariant import Invariant, InvariantMap
+from .ppt import ProgramPoint, enter_ppt_name
+from .trace.record import TraceRecord
+from .trace.writer import TraceWriter
+
+_NUMERIC_TYPES = ('int', 'float')
+
+
+@attr.s(frozen=True, slots=True, auto_attribs=True)
+class Violation:
+    """Describes a record that violates one or more invariants.
+
+    Attributes
+    ----------
+    ppt: ProgramPoint
+        The program point to which the record belongs.
+    nonce: int, optional
+        The nonce of the record, if any.
+    invariants: Tuple[Invariant, ...]
+        The invariants that were violated by the record.
+    values: Mapping[str, Any]
+        The values of the variables in the record.
+    """
+    ppt: ProgramPoint
+    nonce: Optional[int]
+    invariants: Tuple[Invariant, ...]
+    values: Mapping[str, Any]
+
+
+class _Renderer:
+    """Renders invariants as Python expressions over local variables, using
+    the equality semantics that are described by :mod:`.grammar`.
+
+    Attributes
+    ----------
+    types: Mapping[Tuple[str, bool], str]
+        The declared type of each variable that may be used, indexed by its
+        name and whether it refers to its value upon entry.
+    bindings: Dict[Tuple[str, bool], str]
+        The local variable that holds the value of each variable that has
+        been used.
+    """
+    def __init__(self,
+                 types: Mapping[Tuple[str, bool], str],
+                 tolerance: float
+                 ) -> None:
+        self.types = types
+        self.tolerance = tolerance
+        self.bindings: Dict[Tuple[str, bool], str] = {}
+
+    def bind(self, key: Tuple[str, bool]) -> str:
+        try:
+            return self.bindings[key]
+        except KeyError:
+            prefix = 'o' if key[1] else 'v'
+            local = f'{prefix}{len(self.bindings)}'
+            self.bindings[key] = local
+            return local
+
+    def render(self, node: Syntax) -> Tuple[str, Optional[str]]:
+        """Returns the source for the value of an expression and the source
+        for its magnitude, or :code:`None` if the expression is not numeric.
+
+        Raises
+        ------
+        ValueError
+            If the expression cannot be rendered.
+        """
+        kind = node[0]
+        if kind == 'const':
+            value = node[1]
+            if isinstance(value, str):
+                return repr(value), None
+            return repr(value), repr(abs(value))
+        if kind == 'var':
+            key = (node[1], node[2])
+            if key not in self.types:
+                raise ValueError(f'unknown variable: {node[1]}')
+            local = self.bind(key)
+            if self.types[key] in _NUMERIC_TYPES:
+                return local, f'abs({local})'
+            return local, None
+        if kind == 'neg':
+            value, magnitude = self.render(node[1])
+            if magnitude is None:
+                raise ValueError('cannot negate a non-numeric value')
+            return f'(-{value})', magnitude
+        if kind not in OPERATORS:
+            raise ValueError(f'unknown syntax: {kind}')
+        lhs, lhs_magnitude = self.render(node[1])
+        rhs, rhs_magnitude = self.render(node[2])
+        op, _ = OPERATORS[kind]
+        if kind in MAGNITUDE_OPERATIONS:
+            if lhs_magnitude is None or rhs_magnitude is None:
+                raise ValueError('arithmetic over non-numeric values')
+            magnitude_op, _ = OPERATORS[MAGNITUDE_OPERATIONS[kind]]
+            return (f'({lhs} {op} {rhs})',
+                    f'({lhs_magnitude} {magnitude_op} {rhs_magnitude})')
+        if kind in ('eq', 'neq') and lhs_magnitude is not None \
+                and rhs_magnitude is not None:
+            op = '<=' if kind == 'eq' else '>'
+            return (f'(abs({lhs} - {rhs}) {op} {self.tolerance!r} * '
+                    f'max({lhs_magnitude}, {rhs_magnitude}))'), None
+        return f'({lhs} {op} {rhs})', None
+
+
+_Check = Callable[[Mapping[str, Any], Optional[Mapping[str, Any]]], List[int]]
+
+
+@attr.s(frozen=True, slots=True, auto_attribs=True)
+class _PptMonitor:
+    """Checks the records for a single program point.
+
+    Attributes
+    ----------
+    invariants: Tuple[Invariant, ...]
+        The compiled invariants for the program point, in the order that
+        their positions are reported by :attr:`check`.
+    check: _Check
+        Returns the positions of the invariants that are violated by a
+        record, given the values of the record and, if known, the values of
+        the corresponding entry record.
+    uses_orig: bool
+        Indicates whether any invariant refers to values upon entry.
+    string_names: Tuple[str, ...]
+        The names of the string variables whose current values are used by
+        the invariants.
+    orig_string_names: Tuple[str, ...]
+        The names of the string variables whose values upon entry are used
+        by the invariants.
+    """
+    invariants: Tuple[Invariant, ...]
+    check: _Check
+    uses_orig: bool
+    string_names: Tuple[str, ...]
+    orig_string_names: Tuple[str, ...]
+
+
+def _compile_ppt(ppt: ProgramPoint,
+                 enter_ppt: Optional[ProgramPoint],
+                 invariants: Collection[Invariant],
+                 tolerance: float
+                 ) -> Tuple[Optional[_PptMonitor], List[Invariant]]:
+    """Compiles the invariants for a given program point into a monitor, and
+    returns it together with the invariants that could not be compiled.
+    If none of the invariants can be compiled, no monitor is returned."""
+    types: Dict[Tuple[str, bool], str] = \
+        {(name, False): var.dec_type for name, var in ppt.items()}
+    if enter_ppt is not None:
+        types.update({(name, True): var.dec_type
+                      for name, var in enter_ppt.items()})
+
+    compiled: List[Invariant] = []
+    skipped: List[Invariant] = []
+    current: List[str] = []
+    entry: List[str] = []
+    renderer = _Renderer(types, tolerance)
+    for invariant in invariants:
+        bindings = dict(renderer.bindings)
+        try:
+            syntax = parse_invariant(invariant.text)
+            condition, _ = renderer.render(syntax)
+        except ValueError:
+            renderer.bindings = bindings
+            skipped.append(invariant)
+            continue
+
+        used = sorted(syntax_variables(syntax))
+        guards = [f'{renderer.bindings[key]} == {renderer.bindings[key]}'
+                  for key in used if types[key] == 'float']
+        test = ' and '.join(guards + [f'not {condition}'])
+        position = len(compiled)
+        lines = [f'if {test}:', f'    out.append({position})']
+        if '/' in condition:
+            lines = ['try:'] + [f'    {line}' for line in lines] \
+                + ['except ZeroDivisionError:', '    pass']
+        if any(orig for _, orig in used):
+            entry += lines
+        else:
+            current += lines
+        compiled.append(invariant)
+
+    if not compiled:
+        return None, skipped
+
+    body = [f'{local} = V[{name!r}]'
+            for (name, orig), local in renderer.bindings.items() if not orig]
+    body += ['out = []'] + current
+    if entry:
+        body.append('if O is not None:')
+        body += [f'    {local} = O[{name!r}]'
+                 for (name, orig), local in renderer.bindings.items() if orig]
+        body += [f'    {line}' for line in entry]
+    body.append('return out')
+    source = 'def check(V, O):\n' + '\n'.join(f'    {line}' for line in body)
+    namespace: Dict[str, Any] = {}
+    exec(source, namespace)
+
+    strings = [(name, orig) for name, orig in renderer.bindings
+               if types[(name, orig)] == 'java.lang.String']
+    string_names = tuple(name for name, orig in strings if not orig)
+    orig_string_names = tuple(name for name, orig in strings if orig)
+    monitor = _PptMonitor(tuple(compiled), namespace['check'], bool(entry),
+                          string_names, orig_string_names)
+    return monitor, skipped
+
+
+@attr.s(eq=False)
+class InvariantMonitor:
+    """Checks trace records against a set of invariants as they are
+    produced, and reports violations via a callback.
+
+    Records may be checked directly, via :meth:`check` or
+    :meth:`check_record`, or the monitor may be attached to a
+    :class:`TraceWriter`, via :meth:`attach`, so that each record is checked
+    as it is written.
+
+    Values of :code:`orig(x)` at an exit point are taken from the most recent
+    entry record with the same nonce. Entry records are retained only until
+    their exit record is checked, and at most :attr:`max_pending` entry
+    records are retained at any time.
+
+    Warning
+    -------
+    This class is not thread-safe.
+
+    Attributes
+    ----------
+    declarations: Declarations
+        The declarations for the program points within the trace.
+    invariants: InvariantMap
+        The invariants that records should be checked against.
+    on_violation: Callable[[Violation], None], optional
+        Called for each record that violates at least one invariant.
+    tolerance: float
+        The relative tolerance that is used for numeric equality.
+    max_pending: int
+        The maximum number of entry records that are retained.
+    num_checked: int
+        The number of records that have been checked.
+    num_violations: int
+        The number of records that have violated at least one invariant.
+    num_skipped: int
+        The number of records that belonged to a program point with no
+        invariants that could be compiled, and so were not checked.
+    """
+    declarations: Declarations = attr.ib()
+    invariants: InvariantMap = attr.ib()
+    on_violation: Optional[Callable[[Violation], None]] = \
+        attr.ib(default=None)
+    tolerance: float = attr.ib(default=DEFAULT_TOLERANCE)
+    max_pending: int = attr.ib(default=10000)
+    num_checked: int = attr.ib(init=False, default=0)
+    num_violations: int = attr.ib(init=False, default=0)
+    num_skipped: int = attr.ib(init=False, default=0)
+    _monitors: Dict[str, _PptMonitor] = attr.ib(init=False, repr=False)
+    _skipped: Dict[str, List[Invariant]] = attr.ib(init=False, repr=False)
+    _entry_names: Set[str] = attr.ib(init=False, repr=False)
+    _quoted_names: Dict[str, Set[str]] = attr.ib(init=False, repr=False)
+    _pending: 'collections.OrderedDict[Tuple[str, int], Mapping[str, Any]]' = \
+        attr.ib(init=False, repr=False)
+
+    def __attrs_post_init__(self) -> None:
+        self._monitors = {}
+        self._skipped = {}
+        self._entry_names = set()
+        self._quoted_names = collections.defaultdict(set)
+        self._pending = collections.OrderedDict()
+        for ppt_name, invariants in self.invariants.items():
+            ppt = self.declarations.get(ppt_name)
+            if ppt is None:
+                self._skipped[ppt_name] = list(invariants)
+                continue
+            enter_name = enter_ppt_name(ppt_name)
+            enter_ppt = self.declarations.get(enter_name) \
+                if enter_name else None
+            monitor, skipped = \
+                _compile_ppt(ppt, enter_ppt, invariants, self.tolerance)
+            if skipped:
+                self._skipped[ppt_name] = skipped
+            if monitor is not None:
+                self._monitors[ppt_name] = monitor
+                self._quoted_names[ppt_name].update(monitor.string_names)
+                if monitor.uses_orig and enter_name:
+                    self._entry_names.add(enter_name)
+                    self._quoted_names[enter_name].update(
+                        monitor.orig_string_names)
+        logger.debug(f'compiled invariants for {len(self._monitors)} '
+                     f'program points ({self.num_skipped_invariants} '
+                     'invariants skipped)')
+
+    @property
+    def skipped_invariants(self) -> Mapping[str, List[Invariant]]:
+        """The invariants that could not be compiled, indexed by the name of
+        their program point."""
+        return self._skipped
+
+    @property
+    def num_skipped_invariants(self) -> int:
+        """The number of invariants that could not be compiled."""
+        return sum(len(invs) for invs in self._skipped.values())
+
+    def attach(self, writer: TraceWriter) -> None:
+        """Checks each record that is subsequently written by a given
+        writer."""
+        writer.add_observer(self.observe)
+
+    def detach(self, writer: TraceWriter) -> None:
+        """Stops checking the records that are written by a given writer."""
+        writer.remove_observer(self.observe)
+
+    def observe(self,
+                ppt: ProgramPoint,
+                nonce: Optional[int],
+                values: Mapping[str, Any]
+                ) -> None:
+        """Checks a record whose values are given as they are passed to
+        :meth:`TraceWriter.write` (i.e., with strings unquoted). Only the
+        strings that are used by an invariant are quoted."""
+        names = self._quoted_names.get(ppt.name)
+        if names:
+            quoted = dict(values)
+            for name in names:
+                quoted[name] = f'"{quoted[name]}"'
+            values = quoted
+        self.check(ppt, nonce, values)
+
+    def check_record(self, record: TraceRecord) -> List[Invariant]:
+        """Checks a record that was read from a trace, and returns the
+        invariants that it violates."""
+        return self.check(record.ppt, record.nonce, record.variable_values)
+
+    def check(self,
+              ppt_or_name: Union[str, ProgramPoint],
+              nonce: Optional[int],
+              values: Mapping[str, Any]
+              ) -> List[Invariant]:
+        """Checks the values of a record against the invariants for its
+        program point, and returns the invariants that it violates. Values
+        of strings should be surrounded by quotes, as they are in traces.
+
+        Raises
+        ------
+        KeyError
+            If a value is missing for a variable that is used by an
+            invariant.
+        """
+        name = ppt_or_name if isinstance(ppt_or_name, str) \
+            else ppt_or_name.name
+        if name in self._entry_names and nonce is not None:
+            pending = self._pending
+            pending[(name, nonce)] = values
+            if len(pending) > self.max_pending:
+                pending.popitem(last=False)
+
+        monitor = self._monitors.get(name)
+        if monitor is None:
+            self.num_skipped += 1
+            return []
+
+        entry: Optional[Mapping[str, Any]] = None
+        if monitor.uses_orig and nonce is not None:
+            enter_name = enter_ppt_name(name)
+            entry = self._pending.pop((str(enter_name), nonce), None)
+
+        self.num_checked += 1
+        positions = monitor.check(values, entry)
+        if not positions:
+            return []
+        invariants = monitor.invariants
+        violated = [invariants[i] for i in positions]
+        self.num_violations += 1
+        if self.on_violation is not None:
+            ppt = ppt_or_name if isinstance(ppt_or_name, ProgramPoint) \
+                else self.declarations[name]
+            self.on_violation(Violation(ppt, nonce, tuple(violated), values))
+        return violated
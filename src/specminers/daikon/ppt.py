@@ -11,6 +11,15 @@ from .loader import LineBuffer, LineLoader
 from .vardecl import VarDecl, VarDeclLoader
 
 
+def enter_ppt_name(ppt_name: str) -> Optional[str]:
+    """Returns the name of the entry program point for a given exit program
+    point, or :code:`None` if the program point is not an exit point."""
+    position = ppt_name.rfind(':::EXIT')
+    if position < 0:
+        return None
+    return ppt_name[:position] + ':::ENTER'
+
+
 class PptType(enum.Enum):
     enter = 'enter'
     exit = 'exit'
@@ -39,7 +48,7 @@ class ProgramPoint(Mapping[str, VarDecl]):
 
     @property
     def lines(self) -> List[str]:
-        ls = [f'ppt {self.name}', 'ppt-type {self.typ.value}']
+        ls = [f'ppt {self.name}', f'ppt-type {self.typ.value}']
         for var in self.variables.values():
             ls += var.lines
         return ls
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+This module provides a handle for a file of invariants that were serialized
+by Daikon, which allows the invariants to be reprinted, filtered, or merged
+via the utilities of Daikon without mining them again.
+"""
+__all__ = ('SerializedInvariants',)
+
+from typing import Optional, Union
+import typing
+
+import attr
+
+from .declarations import Declarations
+from .invariant import InvariantMap, InvariantReader
+
+if typing.TYPE_CHECKING:
+    from .daikon import Daikon
+
+
+@attr.s(frozen=True, slots=True)
+class SerializedInvariants:
+    """A handle for a file of serialized invariants (i.e., an :code:`.inv.gz`
+    file) on the host.
+
+    Attributes
+    ----------
+    filename: str
+        The path of the file.
+    daikon: Daikon
+        The interface to Daikon that is used to execute its utilities.
+    """
+    filename: str = attr.ib()
+    daikon: 'Daikon' = attr.ib(repr=False)
+
+    def text(self, *, ppt_select_pattern: Optional[str] = None) -> str:
+        """Prints the invariants via PrintInvariants.
+
+        Parameters
+        ----------
+        ppt_select_pattern: str, optional
+            If given, only the program points whose names match this regular
+            expression are printed.
+        """
+        return self.daikon.print_invariants(
+            self.filename, ppt_select_pattern=ppt_select_pattern)
+
+    def invariants(self,
+                   declarations: Declarations,
+                   *,
+                   ppt_select_pattern: Optional[str] = None
+                   ) -> InvariantMap:
+        """Reads the invariants via PrintInvariants. See :meth:`text`."""
+        text = self.text(ppt_select_pattern=ppt_select_pattern)
+        reader = InvariantReader(declarations)
+        return InvariantMap.from_stream(declarations,
+                                        reader.read_lines(text.splitlines()))
+
+    def merge(self,
+              destination: str,
+              *others: Union[str, 'SerializedInvariants']
+              ) -> 'SerializedInvariants':
+        """Merges these invariants with those in the given files via
+        MergeInvariants, and writes the result to a given file on the host.
+        """
+        filenames = [self.filename]
+        filenames += [other if isinstance(other, str) else other.filename
+                      for other in others]
+        return self.daikon.merge_invariants(destination, *filenames)
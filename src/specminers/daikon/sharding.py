@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+"""
+This module partitions declarations and traces into shards of program points,
+which can be mined independently of one another.
+
+The program points for a given method (e.g., its ENTER and EXIT points) are
+always placed within the same shard, since Daikon relates the values at each
+exit point to those at the entry point (e.g., :code:`orig(x)`). Declarations
+that contain class or object program points, which Daikon relates to the
+program points of every method of their class, are kept within a single
+shard.
+"""
+__all__ = ('Shard', 'assign_shards', 'count_records', 'group_program_points',
+           'write_shards')
+
+from typing import (Counter, Dict, IO, Iterator, List, Mapping, Sequence,
+                    Tuple)
+import collections
+import heapq
+import os
+
+from loguru import logger
+import attr
+
+from .compression import open_file
+from .declarations import Declarations
+from .lazy_declarations import LazyDeclarations
+from .ppt import PptType
+
+_CHUNK_SIZE = 1 << 22
+
+# the types of program point that may be mined separately from the program
+# points of other methods
+_METHOD_PPT_TYPES = (PptType.enter, PptType.exit, PptType.subexit,
+                     PptType.point)
+
+
+@attr.s(frozen=True, slots=True, auto_attribs=True)
+class Shard:
+    """Describes the input files for a shard.
+
+    Attributes
+    ----------
+    ppts: Tuple[str, ...]
+        The names of the program points within the shard.
+    declarations_filename: str
+        The declarations for the program points within the shard.
+    trace_filenames: Tuple[str, ...]
+        The records for the program points within the shard, with one file
+        for each of the input traces that contains at least one such record.
+    """
+    ppts: Tuple[str, ...]
+    declarations_filename: str
+    trace_filenames: Tuple[str, ...]
+
+
+def group_program_points(declarations: Declarations) -> List[List[str]]:
+    """Groups the program points within a set of declarations into groups
+    that must be mined together. If the declarations contain class or object
+    program points, a single group is returned."""
+    if any(ppt.typ not in _METHOD_PPT_TYPES
+           for ppt in declarations.values()):
+        logger.warning('declarations contain class or object program '
+                       'points: mining cannot be partitioned')
+        return [list(declarations)]
+
+    groups: Dict[str, List[str]] = {}
+    for name in declarations:
+        method = name.partition(':::')[0]
+        groups.setdefault(method, []).append(name)
+    return list(groups.values())
+
+
+def _iter_records(filename: str) -> Iterator[str]:
+    """Yields the text of each record within a trace file, without its
+    surrounding blank lines."""
+    tail = ''
+    with open_file(filename, 'r') as fh:
+        while True:
+            chunk = fh.read(_CHUNK_SIZE)
+            if not chunk:
+                break
+            records = (tail + chunk).split('\n\n')
+            tail = records.pop()
+            for record in records:
+                record = record.strip('\n')
+                if record:
+                    yield record
+    tail = tail.strip('\n')
+    if tail:
+        yield tail
+
+
+def count_records(filenames: Sequence[str]) -> Counter[str]:
+    """Counts the number of records for each program point within the given
+    trace files, which may be compressed."""
+    counts: Counter[str] = collections.Counter()
+    for filename in filenames:
+        counts.update(record.partition('\n')[0]
+                      for record in _iter_records(filename))
+    return counts
+
+
+def assign_shards(groups: Sequence[Sequence[str]],
+                  weights: Mapping[str, int],
+                  num_shards: int
+                  ) -> List[List[str]]:
+    """Assigns groups of program points to at most a given number of shards,
+    such that the total weight of each shard is approximately balanced.
+    Groups are assigned in descending order of weight to the shard with the
+    least weight. Shards that are assigned no groups are omitted.
+
+    Raises
+    ------
+    ValueError
+        If the number of shards is not positive.
+    """
+    if num_shards < 1:
+        raise ValueError('number of shards must be positive')
+    weighted = sorted(((sum(weights.get(name, 0) for name in group), i)
+                       for i, group in enumerate(groups)),
+                      reverse=True)
+    shards: List[List[str]] = [[] for _ in range(num_shards)]
+    heap = [(0, i) for i in range(num_shards)]
+    for weight, group_index in weighted:
+        shard_weight, shard_index = heapq.heappop(heap)
+        shards[shard_index] += groups[group_index]
+        # every group adds to the weight, so that empty groups are spread
+        heapq.heappush(heap, (shard_weight + weight + 1, shard_index))
+    return [shard for shard in shards if shard]
+
+
+def _split_declarations(filename: str,
+                        shards: Sequence[Sequence[str]],
+                        directory: str
+                        ) -> List[str]:
+    """Writes the declarations for each shard to a file, preserving the
+    header and the text of each program point exactly as given."""
+    declarations = LazyDeclarations.from_file(filename)
+    filenames: List[str] = []
+    for i, ppts in enumerate(shards):
+        shard_filename = os.path.join(directory, f'shard{i}.decls')
+        with open(shard_filename, 'w') as fh:
+            fh.write(declarations.header)
+            for name in ppts:
+                block = declarations.source(name)
+                fh.write(block if block.endswith('\n\n') else block + '\n')
+        filenames.append(shard_filename)
+    return filenames
+
+
+def _split_trace(filename: str,
+                 shard_of: Mapping[str, int],
+                 outputs: Sequence[IO[str]]
+                 ) -> List[bool]:
+    """Writes each record within a trace to the output for its shard, and
+    indicates which of the outputs were written to.
+
+    Raises
+    ------
+    ValueError
+        If the trace contains a record for an unknown program point.
+    """
+    written = [False] * len(outputs)
+    for record in _iter_records(filename):
+        ppt_name = record.partition('\n')[0]
+        try:
+            index = shard_of[ppt_name]
+        except KeyError:
+            message = ('trace contains record for unknown program '
+                       f'point [{ppt_name}]: {filename}')
+            raise ValueError(message)
+        output = outputs[index]
+        written[index] = True
+        output.write('\n')
+        output.write(record)
+        output.write('\n')
+    return written
+
+
+def write_shards(declarations: Declarations,
+                 declarations_filename: str,
+                 trace_filenames: Sequence[str],
+                 num_shards: int,
+                 directory: str
+                 ) -> List[Shard]:
+    """Partitions the given declarations and traces into at most a given
+    number of shards, balanced by their number of records, and writes the
+    files for each shard to a given directory. Shards that contain no records
+    are omitted.
+
+    Raises
+    ------
+    ValueError
+        If a trace contains a record for an unknown program point.
+    """
+    weights = count_records(trace_filenames)
+    groups = group_program_points(declarations)
+    shards = assign_shards(groups, weights, num_shards)
+    logger.debug(f'partitioned {len(declarations)} program points into '
+                 f'{len(shards)} shards')
+    shard_of = {name: i for i, ppts in enumerate(shards) for name in ppts}
+
+    decls_filenames = _split_declarations(declarations_filename, shards,
+                                          directory)
+    shard_traces: List[List[str]] = [[] for _ in shards]
+    for trace_index, trace_filename in enumerate(trace_filenames):
+        filenames = [os.path.join(directory, f'shard{i}.{trace_index}.dtrace')
+                     for i in range(len(shards))]
+        outputs = [open(filename, 'w') for filename in filenames]
+        try:
+            written = _split_trace(trace_filename, shard_of, outputs)
+        finally:
+            for output in outputs:
+                output.close()
+        for i, filename in enumerate(filenames):
+            if written[i]:
+                shard_traces[i].append(filename)
+            else:
+                os.remove(filename)
+
+    return [Shard(tuple(ppts), decls_filename, tuple(traces))
+            for ppts, decls_filename, traces
+            in zip(shards, decls_filenames, shard_traces)
+            if traces]
@@ -5,6 +5,12 @@ References
 ----------
 * https://plse.cs.washington.edu/daikon/download/doc/developer
 """
+from .background import BackgroundTraceWriter, OverflowPolicy
+from .binary import (TraceBinaryReader, TraceBinaryWriter, binary_to_text,
+                     text_to_binary)
+from .bulk import BulkTraceFileReader
+from .compact import CompactTraceRecord
+from .index import TraceIndex
 from .reader import TraceFileReader
 from .record import TraceRecord, TraceRecordVariable
 from .writer import TraceWriter
@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+"""
+This module provides a trace writer that encodes and writes records on a
+background thread, so that callers are not blocked by file I/O.
+"""
+__all__ = ('BackgroundTraceWriter', 'OverflowPolicy')
+
+from types import TracebackType
+from typing import (Any, Deque, Iterator, List, Optional, Tuple, Type,
+                    Union)
+import collections
+import contextlib
+import enum
+import threading
+
+from loguru import logger
+import attr
+
+from .record import TraceRecord
+from .writer import TraceWriter
+from ..compression import DEFAULT_BUFFER_SIZE
+from ..declarations import Declarations
+from ..ppt import ProgramPoint
+
+_Item = Tuple[Union[str, ProgramPoint, TraceRecord], Optional[dict]]
+
+
+class OverflowPolicy(enum.Enum):
+    """Determines what happens to a record that is submitted to a
+    background writer whose queue is full.
+
+    Attributes
+    ----------
+    block
+        The caller is blocked until there is space in the queue.
+    drop_newest
+        The submitted record is dropped.
+    drop_oldest
+        The oldest record in the queue is dropped to make space for the
+        submitted record.
+    """
+    block = 'block'
+    drop_newest = 'drop-newest'
+    drop_oldest = 'drop-oldest'
+
+
+@attr.s(eq=False, repr=False)
+class BackgroundTraceWriter:
+    """Writes trace records via a :class:`TraceWriter` on a background
+    thread.
+
+    Records are placed in a bounded in-memory queue and are encoded and
+    written, in the order that they were accepted, by a background thread.
+    Nonces are assigned by the underlying writer as records are written, and
+    so remain ordered for each program point, even if records are dropped.
+    Closing the writer, or leaving its context, drains the queue.
+
+    Records with missing values are rejected when they are submitted. If a
+    record nonetheless cannot be written, the error is logged, the record is
+    counted as failed, and the remaining records are still written; the
+    error is raised by the next call to :meth:`flush` or :meth:`close`.
+
+    Attributes
+    ----------
+    writer: TraceWriter
+        The writer that is used to encode and write records. It must not be
+        used directly while this writer is open.
+    max_queue_size: int
+        The maximum number of records that may wait in the queue.
+    policy: OverflowPolicy
+        Determines what happens when a record is submitted to a full queue.
+    """
+    writer: TraceWriter = attr.ib()
+    max_queue_size: int = attr.ib(default=10000)
+    policy: OverflowPolicy = attr.ib(default=OverflowPolicy.block)
+    _queue: Deque[_Item] = attr.ib(init=False, factory=collections.deque)
+    _lock: threading.Lock = attr.ib(init=False, factory=threading.Lock)
+    # serializes the use of the underlying writer, which is not thread-safe,
+    # without blocking callers that submit records
+    _io_lock: threading.Lock = attr.ib(init=False, factory=threading.Lock)
+    _not_empty: threading.Condition = attr.ib(init=False)
+    _not_full: threading.Condition = attr.ib(init=False)
+    _idle: threading.Condition = attr.ib(init=False)
+    _thread: threading.Thread = attr.ib(init=False)
+    _closed: bool = attr.ib(init=False, default=False)
+    _error: Optional[BaseException] = attr.ib(init=False, default=None)
+    _failure: Optional[Exception] = attr.ib(init=False, default=None)
+    _num_in_flight: int = attr.ib(init=False, default=0)
+    _num_queued: int = attr.ib(init=False, default=0)
+    _num_written: int = attr.ib(init=False, default=0)
+    _num_dropped: int = attr.ib(init=False, default=0)
+    _num_failed: int = attr.ib(init=False, default=0)
+
+    def __attrs_post_init__(self) -> None:
+        if self.max_queue_size < 1:
+            raise ValueError('max_queue_size must be positive')
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._idle = threading.Condition(self._lock)
+        self._thread = threading.Thread(target=self._run,
+                                        name='BackgroundTraceWriter',
+                                        daemon=True)
+        self._thread.start()
+
+    @classmethod
+    @contextlib.contextmanager
+    def for_file(cls,
+                 declarations: Declarations,
+                 filename: str,
+                 *,
+                 max_queue_size: int = 10000,
+                 policy: OverflowPolicy = OverflowPolicy.block,
+                 compresslevel: Optional[int] = None,
+                 buffer_size: int = DEFAULT_BUFFER_SIZE
+                 ) -> Iterator['BackgroundTraceWriter']:
+        """Provides a background writer for a given trace file.
+        See :meth:`TraceWriter.for_file`."""
+        with TraceWriter.for_file(declarations,
+                                  filename,
+                                  compresslevel=compresslevel,
+                                  buffer_size=buffer_size) as writer:
+            with cls(writer, max_queue_size, policy) as background_writer:
+                yield background_writer
+
+    def __enter__(self) -> 'BackgroundTraceWriter':
+        return self
+
+    def __exit__(self,
+                 ex_type: Optional[Type[BaseException]],
+                 ex_val: Optional[BaseException],
+                 ex_tb: Optional[TracebackType]
+                 ) -> None:
+        if ex_type is None:
+            self.close()
+            return
+        # errors must not replace the exception that is being propagated
+        try:
+            self.close()
+        except Exception:
+            logger.exception('background trace writer failed')
+
+    @property
+    def queued(self) -> int:
+        """The number of records that have been accepted into the queue."""
+        return self._num_queued
+
+    @property
+    def written(self) -> int:
+        """The number of records that have been written."""
+        return self._num_written
+
+    @property
+    def dropped(self) -> int:
+        """The number of records that have been dropped because the queue was
+        full."""
+        return self._num_dropped
+
+    @property
+    def failed(self) -> int:
+        """The number of records that could not be written."""
+        return self._num_failed
+
+    def _check_error(self) -> None:
+        if self._error is not None:
+            raise RuntimeError('background trace writer failed') \
+                from self._error
+
+    def _check_failure(self) -> None:
+        """Raises the most recent error that prevented a record from being
+        written, if it has not been raised already."""
+        failure, self._failure = self._failure, None
+        if failure is not None:
+            raise RuntimeError('failed to write trace record') from failure
+
+    def _put(self, item: _Item) -> None:
+        with self._lock:
+            self._check_error()
+            if self._closed:
+                raise ValueError('background trace writer is closed')
+            while len(self._queue) >= self.max_queue_size:
+                if self.policy is OverflowPolicy.drop_newest:
+                    self._num_dropped += 1
+                    return
+                if self.policy is OverflowPolicy.drop_oldest:
+                    self._queue.popleft()
+                    self._num_dropped += 1
+                    self._num_in_flight -= 1
+                    break
+                self._not_full.wait()
+                self._check_error()
+            self._queue.append(item)
+            self._num_queued += 1
+            self._num_in_flight += 1
+            self._not_empty.notify()
+
+    def write(self,
+              ppt_or_name: Union[str, ProgramPoint],
+              **values: Any
+              ) -> None:
+        """Submits a record for a given program point to the queue.
+
+        Raises
+        ------
+        KeyError
+            If there is no program point with the given name, or if a value
+            is missing for a variable in the program point.
+        """
+        ppt = ppt_or_name if isinstance(ppt_or_name, ProgramPoint) \
+            else self.writer.declarations[ppt_or_name]
+        for name in ppt:
+            if name not in values:
+                raise KeyError(name)
+        self._put((ppt_or_name, values))
+
+    def add(self, record: TraceRecord) -> None:
+        """Submits a given record to the queue. Note that the nonce of the
+        record is written as given."""
+        self._put((record, None))
+
+    def _run(self) -> None:
+        writer = self.writer
+        while True:
+            with self._lock:
+                while not self._queue and not self._closed:
+                    self._not_empty.wait()
+                if not self._queue:
+                    return
+                batch: List[_Item] = list(self._queue)
+                self._queue.clear()
+                self._not_full.notify_all()
+            try:
+                with self._io_lock:
+                    for target, values in batch:
+                        failure: Optional[Exception] = None
+                        try:
+                            if values is None:
+                                assert isinstance(target, TraceRecord)
+                                writer.add(target)
+                            else:
+                                assert not isinstance(target, TraceRecord)
+                                writer.write(target, **values)
+                        except Exception as err:
+                            logger.exception('failed to write trace record')
+                            failure = err
+                        with self._lock:
+                            if failure is None:
+                                self._num_written += 1
+                            else:
+                                self._num_failed += 1
+                                self._failure = failure
+                            self._num_in_flight -= 1
+                            if self._num_in_flight == 0:
+                                self._idle.notify_all()
+            except BaseException as err:
+                logger.exception('background trace writer failed')
+                with self._lock:
+                    self._error = err
+                    self._queue.clear()
+                    self._num_in_flight = 0
+                    self._not_full.notify_all()
+                    self._idle.notify_all()
+                return
+
+    def flush(self) -> None:
+        """Blocks until all queued records have been written, and flushes the
+        underlying writer.
+
+        Raises
+        ------
+        RuntimeError
+            If a record could not be written since the last call to this
+            method, or if the background thread failed.
+        """
+        with self._lock:
+            while self._num_in_flight > 0 and self._error is None:
+                self._idle.wait()
+            self._check_error()
+        # records may be submitted, and written, while the writer is flushed
+        with self._io_lock:
+            self.writer.flush()
+        with self._lock:
+            self._check_failure()
+
+    def close(self) -> None:
+        """Drains the queue, stops the background thread, and flushes the
+        underlying writer.
+
+        Raises
+        ------
+        RuntimeError
+            If a record could not be written since the last call to
+            :meth:`flush`, or if the background thread failed.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._not_empty.notify_all()
+        self._thread.join()
+        # records that were already written may be buffered by the writer
+        try:
+            self._check_error()
+            self._check_failure()
+        finally:
+            self.writer.flush()
@@ -0,0 +1,435 @@
+# -*- coding: utf-8 -*-
+"""
+This module provides a compact binary container format for Daikon traces.
+
+A binary trace begins with a header that holds the declarations of the
+program points within the trace, encoded as JSON. The header is followed by a
+sequence of frames, each of which either adds a string to the string table of
+the trace or describes a single trace record. Records are stored in the order
+that they were written. The values of the float and integer variables of a
+record are packed as fixed-width binary numbers, and the values of all other
+variables are stored as references to the string table.
+
+The format preserves the exact text of each value: values whose text cannot
+be reproduced from their binary form (e.g., :code:`nonsensical`, or an
+integer that is given for a float variable) cause the record to be stored as
+references to the string table instead. Converting a text trace to binary
+and back again therefore reproduces its records verbatim.
+"""
+__all__ = ('TraceBinaryReader', 'TraceBinaryWriter', 'binary_to_text',
+           'text_to_binary')
+
+from typing import (Any, BinaryIO, Dict, Iterator, List, Optional, Sequence,
+                    Tuple, Union)
+import contextlib
+import json
+import mmap
+import os
+import struct
+
+from loguru import logger
+import attr
+
+from .bulk import DEFAULT_BLOCK_SIZE, read_blocks
+from .plan import RecordPlan, scan_records
+from .record import TraceRecord
+from .writer import TraceWriter
+from ..compression import (DEFAULT_BUFFER_SIZE, ensure_uncompressed,
+                           open_file)
+from ..declarations import Declarations
+from ..helpers import unescape
+from ..ppt import ProgramPoint, PptType
+from ..vardecl import DEC_TYPE_TO_ENCODER, VarDecl
+
+_MAGIC = b'SMTB'
+_VERSION = 1
+_HEADER = struct.Struct('<4sHI')
+_STRING = struct.Struct('<BI')
+_RECORD = struct.Struct('<BBIq')
+
+_TAG_STRING = 1
+_TAG_RECORD = 2
+
+_FLAG_NONCE = 1
+_FLAG_TEXT = 2
+
+# the binary code that is used to store each type of value; values of all
+# other types are stored as references to the string table
+_DEC_TYPE_TO_CODE = {'float': 'd', 'int': 'q'}
+
+_Raw = Tuple[ProgramPoint, Optional[int], List[str], List[str]]
+
+
+def _encode_schema(declarations: Declarations) -> bytes:
+    ppts = []
+    for ppt in declarations.values():
+        variables = [[var.name, var.dec_type, var.rep_type,
+                      var.comparability, var.constant, list(var.flags)]
+                     for var in ppt.variables.values()]
+        ppts.append([ppt.name, ppt.typ.value, variables])
+    return json.dumps(ppts, separators=(',', ':')).encode('utf-8')
+
+
+def _decode_schema(schema: bytes) -> Declarations:
+    ppts = []
+    for name, typ, variables in json.loads(schema.decode('utf-8')):
+        decls = []
+        for var_name, dec_type, rep_type, comparability, constant, flags \
+                in variables:
+            # constants are stored escaped and are escaped again by VarDecl
+            decls.append(VarDecl(var_name, dec_type, rep_type, comparability,
+                                 constant=unescape(constant), flags=flags))
+        ppts.append(ProgramPoint.build(name, decls, PptType(typ)))
+    return Declarations(ppts)
+
+
+@attr.s(frozen=True, slots=True, auto_attribs=True)
+class _Layout:
+    """Describes the binary layout of the records for a program point."""
+    ppt_id: int
+    ppt: ProgramPoint
+    codes: str
+    row: struct.Struct
+    text_row: struct.Struct
+
+    @classmethod
+    def build(cls, ppt_id: int, ppt: ProgramPoint) -> '_Layout':
+        codes = ''.join(_DEC_TYPE_TO_CODE.get(var.dec_type, 'I')
+                        for var in ppt.variables.values())
+        size = len(codes)
+        row = struct.Struct(f'<{codes}{size}B')
+        text_row = struct.Struct(f'<{2 * size}I')
+        return _Layout(ppt_id, ppt, codes, row, text_row)
+
+
+@attr.s(eq=False)
+class TraceBinaryWriter:
+    """Writes traces in the binary container format.
+
+    Warning
+    -------
+    This class is not thread-safe.
+
+    Attributes
+    ----------
+    declarations: Declarations
+        The declarations for the program points within the trace.
+    output: BinaryIO
+        The stream to which the trace should be written.
+    buffer_size: int
+        The maximum number of bytes that are held in the internal buffer
+        before it is written to the output.
+    """
+    declarations: Declarations = attr.ib()
+    output: BinaryIO = attr.ib()
+    buffer_size: int = attr.ib(default=DEFAULT_BUFFER_SIZE)
+    _layouts: Dict[str, _Layout] = attr.ib(init=False, repr=False)
+    _strings: Dict[str, int] = attr.ib(init=False, repr=False)
+    _nonces: Dict[str, int] = attr.ib(init=False, repr=False)
+    _buffer: bytearray = attr.ib(init=False, repr=False)
+
+    def __attrs_post_init__(self) -> None:
+        self._layouts = {ppt.name: _Layout.build(i, ppt)
+                         for i, ppt in enumerate(self.declarations.values())}
+        self._strings = {}
+        self._nonces = {name: 1 for name in self.declarations}
+        schema = _encode_schema(self.declarations)
+        self._buffer = bytearray(_HEADER.pack(_MAGIC, _VERSION, len(schema)))
+        self._buffer += schema
+
+    @classmethod
+    @contextlib.contextmanager
+    def for_file(cls,
+                 declarations: Declarations,
+                 filename: str,
+                 *,
+                 buffer_size: int = DEFAULT_BUFFER_SIZE
+                 ) -> Iterator['TraceBinaryWriter']:
+        """Provides a writer for a given binary trace file."""
+        logger.debug(f'writing binary traces to file: {filename}')
+        with open(filename, 'wb') as fh:
+            writer = TraceBinaryWriter(declarations, fh, buffer_size)
+            try:
+                yield writer
+            finally:
+                writer.flush()
+        logger.debug(f'finished writing binary traces to file: {filename}')
+
+    def flush(self) -> None:
+        """Writes any buffered records to the output and flushes it."""
+        if self._buffer:
+            self.output.write(self._buffer)
+            self._buffer = bytearray()
+        self.output.flush()
+
+    def _string_id(self, text: str) -> int:
+        try:
+            return self._strings[text]
+        except KeyError:
+            string_id = len(self._strings)
+            self._strings[text] = string_id
+            encoded = text.encode('utf-8')
+            self._buffer += _STRING.pack(_TAG_STRING, len(encoded))
+            self._buffer += encoded
+            return string_id
+
+    def _pack(self,
+              layout: _Layout,
+              values: Sequence[str],
+              modified: Sequence[str]
+              ) -> Optional[bytes]:
+        """Packs the values of a record in their binary form, or returns
+        :code:`None` if their text cannot be reproduced from that form."""
+        fields: List[Union[int, float]] = []
+        for code, text in zip(layout.codes, values):
+            if code == 'd':
+                try:
+                    number: Union[int, float] = float(text)
+                except ValueError:
+                    return None
+            elif code == 'q':
+                try:
+                    number = int(text)
+                except ValueError:
+                    return None
+            else:
+                fields.append(self._string_id(text))
+                continue
+            if repr(number) != text:
+                return None
+            fields.append(number)
+        for flag in modified:
+            if len(flag) != 1 or not flag.isdigit():
+                return None
+            fields.append(int(flag))
+        try:
+            return layout.row.pack(*fields)
+        except struct.error:
+            return None
+
+    def add_raw(self,
+                ppt_or_name: Union[str, ProgramPoint],
+                nonce: Optional[int],
+                values: Sequence[str],
+                modified: Sequence[str]
+                ) -> None:
+        """Adds a record whose values and modified flags are given verbatim,
+        in the order of the variables in the program point.
+
+        Raises
+        ------
+        KeyError
+            If there is no program point with the given name.
+        ValueError
+            If the number of values or flags differs from the number of
+            variables in the program point.
+        """
+        if isinstance(ppt_or_name, ProgramPoint):
+            ppt_or_name = ppt_or_name.name
+        layout = self._layouts[ppt_or_name]
+        num_vars = len(layout.codes)
+        if len(values) != num_vars or len(modified) != num_vars:
+            message = (f'expected {num_vars} values for program point '
+                       f'[{ppt_or_name}]')
+            raise ValueError(message)
+
+        flags = 0 if nonce is None else _FLAG_NONCE
+        body = self._pack(layout, values, modified)
+        if body is None:
+            flags |= _FLAG_TEXT
+            string_ids = [0] * (2 * num_vars)
+            string_ids[0::2] = [self._string_id(v) for v in values]
+            string_ids[1::2] = [self._string_id(m) for m in modified]
+            body = layout.text_row.pack(*string_ids)
+        header = _RECORD.pack(_TAG_RECORD, flags, layout.ppt_id, nonce or 0)
+        self._buffer += header
+        self._buffer += body
+        if len(self._buffer) >= self.buffer_size:
+            self.output.write(self._buffer)
+            self._buffer = bytearray()
+
+    def add(self, record: TraceRecord) -> None:
+        """Adds a given record. Note that the nonce of the record is written
+        as given."""
+        variables = [record[name] for name in record.ppt]
+        values = [var.variable.encode(var.value) for var in variables]
+        modified = [str(var.modified) for var in variables]
+        self.add_raw(record.ppt, record.nonce, values, modified)
+
+    def write(self,
+              ppt_or_name: Union[str, ProgramPoint],
+              **values: Any
+              ) -> None:
+        """Writes a record, whose variables are all unmodified, for a given
+        program point using the next nonce for that program point."""
+        if isinstance(ppt_or_name, str):
+            ppt_or_name = self.declarations[ppt_or_name]
+        ppt = ppt_or_name
+        nonce = self._nonces[ppt.name]
+        texts = [DEC_TYPE_TO_ENCODER[var.dec_type](values[name])
+                 for name, var in ppt.variables.items()]
+        self.add_raw(ppt, nonce, texts, ['0'] * len(texts))
+        self._nonces[ppt.name] = nonce + 1
+
+
+@attr.s(eq=False)
+class TraceBinaryReader:
+    """Reads traces in the binary container format. The declarations for the
+    trace are read from its header.
+
+    Attributes
+    ----------
+    filename: str
+        The name of the binary trace file, which must not be compressed.
+    declarations: Declarations
+        The declarations for the program points within the trace.
+    """
+    filename: str = attr.ib()
+    declarations: Declarations = attr.ib(init=False)
+    _layouts: List[_Layout] = attr.ib(init=False, repr=False)
+    _plans: List[RecordPlan] = attr.ib(init=False, repr=False)
+    _body_offset: int = attr.ib(init=False, repr=False)
+
+    def __attrs_post_init__(self) -> None:
+        ensure_uncompressed(self.filename)
+        with open(self.filename, 'rb') as fh:
+            header = fh.read(_HEADER.size)
+            if len(header) != _HEADER.size:
+                raise ValueError(f'not a binary trace file: {self.filename}')
+            magic, version, schema_length = _HEADER.unpack(header)
+            if magic != _MAGIC:
+                raise ValueError(f'not a binary trace file: {self.filename}')
+            if version != _VERSION:
+                message = f'unsupported binary trace version: {version}'
+                raise ValueError(message)
+            self.declarations = _decode_schema(fh.read(schema_length))
+        self._body_offset = _HEADER.size + schema_length
+        self._layouts = [_Layout.build(i, ppt) for i, ppt
+                         in enumerate(self.declarations.values())]
+        self._plans = [RecordPlan.for_program_point(ppt)
+                       for ppt in self.declarations.values()]
+
+    def _frames(self) -> Iterator[Tuple[_Layout, Optional[int], bool,
+                                        tuple, List[str]]]:
+        """Yields the layout, nonce, text flag, and unpacked fields of each
+        record, together with the current string table."""
+        if os.path.getsize(self.filename) == self._body_offset:
+            return
+        with open(self.filename, 'rb') as fh:
+            contents = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            strings: List[str] = []
+            layouts = self._layouts
+            unpack_record = _RECORD.unpack_from
+            offset = self._body_offset
+            size = len(contents)
+            while offset < size:
+                tag = contents[offset]
+                if tag == _TAG_STRING:
+                    _, length = _STRING.unpack_from(contents, offset)
+                    offset += _STRING.size
+                    end = offset + length
+                    strings.append(contents[offset:end].decode('utf-8'))
+                    offset = end
+                    continue
+                if tag != _TAG_RECORD:
+                    message = f'corrupt binary trace file: {self.filename}'
+                    raise ValueError(message)
+                _, flags, ppt_id, nonce = unpack_record(contents, offset)
+                offset += _RECORD.size
+                layout = layouts[ppt_id]
+                is_text = bool(flags & _FLAG_TEXT)
+                row = layout.text_row if is_text else layout.row
+                fields = row.unpack_from(contents, offset)
+                offset += row.size
+                yield (layout,
+                       nonce if flags & _FLAG_NONCE else None,
+                       is_text,
+                       fields,
+                       strings)
+        finally:
+            contents.close()
+
+    def read_raw(self) -> Iterator[_Raw]:
+        """Reads the program point, nonce, and verbatim text of the values
+        and modified flags of each record in the trace."""
+        for layout, nonce, is_text, fields, strings in self._frames():
+            num_vars = len(layout.codes)
+            if is_text:
+                values = [strings[i] for i in fields[0:2 * num_vars:2]]
+                modified = [strings[i] for i in fields[1::2]]
+            else:
+                values = [strings[f] if code == 'I' else repr(f)
+                          for code, f in zip(layout.codes, fields)]
+                modified = [str(flag) for flag in fields[num_vars:]]
+            yield layout.ppt, nonce, values, modified
+
+    def read(self) -> Iterator[TraceRecord]:
+        """Reads the records within the trace. The values of records are
+        decoded in the same way as those of a text trace."""
+        plans = self._plans
+        for layout, nonce, is_text, fields, strings in self._frames():
+            plan = plans[layout.ppt_id]
+            names = plan.names
+            num_vars = len(names)
+            if is_text:
+                values = {name: decode(strings[i]) for name, decode, i
+                          in zip(names, plan.decoders, fields[0::2])}
+                modified = {name: int(strings[i])
+                            for name, i in zip(names, fields[1::2])}
+            else:
+                values = {}
+                for name, code, decode, field \
+                        in zip(names, layout.codes, plan.decoders, fields):
+                    values[name] = decode(strings[field]) \
+                        if code == 'I' else field
+                modified = dict(zip(names, fields[num_vars:]))
+            yield TraceRecord(layout.ppt, nonce, values, modified)
+
+
+def text_to_binary(declarations: Declarations,
+                   text_filename: str,
+                   binary_filename: str,
+                   *,
+                   block_size: int = DEFAULT_BLOCK_SIZE
+                   ) -> int:
+    """Converts a text trace file to a binary trace file.
+
+    Returns
+    -------
+    int
+        The number of records that were converted.
+    """
+    plans = RecordPlan.for_declarations(declarations)
+    num_records = 0
+    for_file = TraceBinaryWriter.for_file
+    with open_file(text_filename, 'r') as fh, \
+            for_file(declarations, binary_filename) as writer:
+        for lines in read_blocks(fh, block_size):
+            for plan, nonce, block in scan_records(plans, lines):
+                plan.check_names(block)
+                writer.add_raw(plan.ppt, nonce, block[1::3], block[2::3])
+                num_records += 1
+    return num_records
+
+
+def binary_to_text(binary_filename: str,
+                   text_filename: str,
+                   *,
+                   compresslevel: Optional[int] = None
+                   ) -> Declarations:
+    """Converts a binary trace file to a text trace file, which may be
+    compressed, and returns the declarations for the trace.
+
+    Raises
+    ------
+    ValueError
+        If the binary trace file is compressed.
+    """
+    reader = TraceBinaryReader(binary_filename)
+    with TraceWriter.for_file(reader.declarations,
+                              text_filename,
+                              compresslevel=compresslevel) as writer:
+        for ppt, nonce, values, modified in reader.read_raw():
+            writer.add_raw(ppt, nonce, values, modified)
+    return reader.declarations
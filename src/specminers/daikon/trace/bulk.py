@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+This module provides a high-throughput engine for reading trace files that
+parses records in bulk from large blocks of text using a precompiled plan for
+each program point.
+"""
+__all__ = ('BulkTraceFileReader', 'read_blocks')
+
+from typing import Dict, IO, Iterator, List
+
+import attr
+
+from .compact import CompactTraceRecord
+from .plan import RecordPlan, scan_records
+from .record import TraceRecord
+from ..compression import open_file
+from ..declarations import Declarations
+
+DEFAULT_BLOCK_SIZE = 4 * 1024 * 1024
+
+
+def read_blocks(fh: IO[str], block_size: int) -> Iterator[List[str]]:
+    """Reads the lines of a trace file in blocks of complete records.
+
+    Parameters
+    ----------
+    fh: IO[str]
+        The trace file.
+    block_size: int
+        The number of characters that should be read at a time. Blocks are
+        extended to the end of the last record that they contain, and so may
+        be slightly larger or smaller than this size.
+    """
+    remainder = ''
+    while True:
+        chunk = fh.read(block_size)
+        if not chunk:
+            break
+        text = remainder + chunk
+        # an empty line marks the start of a new record
+        boundary = text.rfind('\n\n')
+        if boundary < 0:
+            remainder = text
+            continue
+        remainder = text[boundary + 1:]
+        yield text[:boundary].split('\n')
+    if remainder:
+        yield remainder.rstrip('\n').split('\n')
+
+
+@attr.s(auto_attribs=True)
+class BulkTraceFileReader:
+    """Reads Daikon trace files in bulk.
+
+    Produces the same records as :class:`TraceFileReader`, but avoids
+    per-line buffering and per-variable lookups by reading large blocks of
+    text at a time and decoding them using a plan for each program point that
+    is compiled once from the declarations.
+
+    Attributes
+    ----------
+    declarations: Declarations
+        The declarations for the program points within the trace.
+    block_size: int
+        The number of characters that should be read from the file at a time.
+    """
+    declarations: Declarations
+    block_size: int = attr.ib(default=DEFAULT_BLOCK_SIZE)
+    _plans: Dict[str, RecordPlan] = attr.ib(init=False, repr=False)
+
+    def __attrs_post_init__(self) -> None:
+        self._plans = RecordPlan.for_declarations(self.declarations)
+
+    def read_lines(self, lines: List[str]) -> Iterator[TraceRecord]:
+        """Reads the records within a block of complete records."""
+        for plan, nonce, block in scan_records(self._plans, lines):
+            yield plan.decode(nonce, block)
+
+    def read_file_contents(self, contents: str) -> Iterator[TraceRecord]:
+        """Reads the records within the contents of a trace file."""
+        yield from self.read_lines(contents.split('\n'))
+
+    def _read_blocks(self, filename: str) -> Iterator[List[str]]:
+        with open_file(filename, 'r') as fh:
+            yield from read_blocks(fh, self.block_size)
+
+    def read_file(self, filename: str) -> Iterator[TraceRecord]:
+        for lines in self._read_blocks(filename):
+            yield from self.read_lines(lines)
+
+    def read(self, *filenames: str) -> Iterator[TraceRecord]:
+        for filename in filenames:
+            yield from self.read_file(filename)
+
+    def read_compact(self, *filenames: str) -> Iterator[CompactTraceRecord]:
+        """Reads the records within the given trace files as compact records,
+        whose values are decoded only when they are accessed."""
+        plans = self._plans
+        for filename in filenames:
+            for lines in self._read_blocks(filename):
+                for plan, nonce, block in scan_records(plans, lines):
+                    yield CompactTraceRecord.from_lines(plan, nonce, block)
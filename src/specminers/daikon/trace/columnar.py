@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+"""
+This module provides a columnar representation of trace files, in which the
+records for each program point are stored as a table of NumPy arrays.
+
+Note
+----
+This module requires NumPy, which can be installed via the :code:`numpy`
+extra (i.e., :code:`pip install specminers[numpy]`).
+"""
+__all__ = ('DictionaryColumn', 'TraceTable', 'read_tables')
+
+from typing import Dict, Iterable, List, Mapping, Optional, Union
+import warnings
+
+import attr
+import numpy as np
+
+from .bulk import DEFAULT_BLOCK_SIZE, read_blocks
+from .plan import RecordPlan, scan_records
+from ..compression import open_file
+from ..declarations import Declarations
+from ..ppt import ProgramPoint
+
+_TRUE_STRINGS = ('true', 'True', '1')
+
+DEC_TYPE_TO_DTYPE: Mapping[str, type] = {
+    'float': np.float64,
+    'int': np.int64,
+    'boolean': np.bool_
+}
+
+
+@attr.s(frozen=True, slots=True, auto_attribs=True)
+class DictionaryColumn:
+    """A dictionary-encoded column of strings.
+
+    Attributes
+    ----------
+    codes: np.ndarray
+        The index of the category for each record.
+    categories: np.ndarray
+        The distinct values within the column, given as an array of objects.
+    """
+    codes: np.ndarray
+    categories: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def decode(self) -> np.ndarray:
+        """Returns the values within this column as an array of objects."""
+        return self.categories[self.codes]
+
+
+Column = Union[np.ndarray, DictionaryColumn]
+
+
+@attr.s(frozen=True, slots=True, auto_attribs=True)
+class TraceTable:
+    """Stores the trace records for a single program point as columns.
+
+    Values of string variables retain their surrounding quotes, as is the
+    case for :class:`TraceRecord`.
+
+    Attributes
+    ----------
+    ppt: ProgramPoint
+        The program point to which the records belong.
+    nonces: np.ndarray
+        The nonce of each record, or -1 if the record has no nonce.
+    columns: Mapping[str, Column]
+        The values of each variable, indexed by the name of the variable.
+    modified: Mapping[str, np.ndarray]
+        The modified flag of each variable, indexed by the name of the
+        variable.
+    """
+    ppt: ProgramPoint
+    nonces: np.ndarray
+    columns: Mapping[str, Column]
+    modified: Mapping[str, np.ndarray]
+
+    def __len__(self) -> int:
+        """Returns the number of records within this table."""
+        return len(self.nonces)
+
+    def __getitem__(self, name: str) -> Column:
+        """Retrieves the column for a variable with a given name."""
+        return self.columns[name]
+
+
+def _parse_float(text: str) -> float:
+    # Daikon uses "nonsensical" to denote the absence of a value
+    return np.nan if text == 'nonsensical' else float(text)
+
+
+def _decode_column(dec_type: str, cells: List[str]) -> np.ndarray:
+    """Decodes a column of value strings to an array of the appropriate type.
+    String columns are left undecoded as an array of objects."""
+    if dec_type == 'boolean':
+        return np.array([c in _TRUE_STRINGS for c in cells], dtype=np.bool_)
+    dtype = DEC_TYPE_TO_DTYPE.get(dec_type)
+    if dtype is None:
+        return np.array(cells, dtype=object)
+    values: Optional[np.ndarray]
+    # NumPy 2 raises a ValueError for text that is not a number, whereas
+    # earlier versions warn and stop parsing at that text
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', DeprecationWarning)
+            values = np.fromstring(' '.join(cells), dtype=dtype, sep=' ')
+    except ValueError:
+        values = None
+    if values is not None and len(values) == len(cells):
+        return values
+    if dtype is not np.float64:
+        raise ValueError(f'failed to decode {dec_type} column')
+    return np.array([_parse_float(c) for c in cells], dtype=np.float64)
+
+
+@attr.s(auto_attribs=True)
+class _TableBuilder:
+    plan: RecordPlan
+    _nonces: List[int] = attr.ib(factory=list)
+    _cells: List[str] = attr.ib(factory=list)
+    _nonce_chunks: List[np.ndarray] = attr.ib(factory=list)
+    _value_chunks: List[List[np.ndarray]] = attr.ib(init=False)
+    _modified_chunks: List[np.ndarray] = attr.ib(factory=list)
+
+    def __attrs_post_init__(self) -> None:
+        self._value_chunks = [[] for _ in self.plan.names]
+
+    def add(self, nonce: int, lines: List[str]) -> None:
+        self._nonces.append(nonce)
+        self._cells.extend(lines)
+
+    def flush(self) -> None:
+        """Converts the records that have been added since the last flush to
+        arrays."""
+        if not self._nonces:
+            return
+        plan = self.plan
+        num_records = len(self._nonces)
+        num_vars = len(plan.names)
+        cells = self._cells
+        plan.check_names(cells, num_records)
+
+        # modified flags are single digits
+        flags = ''.join(cells[2::3]).encode('ascii')
+        if len(flags) != num_records * num_vars:
+            raise ValueError('unexpected modified flag in record for '
+                             f'program point [{plan.ppt.name}]')
+        modified = np.frombuffer(flags, dtype=np.uint8) - ord('0')
+        self._modified_chunks.append(modified.reshape(num_records, num_vars))
+
+        self._nonce_chunks.append(np.array(self._nonces, dtype=np.int64))
+        stride = 3 * num_vars
+        for i, name in enumerate(plan.names):
+            dec_type = plan.ppt[name].dec_type
+            column = _decode_column(dec_type, cells[3 * i + 1::stride])
+            self._value_chunks[i].append(column)
+        self._nonces = []
+        self._cells = []
+
+    def build(self, strings: str) -> TraceTable:
+        self.flush()
+        plan = self.plan
+        num_vars = len(plan.names)
+        nonce_chunks = self._nonce_chunks
+        modified_chunks = self._modified_chunks
+        if not nonce_chunks:
+            nonce_chunks = [np.empty(0, dtype=np.int64)]
+            modified_chunks = [np.empty((0, num_vars), dtype=np.uint8)]
+        nonces = np.concatenate(nonce_chunks)
+        modified_matrix = np.concatenate(modified_chunks)
+
+        columns: Dict[str, Column] = {}
+        modified: Dict[str, np.ndarray] = {}
+        for i, name in enumerate(plan.names):
+            dec_type = plan.ppt[name].dec_type
+            chunks = self._value_chunks[i]
+            column: Column
+            if chunks:
+                column = np.concatenate(chunks)
+            else:
+                column = np.empty(0, dtype=DEC_TYPE_TO_DTYPE.get(dec_type,
+                                                                 object))
+            if dec_type not in DEC_TYPE_TO_DTYPE and strings == 'dictionary':
+                categories, codes = np.unique(column, return_inverse=True)
+                column = DictionaryColumn(codes.astype(np.int32), categories)
+            columns[name] = column
+            modified[name] = np.ascontiguousarray(modified_matrix[:, i])
+        return TraceTable(plan.ppt, nonces, columns, modified)
+
+
+def read_tables(declarations: Declarations,
+                filenames: Iterable[str],
+                *,
+                strings: str = 'object',
+                block_size: int = DEFAULT_BLOCK_SIZE
+                ) -> Dict[str, TraceTable]:
+    """Loads the records within a number of trace files into a columnar table
+    for each program point.
+
+    Parameters
+    ----------
+    declarations: Declarations
+        The declarations for the program points within the trace files.
+    filenames: Iterable[str]
+        The trace files that should be read.
+    strings: str
+        Specifies how string variables should be stored: either as arrays of
+        objects, :code:`object`, or as dictionary-encoded columns,
+        :code:`dictionary`.
+    block_size: int
+        The number of characters that should be read from a file at a time.
+
+    Returns
+    -------
+    Dict[str, TraceTable]
+        The table for each program point in the declarations, indexed by the
+        name of the program point.
+
+    Raises
+    ------
+    ValueError
+        If an unsupported storage method for strings is given.
+    """
+    if strings not in ('object', 'dictionary'):
+        raise ValueError(f'unsupported storage for strings: {strings}')
+    plans = RecordPlan.for_declarations(declarations)
+    builders = {name: _TableBuilder(plan) for name, plan in plans.items()}
+    for filename in filenames:
+        with open_file(filename, 'r') as fh:
+            for lines in read_blocks(fh, block_size):
+                for plan, nonce, block in scan_records(plans, lines):
+                    builder = builders[plan.ppt.name]
+                    builder.add(-1 if nonce is None else nonce, block)
+                for builder in builders.values():
+                    builder.flush()
+    return {name: builder.build(strings) for name, builder in builders.items()}
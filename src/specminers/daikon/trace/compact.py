@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+This module provides a compact representation of trace records that stores
+the undecoded values of a record positionally and decodes them on access.
+"""
+__all__ = ('CompactTraceRecord',)
+
+from array import array
+from typing import Iterator, List, Mapping, Optional, Union
+
+import attr
+
+from .plan import RecordPlan
+from .record import TraceRecord, TraceRecordVariable
+from ..ppt import ProgramPoint
+
+_ZERO = ord('0')
+
+
+@attr.s(slots=True, eq=False, repr=False, auto_attribs=True)
+class CompactTraceRecord(Mapping[str, TraceRecordVariable]):
+    """A memory-efficient, read-only trace record.
+
+    Rather than holding a dictionary of decoded values and a dictionary of
+    modified flags, the record holds the text of its values, in the order of
+    the variables in its program point, and a byte per modified flag. Values
+    are decoded each time that they are accessed.
+
+    Attributes
+    ----------
+    plan: RecordPlan
+        The plan for the program point to which this record belongs.
+    nonce: int, optional
+        The nonce of the record, if any.
+    """
+    plan: RecordPlan
+    nonce: Optional[int]
+    _text: str
+    _modified: bytes
+    _ends: Optional[array] = attr.ib(default=None)
+
+    @classmethod
+    def from_lines(cls,
+                   plan: RecordPlan,
+                   nonce: Optional[int],
+                   lines: List[str]
+                   ) -> 'CompactTraceRecord':
+        """Constructs a record from the lines that describe its variables.
+
+        Raises
+        ------
+        ValueError
+            If the lines do not describe a record for the given plan, or if a
+            modified flag is not a single digit.
+        """
+        plan.check_names(lines)
+        modified = ''.join(lines[2::3]).encode('ascii')
+        if len(modified) != len(plan.names):
+            message = ('unexpected modified flag in record for program '
+                       f'point [{plan.ppt.name}]')
+            raise ValueError(message)
+        return CompactTraceRecord(plan, nonce, '\n'.join(lines[1::3]),
+                                  modified)
+
+    @property
+    def ppt(self) -> ProgramPoint:
+        return self.plan.ppt
+
+    def _compute_ends(self) -> array:
+        text = self._text
+        ends = array('I')
+        position = -1
+        for _ in range(len(self._modified) - 1):
+            position = text.index('\n', position + 1)
+            ends.append(position)
+        ends.append(len(text))
+        self._ends = ends
+        return ends
+
+    def raw_value_at(self, index: int) -> str:
+        """Returns the undecoded text of the value at a given position."""
+        ends = self._ends
+        if ends is None:
+            ends = self._compute_ends()
+        start = ends[index - 1] + 1 if index > 0 else 0
+        return self._text[start:ends[index]]
+
+    def value_at(self, index: int) -> Union[str, int, float]:
+        """Decodes the value of the variable at a given position."""
+        return self.plan.decoders[index](self.raw_value_at(index))
+
+    def modified_at(self, index: int) -> int:
+        """Returns the modified flag of the variable at a given position."""
+        return self._modified[index] - _ZERO
+
+    def value(self, name: str) -> Union[str, int, float]:
+        """Decodes the value of the variable with a given name."""
+        return self.value_at(self.plan.positions[name])
+
+    def modified(self, name: str) -> int:
+        """Returns the modified flag of the variable with a given name."""
+        return self._modified[self.plan.positions[name]] - _ZERO
+
+    def to_record(self) -> TraceRecord:
+        """Decodes this record to a :class:`TraceRecord`."""
+        names = self.plan.names
+        values = {name: self.value_at(i) for i, name in enumerate(names)}
+        modified = {name: flag - _ZERO
+                    for name, flag in zip(names, self._modified)}
+        return TraceRecord(self.ppt, self.nonce, values, modified)
+
+    def __len__(self) -> int:
+        return len(self._modified)
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self.plan.names
+
+    def __getitem__(self, variable_name: str) -> TraceRecordVariable:
+        index = self.plan.positions[variable_name]
+        return TraceRecordVariable(self.ppt[variable_name],
+                                   self.value_at(index),
+                                   self.modified_at(index))
+
+    def __repr__(self) -> str:
+        return (f'CompactTraceRecord(ppt={self.ppt.name!r}, '
+                f'nonce={self.nonce!r})')
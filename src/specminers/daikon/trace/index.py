@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""
+This module provides a persistent index of the records within a trace file,
+which allows records for particular program points and nonces to be read
+without parsing the rest of the file.
+"""
+__all__ = ('TraceIndex',)
+
+from array import array
+from typing import (Collection, Dict, Iterator, List, Optional, Sequence,
+                    Tuple)
+import contextlib
+import itertools
+import mmap
+import os
+import re
+import struct
+
+from loguru import logger
+import attr
+
+from ..compression import ensure_uncompressed
+
+_MAGIC = b'SMTI'
+_VERSION = 1
+_HEADER = struct.Struct('<4sIqqII')
+
+# matches the start of each record, given by an empty line, followed by the
+# name of its program point and its (optional) nonce
+_RECORD_HEAD = rb'([^\n]+)\n(?:this_invocation_nonce\n(-?\d+)\n)?'
+_FIRST_RECORD_START = re.compile(rb'\n' + _RECORD_HEAD)
+_RECORD_START = re.compile(rb'\n\n' + _RECORD_HEAD)
+
+
+@attr.s(frozen=True, slots=True, auto_attribs=True)
+class TraceIndex:
+    """Records the byte offset, program point, and nonce of every record
+    within a trace file.
+
+    Attributes
+    ----------
+    size: int
+        The size of the trace file, in bytes, when it was indexed.
+    mtime_ns: int
+        The modification time of the trace file, in nanoseconds, when it was
+        indexed.
+    ppts: Sequence[str]
+        The names of the program points that appear within the trace file.
+    offsets: array
+        The byte offset of the first line of each record.
+    ppt_ids: array
+        The position of the program point in :attr:`ppts` for each record.
+    nonces: array
+        The nonce of each record, or -1 if the record has no nonce.
+    """
+    size: int
+    mtime_ns: int
+    ppts: Sequence[str]
+    offsets: array = attr.ib(repr=False)
+    ppt_ids: array = attr.ib(repr=False)
+    nonces: array = attr.ib(repr=False)
+
+    @staticmethod
+    def sidecar_filename(filename: str) -> str:
+        """Returns the name of the index file for a given trace file."""
+        return f'{filename}.idx'
+
+    @classmethod
+    def build(cls, filename: str) -> 'TraceIndex':
+        """Builds an index for a given trace file in a single scan.
+
+        Raises
+        ------
+        ValueError
+            If the trace file is compressed.
+        """
+        ensure_uncompressed(filename)
+        logger.debug(f'indexing trace file: {filename}')
+        stat = os.stat(filename)
+        ppt_to_id: Dict[str, int] = {}
+        offsets = array('q')
+        ppt_ids = array('i')
+        nonces = array('q')
+        if stat.st_size > 0:
+            with open(filename, 'rb') as fh, \
+                 mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                first = _FIRST_RECORD_START.match(mm)  # type: ignore
+                rest = _RECORD_START.finditer(mm)  # type: ignore
+                for match in itertools.chain([first] if first else [], rest):
+                    ppt_name = match.group(1).decode('utf-8')
+                    nonce = match.group(2)
+                    ppt_id = ppt_to_id.setdefault(ppt_name, len(ppt_to_id))
+                    offsets.append(match.start(1))
+                    ppt_ids.append(ppt_id)
+                    nonces.append(-1 if nonce is None else int(nonce))
+        index = TraceIndex(stat.st_size, stat.st_mtime_ns, tuple(ppt_to_id),
+                           offsets, ppt_ids, nonces)
+        logger.debug(f'indexed {len(offsets)} records in trace file: '
+                     f'{filename}')
+        return index
+
+    @classmethod
+    def load(cls, filename: str) -> 'TraceIndex':
+        """Loads an index from a given index file.
+
+        Raises
+        ------
+        ValueError
+            If the file is not a valid index file.
+        """
+        with open(filename, 'rb') as fh:
+            header = fh.read(_HEADER.size)
+            if len(header) != _HEADER.size:
+                raise ValueError(f'invalid index file: {filename}')
+            magic, version, size, mtime_ns, ppts_length, num_records = \
+                _HEADER.unpack(header)
+            if magic != _MAGIC or version != _VERSION:
+                raise ValueError(f'invalid index file: {filename}')
+            ppts = tuple(fh.read(ppts_length).decode('utf-8').split('\n'))
+            offsets = array('q')
+            ppt_ids = array('i')
+            nonces = array('q')
+            try:
+                offsets.fromfile(fh, num_records)
+                ppt_ids.fromfile(fh, num_records)
+                nonces.fromfile(fh, num_records)
+            except EOFError as err:
+                raise ValueError(f'invalid index file: {filename}') from err
+        return TraceIndex(size, mtime_ns, ppts, offsets, ppt_ids, nonces)
+
+    def save(self, filename: str) -> None:
+        """Saves this index to a given file.
+
+        Note that the arrays of the index are stored using the native byte
+        order of the machine.
+        """
+        ppts = '\n'.join(self.ppts).encode('utf-8')
+        header = _HEADER.pack(_MAGIC, _VERSION, self.size, self.mtime_ns,
+                              len(ppts), len(self))
+        # write to a temporary file first to avoid exposing a partial index
+        filename_tmp = f'{filename}.{os.getpid()}.tmp'
+        with open(filename_tmp, 'wb') as fh:
+            fh.write(header)
+            fh.write(ppts)
+            self.offsets.tofile(fh)
+            self.ppt_ids.tofile(fh)
+            self.nonces.tofile(fh)
+        os.replace(filename_tmp, filename)
+
+    @classmethod
+    def for_file(cls, filename: str) -> 'TraceIndex':
+        """Retrieves the index for a given trace file.
+
+        The index is loaded from the index file that sits alongside the trace
+        file, provided that the size and modification time of the trace file
+        are unchanged since the index was built. Otherwise, the index is
+        rebuilt and saved to that index file.
+        """
+        stat = os.stat(filename)
+        index_filename = cls.sidecar_filename(filename)
+        with contextlib.suppress(OSError, ValueError):
+            index = cls.load(index_filename)
+            if index.size == stat.st_size \
+               and index.mtime_ns == stat.st_mtime_ns:
+                return index
+            logger.debug(f'index is out of date: {index_filename}')
+
+        index = cls.build(filename)
+        try:
+            index.save(index_filename)
+        except OSError:
+            logger.warning(f'failed to save trace index: {index_filename}')
+        return index
+
+    def __len__(self) -> int:
+        """Returns the number of records within the index."""
+        return len(self.offsets)
+
+    def find(self,
+             ppts: Optional[Collection[str]] = None,
+             nonce_range: Optional[Tuple[int, int]] = None
+             ) -> List[int]:
+        """Finds the positions of the records that match a given criteria.
+
+        Parameters
+        ----------
+        ppts: Collection[str], optional
+            If given, only records for these program points are matched.
+        nonce_range: Tuple[int, int], optional
+            If given, only records whose nonce, n, satisfies
+            :code:`lo <= n < hi` are matched.
+
+        Returns
+        -------
+        List[int]
+            The positions of the matching records, in order of appearance.
+        """
+        positions: Sequence[int] = range(len(self))
+        if ppts is not None:
+            ids = {i for i, name in enumerate(self.ppts) if name in ppts}
+            ppt_ids = self.ppt_ids
+            positions = [i for i in positions if ppt_ids[i] in ids]
+        if nonce_range is not None:
+            lo, hi = nonce_range
+            nonces = self.nonces
+            positions = [i for i in positions if lo <= nonces[i] < hi]
+        return list(positions)
+
+    def spans(self, positions: Sequence[int]) -> Iterator[Tuple[int, int]]:
+        """Computes the byte ranges occupied by the records at the given
+        positions, merging the ranges of adjacent records.
+
+        Returns
+        -------
+        Iterator[Tuple[int, int]]
+            The start and end offset of each byte range.
+        """
+        offsets = self.offsets
+        num_records = len(offsets)
+        run_start: Optional[int] = None
+        run_end = 0
+        for position in positions:
+            start = offsets[position]
+            end = offsets[position + 1] if position + 1 < num_records \
+                else self.size
+            if run_start is not None and start != run_end:
+                yield run_start, run_end
+                run_start = None
+            if run_start is None:
+                run_start = start
+            run_end = end
+        if run_start is not None:
+            yield run_start, run_end
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+This module provides facilities for parsing a single trace file using multiple
+processes, by splitting the file into chunks at record boundaries.
+"""
+__all__ = ('split_file', 'read_parallel', 'read_parallel_by_ppt')
+
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+import collections
+import mmap
+import os
+
+import attr
+
+from .plan import RecordPlan, scan_records
+from .record import TraceRecord
+from ..compression import ensure_uncompressed
+from ..declarations import Declarations
+
+DEFAULT_CHUNK_SIZE = 16 * 1024 * 1024
+
+_RawRecord = Tuple[str, Optional[int], Dict[str, Any], Dict[str, int]]
+
+# the plans for the declarations that were given to this worker process
+_worker_plans: Dict[str, RecordPlan] = {}
+
+
+def split_file(filename: str, chunk_size: int) -> List[Tuple[int, int]]:
+    """Splits a trace file into chunks of complete records.
+
+    Parameters
+    ----------
+    filename: str
+        The trace file.
+    chunk_size: int
+        The approximate size of each chunk, in bytes. Each chunk is extended
+        to the start of the next record.
+
+    Returns
+    -------
+    List[Tuple[int, int]]
+        The start and end offset of each chunk, in order.
+
+    Raises
+    ------
+    ValueError
+        If the trace file is compressed.
+    """
+    ensure_uncompressed(filename)
+    size = os.path.getsize(filename)
+    if size == 0:
+        return []
+    chunks: List[Tuple[int, int]] = []
+    with open(filename, 'rb') as fh, \
+         mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        start = 0
+        while start < size:
+            # an empty line marks the start of a new record
+            boundary = mm.find(b'\n\n', start + chunk_size)
+            end = size if boundary < 0 else boundary + 1
+            chunks.append((start, end))
+            start = end
+    return chunks
+
+
+def _init_worker(declarations: Declarations) -> None:
+    global _worker_plans
+    _worker_plans = RecordPlan.for_declarations(declarations)
+
+
+def _parse_chunk(filename: str, start: int, end: int) -> List[_RawRecord]:
+    """Parses the records within a given chunk of a trace file."""
+    with open(filename, 'rb') as fh:
+        fh.seek(start)
+        lines = fh.read(end - start).decode('utf-8').split('\n')
+    records: List[_RawRecord] = []
+    for plan, nonce, block in scan_records(_worker_plans, lines):
+        values, modified = plan.decode_values(block)
+        records.append((plan.ppt.name, nonce, values, modified))
+    return records
+
+
+@attr.s(auto_attribs=True)
+class _ChunkReader:
+    """Parses the chunks of a trace file using a pool of worker processes,
+    keeping a bounded number of chunks in flight."""
+    declarations: Declarations
+    workers: Optional[int]
+    chunk_size: int
+
+    def read(self, filename: str) -> Iterator[List[_RawRecord]]:
+        chunks = split_file(filename, self.chunk_size)
+        if not chunks:
+            return
+        max_workers = self.workers or os.cpu_count() or 1
+        max_in_flight = 2 * max_workers
+        with ProcessPoolExecutor(max_workers=max_workers,
+                                 initializer=_init_worker,
+                                 initargs=(self.declarations,)) as executor:
+            pending: Deque[Future] = collections.deque()
+            for start, end in chunks:
+                future = executor.submit(_parse_chunk, filename, start, end)
+                pending.append(future)
+                if len(pending) >= max_in_flight:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+
+def read_parallel(declarations: Declarations,
+                  filename: str,
+                  *,
+                  workers: Optional[int] = None,
+                  chunk_size: int = DEFAULT_CHUNK_SIZE
+                  ) -> Iterator[TraceRecord]:
+    """Reads the records within a trace file, in their original order, using
+    multiple processes.
+
+    Parameters
+    ----------
+    declarations: Declarations
+        The declarations for the program points within the trace file.
+        Each worker process receives its own copy.
+    filename: str
+        The trace file.
+    workers: int, optional
+        The number of worker processes. Defaults to the number of CPUs.
+    chunk_size: int
+        The approximate size, in bytes, of the chunk of the file that is
+        parsed by a worker at a time.
+    """
+    reader = _ChunkReader(declarations, workers, chunk_size)
+    ppts = {name: declarations[name] for name in declarations}
+    for records in reader.read(filename):
+        for ppt_name, nonce, values, modified in records:
+            yield TraceRecord(ppts[ppt_name], nonce, values, modified)
+
+
+def read_parallel_by_ppt(declarations: Declarations,
+                         filename: str,
+                         *,
+                         workers: Optional[int] = None,
+                         chunk_size: int = DEFAULT_CHUNK_SIZE
+                         ) -> Dict[str, List[TraceRecord]]:
+    """Reads the records within a trace file using multiple processes and
+    groups them by program point. See :func:`read_parallel`.
+
+    Returns
+    -------
+    Dict[str, List[TraceRecord]]
+        The records for each program point in the declarations, in their
+        original order, indexed by the name of the program point.
+    """
+    ppt_to_records: Dict[str, List[TraceRecord]] = \
+        {name: [] for name in declarations}
+    for record in read_parallel(declarations,
+                                filename,
+                                workers=workers,
+                                chunk_size=chunk_size):
+        ppt_to_records[record.ppt.name].append(record)
+    return ppt_to_records
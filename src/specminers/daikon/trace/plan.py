@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+This module provides precompiled decode plans that describe the layout of the
+trace records for each program point within a set of declarations.
+"""
+__all__ = ('RecordPlan', 'scan_records')
+
+from typing import (Any, Callable, Dict, Iterator, List, Mapping, Optional,
+                    Sequence, Tuple)
+
+import attr
+
+from .record import TraceRecord
+from ..declarations import Declarations
+from ..ppt import ProgramPoint
+from ..vardecl import DEC_TYPE_TO_DECODER
+
+_Decoder = Callable[[List[str]],
+                    Tuple[Dict[str, Any], Dict[str, int]]]
+
+
+def _compile_decoder(names: Sequence[str],
+                     decoders: Sequence[Callable[[str], Any]]
+                     ) -> _Decoder:
+    """Generates a function that decodes the values and modified flags of
+    the variables in a record block in a single step."""
+    values = ', '.join(f'{name!r}: d{i}(lines[{3 * i + 1}])'
+                       for i, name in enumerate(names))
+    modified = ', '.join(f'{name!r}: int(lines[{3 * i + 2}])'
+                         for i, name in enumerate(names))
+    source = (f'def decode(lines):\n'
+              f'    return {{{values}}}, {{{modified}}}\n')
+    namespace: Dict[str, Any] = {f'd{i}': d for i, d in enumerate(decoders)}
+    exec(source, namespace)
+    return namespace['decode']
+
+
+@attr.s(frozen=True, slots=True, auto_attribs=True)
+class RecordPlan:
+    """Describes how the trace records for a program point are laid out and
+    decoded.
+
+    Attributes
+    ----------
+    ppt: ProgramPoint
+        The program point to which this plan belongs.
+    names: Tuple[str, ...]
+        The names of the variables in the order that they appear in a record.
+    decoders: Tuple[Callable[[str], Any], ...]
+        The decoder for each variable, given in the same order as its name.
+    width: int
+        The number of lines that are occupied by the variables of a record.
+    positions: Mapping[str, int]
+        The position of each variable within a record, indexed by name.
+    """
+    ppt: ProgramPoint
+    names: Tuple[str, ...]
+    decoders: Tuple[Callable[[str], Any], ...]
+    width: int
+    positions: Mapping[str, int] = attr.ib(eq=False, repr=False)
+    _name_list: List[str] = attr.ib(eq=False, repr=False)
+    _decode: _Decoder = attr.ib(eq=False, repr=False)
+
+    @classmethod
+    def for_program_point(cls, ppt: ProgramPoint) -> 'RecordPlan':
+        names = tuple(ppt)
+        decoders = tuple(DEC_TYPE_TO_DECODER[ppt[name].dec_type]
+                         for name in names)
+        decode = _compile_decoder(names, decoders)
+        positions = {name: i for i, name in enumerate(names)}
+        return RecordPlan(ppt, names, decoders, 3 * len(names), positions,
+                          list(names), decode)
+
+    @classmethod
+    def for_declarations(cls,
+                         declarations: Declarations
+                         ) -> Dict[str, 'RecordPlan']:
+        """Compiles a plan for each program point in a set of declarations."""
+        return {name: cls.for_program_point(ppt)
+                for name, ppt in declarations.items()}
+
+    def check_names(self,
+                    lines: Sequence[str],
+                    num_records: int = 1
+                    ) -> None:
+        """Ensures that the variable names in a block of one or more
+        consecutive records are those that are expected by this plan.
+
+        Raises
+        ------
+        ValueError
+            If the variable names differ from the expected names.
+        """
+        expected = self._name_list
+        if num_records != 1:
+            expected = expected * num_records
+        if lines[0::3] != expected:
+            message = ('unexpected variables in record for program point '
+                       f'[{self.ppt.name}]')
+            raise ValueError(message)
+
+    def decode_values(self,
+                      lines: List[str]
+                      ) -> Tuple[Dict[str, Any], Dict[str, int]]:
+        """Decodes the values and modified flags of the variables within a
+        record from the lines that describe them.
+
+        Raises
+        ------
+        ValueError
+            If the lines do not describe a record for this program point.
+        """
+        self.check_names(lines)
+        return self._decode(lines)
+
+    def decode(self, nonce: Optional[int], lines: List[str]) -> TraceRecord:
+        """Decodes a trace record from the lines that describe its variables.
+
+        Raises
+        ------
+        ValueError
+            If the lines do not describe a record for this program point.
+        """
+        values, modified = self.decode_values(lines)
+        return TraceRecord(self.ppt, nonce, values, modified)
+
+
+def scan_records(plans: Mapping[str, RecordPlan],
+                 lines: List[str]
+                 ) -> Iterator[Tuple[RecordPlan, Optional[int], List[str]]]:
+    """Scans a block of complete trace records without decoding them.
+
+    Parameters
+    ----------
+    plans: Mapping[str, RecordPlan]
+        The plan for each program point, indexed by name.
+    lines: List[str]
+        The lines that make up the block of records.
+
+    Returns
+    -------
+    Iterator[Tuple[RecordPlan, Optional[int], List[str]]]
+        The plan, nonce, and variable lines for each record in the block.
+
+    Raises
+    ------
+    ValueError
+        If the block ends with an incomplete record.
+    KeyError
+        If a record belongs to an unknown program point.
+    """
+    i = 0
+    num_lines = len(lines)
+    while i < num_lines:
+        ppt_name = lines[i]
+        i += 1
+        if not ppt_name:
+            continue
+        plan = plans[ppt_name]
+        nonce: Optional[int] = None
+        if i < num_lines and lines[i] == 'this_invocation_nonce':
+            nonce = int(lines[i + 1])
+            i += 2
+        end = i + plan.width
+        if end > num_lines:
+            message = f'incomplete record for program point [{ppt_name}]'
+            raise ValueError(message)
+        yield plan, nonce, lines[i:end]
+        i = end
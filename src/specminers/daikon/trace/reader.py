@@ -1,14 +1,24 @@
 # -*- coding: utf-8 -*-
 __all__ = ('TraceFileReader',)
 
-from typing import Dict, Iterator, Optional, Union
+from typing import (Collection, Dict, Iterator, List, Optional, Tuple,
+                    Union)
+import mmap
+import typing
 
 import attr
 
+from .index import TraceIndex
+from .parallel import (DEFAULT_CHUNK_SIZE, read_parallel,
+                       read_parallel_by_ppt)
+from .plan import RecordPlan, scan_records
 from .record import TraceRecord
 from ..declarations import Declarations
 from ..loader import LineBuffer
 
+if typing.TYPE_CHECKING:
+    from .columnar import TraceTable
+
 
 @attr.s(slots=True, frozen=True, auto_attribs=True)
 class TraceFileReader:
@@ -42,6 +52,118 @@ class TraceFileReader:
         with LineBuffer.for_file(filename) as lines:
             yield from self.read_line_buffer(lines)
 
-    def read(self, *filenames: str) -> Iterator[TraceRecord]:
+    def read_file_indexed(self,
+                          filename: str,
+                          *,
+                          ppt: Optional[Union[str, Collection[str]]] = None,
+                          nonce_range: Optional[Tuple[int, int]] = None
+                          ) -> Iterator[TraceRecord]:
+        """Reads the records that match a given criteria from a trace file
+        using its index. Only the matching records are parsed.
+
+        Parameters
+        ----------
+        filename: str
+            The trace file.
+        ppt: Union[str, Collection[str]], optional
+            If given, only records for this program point, or these program
+            points, are read.
+        nonce_range: Tuple[int, int], optional
+            If given, only records whose nonce, n, satisfies
+            :code:`lo <= n < hi` are read.
+        """
+        ppts: Optional[Collection[str]] = (ppt,) if isinstance(ppt, str) \
+            else ppt
+        index = TraceIndex.for_file(filename)
+        positions = index.find(ppts, nonce_range)
+        if not positions:
+            return
+        plans = {name: RecordPlan.for_program_point(self.declarations[name])
+                 for name in {index.ppts[index.ppt_ids[i]] for i in positions}}
+        with open(filename, 'rb') as fh, \
+             mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for start, end in index.spans(positions):
+                lines = mm[start:end].decode('utf-8').split('\n')
+                for plan, nonce, block in scan_records(plans, lines):
+                    yield plan.decode(nonce, block)
+
+    def read(self,
+             *filenames: str,
+             ppt: Optional[Union[str, Collection[str]]] = None,
+             nonce_range: Optional[Tuple[int, int]] = None
+             ) -> Iterator[TraceRecord]:
+        """Reads the records within the given trace files.
+
+        If a program point or nonce range is given, only the matching records
+        are read, using a persistent index of each file to skip the others.
+        See :meth:`read_file_indexed`.
+        """
         for filename in filenames:
-            yield from self.read_file(filename)
+            if ppt is None and nonce_range is None:
+                yield from self.read_file(filename)
+            else:
+                yield from self.read_file_indexed(filename,
+                                                  ppt=ppt,
+                                                  nonce_range=nonce_range)
+
+    def read_tables(self,
+                    *filenames: str,
+                    strings: str = 'object'
+                    ) -> Dict[str, 'TraceTable']:
+        """Loads the records within the given trace files into a columnar
+        table of NumPy arrays for each program point.
+
+        Parameters
+        ----------
+        filenames: str
+            The trace files that should be read.
+        strings: str
+            Specifies how string variables should be stored: either as arrays
+            of objects, :code:`object`, or as dictionary-encoded columns,
+            :code:`dictionary`.
+
+        Raises
+        ------
+        ImportError
+            If NumPy is not installed.
+        """
+        from .columnar import read_tables
+        return read_tables(self.declarations, filenames, strings=strings)
+
+    def read_file_parallel(self,
+                           filename: str,
+                           *,
+                           workers: Optional[int] = None,
+                           chunk_size: int = DEFAULT_CHUNK_SIZE
+                           ) -> Iterator[TraceRecord]:
+        """Reads the records within a trace file, in their original order,
+        using a pool of worker processes, each of which parses chunks of the
+        file that are split at record boundaries.
+
+        Parameters
+        ----------
+        filename: str
+            The trace file.
+        workers: int, optional
+            The number of worker processes. Defaults to the number of CPUs.
+        chunk_size: int
+            The approximate size, in bytes, of each chunk.
+        """
+        return read_parallel(self.declarations,
+                             filename,
+                             workers=workers,
+                             chunk_size=chunk_size)
+
+    def read_file_parallel_by_ppt(self,
+                                  filename: str,
+                                  *,
+                                  workers: Optional[int] = None,
+                                  chunk_size: int = DEFAULT_CHUNK_SIZE
+                                  ) -> Dict[str, List[TraceRecord]]:
+        """Reads the records within a trace file using a pool of worker
+        processes, and returns a list of the records for each program point,
+        indexed by name. See :meth:`read_file_parallel`."""
+        return read_parallel_by_ppt(self.declarations,
+                                    filename,
+                                    workers=workers,
+                                    chunk_size=chunk_size)
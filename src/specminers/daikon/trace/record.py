@@ -30,6 +30,11 @@ class TraceRecord(Mapping[str, TraceRecordVariable]):
     _values: Mapping[str, Union[str, int, float]]
     _modified: Mapping[str, int]
 
+    @property
+    def variable_values(self) -> Mapping[str, Union[str, int, float]]:
+        """The value of each variable, indexed by name."""
+        return self._values
+
     def __len__(self) -> int:
         return len(self._values)
 
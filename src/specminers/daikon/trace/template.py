@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+This module provides precompiled output templates that render the trace
+records for a program point with a single string operation.
+"""
+__all__ = ('RecordTemplate',)
+
+from typing import Any, List, Mapping, Optional, Sequence, Tuple
+
+import attr
+
+from .record import TraceRecord
+from ..ppt import ProgramPoint
+from ..vardecl import DEC_TYPE_TO_FORMAT
+
+
+def _escape(text: str) -> str:
+    """Escapes a string for inclusion in a format string."""
+    return text.replace('{', '{{').replace('}', '}}')
+
+
+@attr.s(frozen=True, slots=True, auto_attribs=True)
+class RecordTemplate:
+    """Renders the trace records for a given program point.
+
+    Attributes
+    ----------
+    ppt: ProgramPoint
+        The program point to which this template belongs.
+    names: Tuple[str, ...]
+        The names of the variables in the order that they are rendered.
+    """
+    ppt: ProgramPoint
+    names: Tuple[str, ...]
+    _unmodified: str = attr.ib(repr=False)
+    _header: str = attr.ib(repr=False)
+    _body: str = attr.ib(repr=False)
+    _raw_body: str = attr.ib(repr=False)
+
+    @classmethod
+    def for_program_point(cls, ppt: ProgramPoint) -> 'RecordTemplate':
+        """Compiles the template for a given program point.
+
+        Raises
+        ------
+        KeyError
+            If the program point has a variable with an unsupported type.
+        """
+        names = tuple(ppt)
+        formats = [DEC_TYPE_TO_FORMAT[ppt[name].dec_type] for name in names]
+        header = f'\n{ppt.name}\n'
+        unmodified = ''.join(f'{_escape(name)}\n{fmt}\n0\n'
+                             for name, fmt in zip(names, formats))
+        unmodified = \
+            f'{_escape(header)}this_invocation_nonce\n{{}}\n{unmodified}'
+        body = ''.join(f'{_escape(name)}\n{fmt}\n{{}}\n'
+                       for name, fmt in zip(names, formats))
+        raw_body = ''.join(f'{_escape(name)}\n{{}}\n{{}}\n' for name in names)
+        return RecordTemplate(ppt, names, unmodified, header, body, raw_body)
+
+    def _render_header(self, nonce: Optional[int]) -> str:
+        if nonce is None:
+            return self._header
+        return f'{self._header}this_invocation_nonce\n{nonce}\n'
+
+    def render(self, nonce: int, values: Mapping[str, Any]) -> str:
+        """Renders a record whose variables are all unmodified.
+
+        Raises
+        ------
+        KeyError
+            If a value is missing for a variable in the program point.
+        """
+        return self._unmodified.format(nonce, *[values[n] for n in self.names])
+
+    def render_row(self, nonce: int, row: Sequence[Any]) -> str:
+        """Renders a record whose variables are all unmodified from a
+        sequence of values, given in the order of the program point.
+
+        Raises
+        ------
+        ValueError
+            If the number of values differs from the number of variables.
+        """
+        if len(row) != len(self.names):
+            message = (f'expected {len(self.names)} values for program point '
+                       f'[{self.ppt.name}] but received {len(row)}')
+            raise ValueError(message)
+        return self._unmodified.format(nonce, *row)
+
+    def render_record(self, record: TraceRecord) -> str:
+        """Renders a given record."""
+        arguments: List[Any] = []
+        for name in self.names:
+            var = record[name]
+            arguments += (var.value, var.modified)
+        header = self._render_header(record.nonce)
+        return header + self._body.format(*arguments)
+
+    def render_raw(self,
+                   nonce: Optional[int],
+                   values: Sequence[str],
+                   modified: Sequence[str]
+                   ) -> str:
+        """Renders a record from the verbatim text of its values and modified
+        flags, given in the order of the program point."""
+        arguments: List[str] = [''] * (2 * len(values))
+        arguments[0::2] = values
+        arguments[1::2] = modified
+        return self._render_header(nonce) + self._raw_body.format(*arguments)
@@ -1,7 +1,8 @@
 # -*- coding: utf-8 -*-
 __all__ = ('TraceWriter',)
 
-from typing import Any, Dict, IO, Iterator, Union
+from typing import (Any, Callable, Dict, IO, Iterable, Iterator, List,
+                    Mapping, Optional, Sequence, Union)
 import contextlib
 import os
 
@@ -9,14 +10,23 @@ from loguru import logger
 import attr
 
 from .record import TraceRecord
+from .template import RecordTemplate
+from ..compression import DEFAULT_BUFFER_SIZE, open_file
 from ..declarations import Declarations
 from ..ppt import ProgramPoint
 
+Observer = Callable[[ProgramPoint, Optional[int], Mapping[str, Any]], None]
+
 
 @attr.s(auto_attribs=True)
 class TraceWriter:
     """Used to write Daikon trace files.
 
+    Records are rendered using a precompiled template for each program point
+    and are accumulated in an internal buffer, which is written to the output
+    whenever it exceeds :attr:`buffer_size` characters, or when
+    :meth:`flush` is called.
+
     Warning
     -------
     This class is not thread-safe.
@@ -27,65 +37,191 @@ class TraceWriter:
         The declarations that should be used to compose the trace records.
     output: IO[str]
         The stream to which the trace file contents should be written.
+    buffer_size: int
+        The maximum number of characters that are held in the internal buffer
+        before it is written to the output. If zero, each record is written
+        to the output as soon as it is added.
     """
     declarations: Declarations
     output: IO[str]
+    buffer_size: int = attr.ib(default=0)
     _nonces: Dict[str, int] = attr.ib(init=False)
     _num_entries: int = attr.ib(init=False)
+    _templates: Dict[str, RecordTemplate] = attr.ib(init=False, repr=False)
+    _buffer: List[str] = attr.ib(init=False, repr=False)
+    _buffer_length: int = attr.ib(init=False, repr=False)
+    _observers: List[Observer] = attr.ib(init=False, repr=False)
 
     def __attrs_post_init__(self) -> None:
+        self._observers = []
         self._num_entries = 0
         self._nonces = {v: 1 for v in self.declarations}
+        self._templates = {}
+        self._buffer = []
+        self._buffer_length = 0
 
     @classmethod
     @contextlib.contextmanager
     def for_file(cls,
                  declarations: Declarations,
-                 filename: str
+                 filename: str,
+                 *,
+                 compresslevel: Optional[int] = None,
+                 buffer_size: int = DEFAULT_BUFFER_SIZE
                  ) -> Iterator['TraceWriter']:
+        """Provides a writer for a given trace file. Files that end in
+        :code:`.gz`, :code:`.bz2`, or :code:`.xz` are compressed as they are
+        written.
+
+        Parameters
+        ----------
+        declarations: Declarations
+            The declarations that should be used to compose the trace records.
+        filename: str
+            The name of the trace file.
+        compresslevel: int, optional
+            The compression level, if the file is compressed.
+        buffer_size: int
+            The size of the buffer, in bytes, used for writing to the file.
+        """
         logger.debug(f'writing traces to file: {filename}')
         filename = os.path.abspath(filename)
-        with open(filename, 'w') as fh:
-            yield TraceWriter(declarations, fh)
-            fh.flush()
+        with open_file(filename,
+                       'w',
+                       compresslevel=compresslevel,
+                       buffer_size=buffer_size) as fh:
+            writer = TraceWriter(declarations, fh, buffer_size=buffer_size)
+            try:
+                yield writer
+            finally:
+                writer.flush()
         logger.debug(f'finished writing traces to file: {filename}')
 
+    def _template(self, ppt: ProgramPoint) -> RecordTemplate:
+        """Retrieves the template for a given program point."""
+        try:
+            return self._templates[ppt.name]
+        except KeyError:
+            template = RecordTemplate.for_program_point(ppt)
+            self._templates[ppt.name] = template
+            return template
+
+    def _emit(self, text: str) -> None:
+        """Adds the given text to the buffer."""
+        self._buffer.append(text)
+        self._buffer_length += len(text)
+        if self._buffer_length >= self.buffer_size:
+            self._drain()
+
+    def _drain(self) -> None:
+        """Writes the contents of the buffer to the output."""
+        if self._buffer:
+            self.output.write(''.join(self._buffer))
+            self._buffer = []
+            self._buffer_length = 0
+
+    def flush(self) -> None:
+        """Writes any buffered records to the output and flushes it."""
+        self._drain()
+        self.output.flush()
+
+    def add_observer(self, observer: Observer) -> None:
+        """Registers a function that is called with the program point, nonce,
+        and values of each record after it is written via :meth:`write`,
+        :meth:`write_many`, or :meth:`add`. Values are given as they were
+        passed to the writer. Records that are added via :meth:`add_raw` are
+        not observed.
+        """
+        self._observers.append(observer)
+
+    def remove_observer(self, observer: Observer) -> None:
+        """Unregisters a given observer."""
+        self._observers.remove(observer)
+
+    def _notify(self,
+                ppt: ProgramPoint,
+                nonce: Optional[int],
+                values: Mapping[str, Any]
+                ) -> None:
+        for observer in self._observers:
+            observer(ppt, nonce, values)
+
     def add(self, record: TraceRecord) -> None:
         self._num_entries += 1
-        w = lambda s: self.output.write(f'{s}\n')
-        w('')
-        w(record.ppt.name)
-        if record.nonce is not None:
-            w('this_invocation_nonce')
-            w(record.nonce)
-        for var in record.values():
-            w(var.variable.name)
-            w(var.variable.encode(var.value))
-            w(var.modified)
-
-    def _create_record(self,
-                       ppt_or_name: Union[str, ProgramPoint],
-                       **values: Any
-                       ) -> TraceRecord:
-        """Adds a record to the output."""
-        ppt: ProgramPoint
-        name: str
-        if isinstance(ppt_or_name, ProgramPoint):
-            name = ppt_or_name.name
-            ppt = ppt_or_name
-        else:
-            name = ppt_or_name
-            ppt = self.declarations[name]
+        self._emit(self._template(record.ppt).render_record(record))
+        if self._observers:
+            self._notify(record.ppt, record.nonce, record.variable_values)
 
-        nonce = self._nonces[name]
-        self._nonces[name] += 1
-        modified: Dict[str, int] = {v: 0 for v in ppt}
+    def add_raw(self,
+                ppt_or_name: Union[str, ProgramPoint],
+                nonce: Optional[int],
+                values: Sequence[str],
+                modified: Sequence[str]
+                ) -> None:
+        """Adds a record whose values and modified flags are given verbatim,
+        in the order of the variables in the program point."""
+        ppt = self._resolve(ppt_or_name)
+        self._num_entries += 1
+        self._emit(self._template(ppt).render_raw(nonce, values, modified))
 
-        return TraceRecord(ppt, nonce, values, modified)
+    def _resolve(self, ppt_or_name: Union[str, ProgramPoint]) -> ProgramPoint:
+        if isinstance(ppt_or_name, ProgramPoint):
+            return ppt_or_name
+        return self.declarations[ppt_or_name]
 
     def write(self,
               ppt_or_name: Union[str, ProgramPoint],
               **values: Any
               ) -> None:
-        record = self._create_record(ppt_or_name, **values)
-        self.add(record)
+        ppt = self._resolve(ppt_or_name)
+        name = ppt.name
+        template = self._template(ppt)
+        nonce = self._nonces[name]
+        text = template.render(nonce, values)
+        self._nonces[name] = nonce + 1
+        self._num_entries += 1
+        self._emit(text)
+        if self._observers:
+            self._notify(ppt, nonce, values)
+
+    def write_many(self,
+                   ppt_or_name: Union[str, ProgramPoint],
+                   rows: Iterable[Union[Mapping[str, Any], Sequence[Any]]]
+                   ) -> None:
+        """Writes a record for each of a number of rows of values.
+
+        Parameters
+        ----------
+        ppt_or_name: Union[str, ProgramPoint]
+            The program point to which the records belong.
+        rows: Iterable[Union[Mapping[str, Any], Sequence[Any]]]
+            The values for each record, given either as a mapping from
+            variable names to values, or as a sequence of values in the order
+            of the variables in the program point.
+        """
+        ppt = self._resolve(ppt_or_name)
+        name = ppt.name
+        template = self._template(ppt)
+        nonce = self._nonces[name]
+        texts: List[str] = []
+        observed: Optional[List[Any]] = [] if self._observers else None
+        try:
+            for row in rows:
+                if observed is not None:
+                    observed.append(row)
+                if isinstance(row, Mapping):
+                    texts.append(template.render(nonce, row))
+                else:
+                    texts.append(template.render_row(nonce, row))
+                nonce += 1
+        finally:
+            first_nonce = self._nonces[name]
+            self._num_entries += nonce - first_nonce
+            self._nonces[name] = nonce
+            if texts:
+                self._emit(''.join(texts))
+        if observed:
+            for row_nonce, row in enumerate(observed, first_nonce):
+                if not isinstance(row, Mapping):
+                    row = dict(zip(template.names, row))
+                self._notify(ppt, row_nonce, row)
@@ -1,9 +1,9 @@
 # -*- coding: utf-8 -*-
 __all__ = ('VarDecl', 'VarDeclLoader')
 
-from typing import Any, Callable, List, Mapping, Optional, Union
+from typing import (Any, Callable, Iterable, List, Mapping, Optional, Tuple,
+                    Union)
 
-from loguru import logger
 import attr
 
 from .helpers import escape_if_not_none
@@ -23,6 +23,18 @@ DEC_TYPE_TO_ENCODER: Mapping[str, Callable[[Any], str]] = {
     'java.lang.String': (lambda s: f'"{s}"')
 }
 
+# format strings that are equivalent to the encoders above
+DEC_TYPE_TO_FORMAT: Mapping[str, str] = {
+    'float': '{}',
+    'int': '{}',
+    'boolean': '{}',
+    'java.lang.String': '"{}"'
+}
+
+
+def _to_flags(flags: Iterable[str]) -> Tuple[str, ...]:
+    return tuple(flags)
+
 
 @attr.s(frozen=True, str=False, slots=True, auto_attribs=True)
 class VarDecl:
@@ -32,6 +44,7 @@ class VarDecl:
     comparability: Optional[int] = attr.ib(default=None)
     constant: Optional[str] = \
         attr.ib(default=None, converter=escape_if_not_none)
+    flags: Tuple[str, ...] = attr.ib(default=(), converter=_to_flags)
 
     @property
     def lines(self) -> List[str]:
@@ -39,10 +52,12 @@ class VarDecl:
                  '  var-kind variable',
                  f'  dec-type {self.dec_type}',
                  f'  rep-type {self.rep_type}']
+        if self.flags:
+            lines.append(f'  flags {" ".join(self.flags)}')
         if self.comparability is not None:
-            lines.append('  comparability {self.comparability}')
+            lines.append(f'  comparability {self.comparability}')
         if self.constant is not None:
-            lines.append('  constant {self.constant}')
+            lines.append(f'  constant {self.constant}')
         return lines
 
     def decode(self, value_string: str) -> Union[int, str, float]:
@@ -64,6 +79,7 @@ class VarDeclLoader(LineLoader[VarDecl]):
     rep_type: Optional[str] = attr.ib(default=None)
     constant: Optional[str] = attr.ib(default=None)
     comparability: Optional[int] = attr.ib(default=None)
+    flags: Tuple[str, ...] = attr.ib(default=())
 
     def lookup(self, name: str):
         return {'var-kind': self._read_kind,
@@ -96,7 +112,7 @@ class VarDeclLoader(LineLoader[VarDecl]):
         self.constant = constant
 
     def _read_flags(self, *flags: str) -> None:
-        logger.warning('flags are currently ignored!')
+        self.flags = tuple(flag for flag in flags if flag)
 
     def _read_comparability(self, comparability_string: str) -> None:
         self.comparability = int(comparability_string)
@@ -109,4 +125,5 @@ class VarDeclLoader(LineLoader[VarDecl]):
                        dec_type=self.dec_type,
                        rep_type=self.rep_type,
                        comparability=self.comparability,
-                       constant=self.constant)
+                       constant=self.constant,
+                       flags=self.flags)
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+This module provides the means to execute a command inside a container while
+writing to its standard input, which is not supported by dockerblade.
+"""
+__all__ = ('ExecProcess', 'exec_with_stdin')
+
+from typing import Any, Optional
+import socket
+import time
+
+from loguru import logger
+import attr
+import dockerblade
+
+
+@attr.s(eq=False, slots=True)
+class ExecProcess:
+    """Provides access to a command that is running inside a container, and
+    whose standard input is written by the caller. The output of the command
+    is discarded.
+
+    The interface of this class mirrors the parts of
+    :class:`specminers.local_shell.LocalPopen` that are used to write to the
+    standard input of a command on the host.
+
+    Attributes
+    ----------
+    args: str
+        The command that is being executed.
+    exec_id: str
+        The ID of the Docker exec instance for the command.
+    """
+    args: str = attr.ib()
+    exec_id: str = attr.ib()
+    _api: Any = attr.ib(repr=False)
+    _socket: Any = attr.ib(repr=False)
+    _stdin_closed: bool = attr.ib(init=False, default=False, repr=False)
+
+    @property
+    def _raw_socket(self) -> socket.socket:
+        # docker-py may wrap the socket of the connection in a SocketIO
+        return getattr(self._socket, '_sock', self._socket)
+
+    def write(self, data: bytes) -> None:
+        """Writes the given data to the standard input of the command.
+
+        Raises
+        ------
+        BrokenPipeError
+            If the command is no longer reading its input.
+        """
+        self._raw_socket.sendall(data)
+
+    def close_stdin(self) -> None:
+        """Closes the standard input of the command."""
+        if not self._stdin_closed:
+            self._stdin_closed = True
+            try:
+                self._raw_socket.shutdown(socket.SHUT_WR)
+            except OSError:
+                pass
+
+    def poll(self) -> Optional[int]:
+        """Returns the exit code of the command, or :code:`None` if it is
+        still running."""
+        info = self._api.exec_inspect(self.exec_id)
+        if info['Running']:
+            return None
+        return info['ExitCode']
+
+    def wait(self, time_limit: Optional[float] = None) -> int:
+        """Closes the standard input of the command, waits for the command
+        to finish, and returns its exit code.
+
+        Raises
+        ------
+        TimeoutError
+            If the command does not finish within the time limit.
+        """
+        self.close_stdin()
+        started_at = time.monotonic()
+        delay = 0.01
+        while True:
+            returncode = self.poll()
+            if returncode is not None:
+                break
+            if time_limit is not None \
+                    and time.monotonic() - started_at > time_limit:
+                raise TimeoutError(f'command did not finish: {self.args}')
+            time.sleep(delay)
+            delay = min(delay * 2, 0.5)
+        self._socket.close()
+        return returncode
+
+
+def exec_with_stdin(container: dockerblade.Container,
+                    args: str,
+                    *,
+                    cwd: str = '/'
+                    ) -> ExecProcess:
+    """Executes a command via :code:`/bin/sh` inside a given container,
+    without waiting for it to finish, and attaches to its standard input."""
+    api = container.daemon.api
+    logger.debug(f'executing command with stdin in container '
+                 f'[{container.id}]: {args}')
+    response = api.exec_create(container.id,
+                               ['/bin/sh', '-c', args],
+                               stdin=True,
+                               stdout=False,
+                               stderr=False,
+                               tty=False,
+                               workdir=cwd)
+    exec_id = response['Id']
+    sock = api.exec_start(exec_id, socket=True)
+    return ExecProcess(args, exec_id, api, sock)
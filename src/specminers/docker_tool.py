@@ -5,15 +5,21 @@ specification mining tools that are supported by this package.
 """
 __all__ = ('DockerTool',)
 
-from typing import ClassVar
+from typing import ClassVar, Set
 import abc
 import contextlib
+import threading
 
 from loguru import logger
 import docker
 
 from .tool import Tool
 
+# the images that are known to be installed, which are cached to avoid
+# connecting to the Docker daemon each time that a tool is used
+_INSTALLED_IMAGES: Set[str] = set()
+_INSTALLED_IMAGES_LOCK = threading.Lock()
+
 
 class DockerTool(Tool, abc.ABC):
     """An interface to a specification mining tool.
@@ -29,14 +35,25 @@ class DockerTool(Tool, abc.ABC):
     _DOCKER_DIRECTORY: ClassVar[str]
 
     @classmethod
-    def is_installed(cls) -> bool:
-        """Checks whether this tool is installed."""
+    def is_installed(cls, *, refresh: bool = False) -> bool:
+        """Checks whether this tool is installed.
+
+        Once the image for this tool has been found, the result is cached
+        for the lifetime of the process, and the Docker daemon is not
+        consulted again unless :code:`refresh` is set.
+        """
+        if not refresh and cls.IMAGE in _INSTALLED_IMAGES:
+            return True
         with contextlib.closing(docker.from_env()) as docker_client:
             try:
                 docker_client.images.get(cls.IMAGE)
             except docker.errors.ImageNotFound:
+                with _INSTALLED_IMAGES_LOCK:
+                    _INSTALLED_IMAGES.discard(cls.IMAGE)
                 return False
-            return True
+        with _INSTALLED_IMAGES_LOCK:
+            _INSTALLED_IMAGES.add(cls.IMAGE)
+        return True
 
     @classmethod
     def install(cls, force_reinstall: bool = False) -> None:
@@ -48,7 +65,7 @@ class DockerTool(Tool, abc.ABC):
             If :code:`True`, the image for this tool will be rebuilt
             regardless of whether or not it already exists.
         """
-        if cls.is_installed() and not force_reinstall:
+        if cls.is_installed(refresh=True) and not force_reinstall:
             return
         with contextlib.closing(docker.from_env()) as docker_client:
             logger.debug(f'building tool image [{cls.IMAGE}]')
@@ -56,3 +73,5 @@ class DockerTool(Tool, abc.ABC):
                                                   tag=cls.IMAGE,
                                                   pull=True)
             logger.debug(f'built tool image [{cls.IMAGE}]')
+        with _INSTALLED_IMAGES_LOCK:
+            _INSTALLED_IMAGES.add(cls.IMAGE)
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+This module provides a shell that executes commands directly on the host,
+which allows tools that are installed on the host to be used without Docker.
+"""
+__all__ = ('LocalPopen', 'LocalShell')
+
+from typing import Iterator, Mapping, Optional
+import os
+import signal
+import subprocess
+import time
+
+from loguru import logger
+import attr
+import dockerblade
+
+_CHUNK_SIZE = 65536
+
+
+@attr.s(eq=False, slots=True)
+class LocalPopen:
+    """Provides access to a command that is running on the host."""
+    args: str = attr.ib()
+    _process: subprocess.Popen = attr.ib(repr=False)
+
+    @property
+    def pid(self) -> int:
+        return self._process.pid
+
+    @property
+    def stream(self) -> Iterator[bytes]:
+        """The output of the command, as it is produced."""
+        stdout = self._process.stdout
+        assert stdout is not None
+        return iter(lambda: stdout.read1(_CHUNK_SIZE), b'')  # type: ignore
+
+    def write(self, data: bytes) -> None:
+        """Writes the given data to the standard input of the command, which
+        must have been opened with :code:`stdin` set.
+
+        Raises
+        ------
+        BrokenPipeError
+            If the command is no longer reading its input.
+        """
+        stdin = self._process.stdin
+        if stdin is None:
+            raise ValueError('standard input is not attached')
+        stdin.write(data)
+
+    def close_stdin(self) -> None:
+        """Closes the standard input of the command, if it is attached."""
+        stdin = self._process.stdin
+        if stdin is not None and not stdin.closed:
+            try:
+                stdin.close()
+            except BrokenPipeError:
+                pass
+
+    def poll(self) -> Optional[int]:
+        """Returns the exit code of the command, or :code:`None` if it is
+        still running."""
+        return self._process.poll()
+
+    def wait(self, time_limit: Optional[float] = None) -> int:
+        """Closes the standard input of the command, if it is attached,
+        waits for the command to finish, and returns its exit code."""
+        self.close_stdin()
+        returncode = self._process.wait(time_limit)
+        if self._process.stdout is not None:
+            self._process.stdout.close()
+        return returncode
+
+    def kill(self) -> None:
+        """Kills the command, together with any processes that it started."""
+        try:
+            os.killpg(self._process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+
+@attr.s(frozen=True, slots=True)
+class LocalShell:
+    """Executes commands on the host via :code:`/bin/sh`.
+
+    The interface of this class mirrors the subset of
+    :class:`dockerblade.Shell` that is used by the tools within this package,
+    including its use of :class:`dockerblade.CalledProcessError`, so that
+    tools may use either interchangeably.
+
+    Attributes
+    ----------
+    environment: Mapping[str, str], optional
+        Additional environment variables for each command.
+    """
+    environment: Optional[Mapping[str, str]] = attr.ib(default=None)
+
+    def _env(self) -> Optional[Mapping[str, str]]:
+        if not self.environment:
+            return None
+        env = dict(os.environ)
+        env.update(self.environment)
+        return env
+
+    def _run(self, args: str, cwd: Optional[str]) -> bytes:
+        logger.debug(f'executing command on host: {args}')
+        started_at = time.monotonic()
+        result = subprocess.run(args, shell=True, cwd=cwd, env=self._env(),
+                                stdout=subprocess.PIPE)
+        if result.returncode != 0:
+            duration = time.monotonic() - started_at
+            raise dockerblade.CalledProcessError(cmd=args,
+                                                 returncode=result.returncode,
+                                                 duration=duration,
+                                                 output=result.stdout)
+        return result.stdout
+
+    def check_call(self, args: str, *, cwd: Optional[str] = None) -> None:
+        """Executes a given command and waits for it to finish.
+
+        Raises
+        ------
+        dockerblade.CalledProcessError
+            If the command returns a non-zero exit code.
+        """
+        self._run(args, cwd)
+
+    def check_output(self,
+                     args: str,
+                     *,
+                     cwd: Optional[str] = None,
+                     encoding: str = 'utf-8'
+                     ) -> str:
+        """Executes a given command and returns its output.
+
+        Raises
+        ------
+        dockerblade.CalledProcessError
+            If the command returns a non-zero exit code.
+        """
+        return self._run(args, cwd).decode(encoding)
+
+    def popen(self,
+              args: str,
+              *,
+              cwd: Optional[str] = None,
+              encoding: Optional[str] = None,
+              stdin: bool = False,
+              stdout: bool = True
+              ) -> LocalPopen:
+        """Executes a given command without waiting for it to finish. The
+        output of the command is provided as bytes. The command is executed
+        within its own process group, so that it can be killed together with
+        the processes that it starts.
+
+        Parameters
+        ----------
+        stdin: bool
+            If :code:`True`, the standard input of the command is attached,
+            and can be written via :meth:`LocalPopen.write`.
+        stdout: bool
+            If :code:`False`, the output of the command is discarded.
+        """
+        if encoding is not None:
+            raise ValueError('only binary output is supported')
+        logger.debug(f'executing command on host: {args}')
+        process = subprocess.Popen(
+            args, shell=True, cwd=cwd, env=self._env(),
+            stdin=subprocess.PIPE if stdin else None,
+            stdout=subprocess.PIPE if stdout else subprocess.DEVNULL,
+            start_new_session=True)
+        return LocalPopen(args, process)
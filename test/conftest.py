@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+"""
+Provides a local stand-in for the Docker daemon, whose containers execute
+commands directly on the host, and a stub `java` executable that imitates
+Daikon by reporting the invariants within test/examples/ardu.inv.
+"""
+import pytest
+
+import itertools
+import os
+import re
+import signal
+import socket as socket_module
+import stat
+import subprocess
+import sys
+import tempfile
+import textwrap
+import time
+
+import dockerblade
+
+DIR_HERE = os.path.dirname(__file__)
+DIR_EXAMPLES = os.path.join(DIR_HERE, 'examples')
+
+STUB_JAVA = textwrap.dedent(f'''\
+    #!{sys.executable}
+    # a stub for the java executable that imitates Daikon: the invariants
+    # that are reported for each program point are taken from ardu.inv, and
+    # are reported only for the program points that are both declared and
+    # sampled (or declared, if no traces are given). A trace named '-' is
+    # read from standard input.
+    import os
+    import re
+    import sys
+    import time
+
+    args = sys.argv[1:]
+    if os.environ.get('STUB_JAVA_LOG'):
+        with open(os.environ['STUB_JAVA_LOG'], 'a') as f:
+            f.write(' '.join(args) + '\\n')
+    if os.environ.get('STUB_JAVA_FAIL') in args:
+        print('failed', file=sys.stderr)
+        sys.exit(1)
+    time.sleep(float(os.environ.get('STUB_JAVA_DELAY', '0')))
+
+    def ppts_in(filename, declared):
+        ppts = set()
+        expecting_ppt = True
+        with (open(filename) if filename != '-' else sys.stdin) as f:
+            for line in f:
+                line = line.rstrip('\\n')
+                if declared and line.startswith('ppt '):
+                    ppts.add(line[4:])
+                elif not declared and not line:
+                    expecting_ppt = True
+                elif not declared and expecting_ppt:
+                    ppts.add(line)
+                    expecting_ppt = False
+        return ppts
+
+    SEPARATOR = '=' * 75 + '\\n'
+
+    def sections_in(filename):
+        with open(filename) as f:
+            sections = f.read().split(SEPARATOR)[1:]
+        return dict((s.split('\\n', 1)[0], s) for s in sections)
+
+    def write_sections(filename, sections):
+        with open(filename, 'w') as f:
+            for section in sections:
+                f.write(SEPARATOR + section)
+
+    if 'daikon.Daikon' in args:
+        args = args[args.index('daikon.Daikon') + 1:]
+        output = args[args.index('-o') + 1]
+        inputs = [a for a in args
+                  if (a == '-' or not a.startswith('-')) and a != output]
+        declared = set()
+        sampled = set()
+        for filename in inputs:
+            if '.decls' in filename:
+                declared |= ppts_in(filename, True)
+            else:
+                sampled |= ppts_in(filename, False)
+        ppts = declared & sampled if sampled else declared
+        sections = sections_in({os.path.join(DIR_EXAMPLES, 'ardu.inv')!r})
+        write_sections(output, [section for ppt, section in sections.items()
+                                if ppt in ppts])
+        if '--no_text_output' not in args:
+            print(f'Processing trace data; reading {{len(inputs)}} files:')
+            with open(output) as f:
+                sys.stdout.write(f.read())
+            print('Exiting Daikon.')
+    elif 'daikon.PrintInvariants' in args:
+        args = args[args.index('daikon.PrintInvariants') + 1:]
+        pattern = '.*'
+        for arg in args:
+            if arg.startswith('--ppt-select-pattern='):
+                pattern = arg.partition('=')[2]
+        for ppt, section in sections_in(args[-1]).items():
+            if re.search(pattern, ppt):
+                sys.stdout.write(SEPARATOR + section)
+        print('Exiting Daikon.')
+    elif 'daikon.MergeInvariants' in args:
+        args = args[args.index('daikon.MergeInvariants') + 1:]
+        output = args[args.index('-o') + 1]
+        sections = {{}}
+        for filename in args[args.index('-o') + 2:]:
+            for ppt, section in sections_in(filename).items():
+                sections.setdefault(ppt, section)
+        write_sections(output, sections.values())
+    else:
+        sys.exit(1)
+    ''')
+
+
+def write_stub_java(directory):
+    """Writes the stub java executable to a given directory."""
+    filename = os.path.join(directory, 'java')
+    with open(filename, 'w') as f:
+        f.write(STUB_JAVA)
+    os.chmod(filename, os.stat(filename).st_mode | stat.S_IEXEC)
+    return filename
+
+
+class FakePopen:
+    def __init__(self, process):
+        self._process = process
+
+    @property
+    def stream(self):
+        return iter(lambda: self._process.stdout.read(1024), b'')
+
+    def wait(self):
+        returncode = self._process.wait()
+        self._process.stdout.close()
+        return returncode
+
+
+class FakeShell:
+    """Executes commands on the host, within a fake container, by mapping
+    each absolute path within a command to its location on the host."""
+    def __init__(self, container):
+        self.container = container
+
+    def _translate(self, command):
+        def translate(match):
+            return self.container.host_path(match.group(0))
+        return re.sub(r'(?<![\w.])/[^\s\'"]*', translate, command)
+
+    def _env(self):
+        env = dict(os.environ)
+        env['PATH'] = f'{self.container.daemon.bin_directory}:{env["PATH"]}'
+        return env
+
+    def popen(self, args, *, encoding='utf-8', **kwargs):
+        assert encoding is None
+        self.container.check_alive()
+        process = subprocess.Popen(self._translate(args), shell=True,
+                                   stdout=subprocess.PIPE, env=self._env(),
+                                   start_new_session=True)
+        self.container.processes.append(process)
+        return FakePopen(process)
+
+    def run(self, args):
+        self.container.check_alive()
+        started_at = time.monotonic()
+        self.container.daemon.commands.append(args)
+        result = subprocess.run(self._translate(args), shell=True,
+                                stdout=subprocess.PIPE, env=self._env())
+        if result.returncode != 0:
+            raise dockerblade.CalledProcessError(
+                cmd=args, returncode=result.returncode,
+                duration=time.monotonic() - started_at, output=result.stdout)
+        return result.stdout.decode('utf-8')
+
+    def check_call(self, args, **kwargs):
+        self.run(args)
+
+    def check_output(self, args, **kwargs):
+        return self.run(args)
+
+
+class FakeAPI:
+    """Imitates the parts of the low-level Docker API that are used to
+    write to the standard input of a command within a container."""
+    def __init__(self, daemon):
+        self.daemon = daemon
+        self._execs = {}
+        self._ids = itertools.count()
+
+    def exec_create(self, container_id, cmd, *, stdin=False, **kwargs):
+        assert stdin and cmd[:2] == ['/bin/sh', '-c']
+        container = next(c for c in self.daemon.containers
+                         if c.id == container_id)
+        container.check_alive()
+        exec_id = f'exec{next(self._ids)}'
+        self._execs[exec_id] = (container, cmd[2], None)
+        return {'Id': exec_id}
+
+    def exec_start(self, exec_id, *, socket=False):
+        assert socket
+        container, args, _ = self._execs[exec_id]
+        shell = FakeShell(container)
+        self.daemon.commands.append(args)
+        parent, child = socket_module.socketpair()
+        process = subprocess.Popen(shell._translate(args), shell=True,
+                                   stdin=child, stdout=subprocess.DEVNULL,
+                                   env=shell._env(), start_new_session=True)
+        child.close()
+        container.processes.append(process)
+        self._execs[exec_id] = (container, args, process)
+        return parent
+
+    def kill(self, container_id):
+        container = next(c for c in self.daemon.containers
+                         if c.id == container_id)
+        container.stop()
+
+    def exec_inspect(self, exec_id):
+        _, _, process = self._execs[exec_id]
+        returncode = process.poll()
+        return {'Running': returncode is None, 'ExitCode': returncode,
+                'Pid': process.pid}
+
+
+class FakeContainer:
+    def __init__(self, daemon, id, volumes):
+        self.daemon = daemon
+        self.id = id
+        self.volumes = volumes or {}
+        self.root = tempfile.mkdtemp(dir=daemon.directory)
+        self.removed = False
+        self.healthy = True
+        self.processes = []
+
+    def host_path(self, path):
+        mounts = sorted(((v['bind'], host) for host, v in self.volumes.items()),
+                        key=lambda mount: -len(mount[0]))
+        for bind, host in mounts:
+            if path == bind or path.startswith(bind.rstrip('/') + '/'):
+                return host + path[len(bind):]
+        host_path = self.root + path
+        os.makedirs(os.path.dirname(host_path), exist_ok=True)
+        return host_path
+
+    def check_alive(self):
+        assert not self.removed, 'container has been removed'
+        if not self.healthy:
+            raise dockerblade.CalledProcessError(cmd='', returncode=1,
+                                                 duration=0.0, output=None)
+
+    def shell(self, path='/bin/sh'):
+        return FakeShell(self)
+
+    def stop(self):
+        self.healthy = False
+        for process in self.processes:
+            if process.poll() is None:
+                os.killpg(process.pid, signal.SIGKILL)
+                process.wait()
+
+    def remove(self):
+        self.removed = True
+        self.stop()
+
+
+class FakeDaemon:
+    """A local stand-in for :class:`dockerblade.DockerDaemon`."""
+    def __init__(self, directory, provision_delay=0.0):
+        self.directory = directory
+        self.bin_directory = os.path.join(directory, 'bin')
+        os.mkdir(self.bin_directory)
+        write_stub_java(self.bin_directory)
+        self.provision_delay = provision_delay
+        self.containers = []
+        self.commands = []
+        self.api = FakeAPI(self)
+        self._ids = itertools.count()
+
+    def provision(self, image, *, volumes=None):
+        time.sleep(self.provision_delay)
+        container = FakeContainer(self, f'fake{next(self._ids)}', volumes)
+        self.containers.append(container)
+        return container
+
+    @property
+    def live_containers(self):
+        return [c for c in self.containers if not c.removed]
+
+
+@pytest.fixture
+def fake_daemon(tmp_path):
+    return FakeDaemon(str(tmp_path))
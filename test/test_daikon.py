@@ -2,15 +2,23 @@
 import pytest
 
 import contextlib
+import io
 import os
 import tempfile
+import threading
+import time
 
 import specminers
+import specminers.cache
+import dockerblade
 
 
 DIR_HERE = os.path.dirname(__file__)
 DIR_EXAMPLES = os.path.join(DIR_HERE, 'examples')
 
+# the number of invariants within examples/ardu.inv
+NUM_ARDU_INVARIANTS = 23168
+
 
 def test_daikon():
     daikon = specminers.Daikon()
@@ -112,4 +120,1164 @@ def test_read_invariants():
     decls = specminers.daikon.Declarations.load(decls_filename)
     reader = specminers.daikon.InvariantReader(decls)
     invariants = reader.from_file(inv_filename)
-    assert invariants.size == 20698
+    assert invariants.size == NUM_ARDU_INVARIANTS
+
+
+def _write_example_trace(decls, filename, num_records=200):
+    with specminers.daikon.TraceWriter.for_file(decls, filename) as writer:
+        _write_example_records(decls, writer, num_records)
+
+
+def _write_example_records(decls, writer, num_records=200):
+    ppts = [decls['factory.MAV_CMD_NAV_TAKEOFF:::ENTER'],
+            decls['factory.MAV_CMD_NAV_TAKEOFF:::EXIT0']]
+    for i in range(num_records):
+        writer.write(ppts[i % 2],
+                     p_alt=11.89013788794762 + i,
+                     home_latitude=-35.3629389,
+                     home_longitude=149.1650801,
+                     altitude=0.01 * i,
+                     latitude=-35.3629389,
+                     longitude=149.16508,
+                     armable=1,
+                     armed=i % 2,
+                     mode="GUIDED",
+                     vx=-0.16,
+                     vy=-0.14,
+                     vz=0.0,
+                     pitch=-0.009264621883630753,
+                     yaw=-1.6489005088806152,
+                     roll=-0.009207483381032944,
+                     heading=265,
+                     airspeed=0.0,
+                     groundspeed=0.22160862386226654,
+                     ekf_ok=1)
+
+
+def test_bulk_read_trace():
+    decls_filename = os.path.join(DIR_EXAMPLES, 'ardu.decls')
+    decls = specminers.daikon.Declarations.load(decls_filename)
+
+    with contextlib.ExitStack() as stack:
+        _, trace_filename = tempfile.mkstemp()
+        stack.callback(os.remove, trace_filename)
+        _write_example_trace(decls, trace_filename)
+
+        expected = list(
+            specminers.daikon.TraceFileReader(decls).read(trace_filename))
+        reader = specminers.daikon.BulkTraceFileReader(decls, block_size=512)
+        actual = list(reader.read(trace_filename))
+        assert len(actual) == 200
+        assert actual == expected
+        assert actual[1].ppt.name == 'factory.MAV_CMD_NAV_TAKEOFF:::EXIT0'
+        assert actual[1]['altitude'].value == 0.01
+
+
+def test_read_trace_tables():
+    np = pytest.importorskip('numpy')
+    decls_filename = os.path.join(DIR_EXAMPLES, 'ardu.decls')
+    decls = specminers.daikon.Declarations.load(decls_filename)
+
+    with contextlib.ExitStack() as stack:
+        _, trace_filename = tempfile.mkstemp()
+        stack.callback(os.remove, trace_filename)
+        _write_example_trace(decls, trace_filename)
+
+        reader = specminers.daikon.TraceFileReader(decls)
+        tables = reader.read_tables(trace_filename, strings='dictionary')
+        assert len(tables) == len(decls)
+        assert len(tables['factory.MAV_CMD_NAV_LAND:::ENTER']) == 0
+
+        table = tables['factory.MAV_CMD_NAV_TAKEOFF:::EXIT0']
+        assert len(table) == 100
+        assert table.nonces.tolist() == list(range(1, 101))
+        assert table['altitude'].dtype == np.float64
+        assert table['armed'].dtype == np.bool_
+        assert table['armed'].all()
+        assert np.allclose(table['altitude'],
+                           [0.01 * i for i in range(1, 200, 2)])
+        assert table['mode'].decode().tolist() == ['"GUIDED"'] * 100
+        assert not table.modified['altitude'].any()
+
+
+def test_read_trace_indexed():
+    decls_filename = os.path.join(DIR_EXAMPLES, 'ardu.decls')
+    decls = specminers.daikon.Declarations.load(decls_filename)
+    ppt_name = 'factory.MAV_CMD_NAV_TAKEOFF:::EXIT0'
+
+    with contextlib.ExitStack() as stack:
+        _, trace_filename = tempfile.mkstemp()
+        stack.callback(os.remove, trace_filename)
+        _write_example_trace(decls, trace_filename)
+        index_filename = f'{trace_filename}.idx'
+        stack.callback(os.remove, index_filename)
+
+        reader = specminers.daikon.TraceFileReader(decls)
+        expected = [r for r in reader.read(trace_filename)
+                    if r.ppt.name == ppt_name and 10 <= r.nonce < 20]
+        records = list(reader.read(trace_filename,
+                                   ppt=ppt_name,
+                                   nonce_range=(10, 20)))
+        assert len(records) == 10
+        assert records == expected
+        assert os.path.exists(index_filename)
+
+        # the index should be reused until the trace file changes
+        index = specminers.daikon.trace.TraceIndex.for_file(trace_filename)
+        assert len(index) == 200
+        _write_example_trace(decls, trace_filename, num_records=4)
+        os.utime(trace_filename, ns=(0, 0))
+        assert len(list(reader.read(trace_filename, ppt=ppt_name))) == 2
+
+
+def test_read_trace_parallel():
+    decls_filename = os.path.join(DIR_EXAMPLES, 'ardu.decls')
+    decls = specminers.daikon.Declarations.load(decls_filename)
+
+    with contextlib.ExitStack() as stack:
+        _, trace_filename = tempfile.mkstemp()
+        stack.callback(os.remove, trace_filename)
+        _write_example_trace(decls, trace_filename)
+
+        reader = specminers.daikon.TraceFileReader(decls)
+        expected = list(reader.read(trace_filename))
+        actual = list(reader.read_file_parallel(trace_filename,
+                                                workers=2,
+                                                chunk_size=4096))
+        assert actual == expected
+
+        ppt_to_records = reader.read_file_parallel_by_ppt(trace_filename,
+                                                          workers=2,
+                                                          chunk_size=4096)
+        ppt_name = 'factory.MAV_CMD_NAV_TAKEOFF:::ENTER'
+        assert ppt_to_records[ppt_name] == expected[0::2]
+
+
+@pytest.mark.parametrize('extension', ['.gz', '.bz2', '.xz'])
+def test_compressed_trace(extension):
+    decls_filename = os.path.join(DIR_EXAMPLES, 'ardu.decls')
+    decls = specminers.daikon.Declarations.load(decls_filename)
+
+    with tempfile.TemporaryDirectory() as dir_tmp:
+        plain_filename = os.path.join(dir_tmp, 'ardu.dtrace')
+        compressed_filename = plain_filename + extension
+        _write_example_trace(decls, plain_filename)
+        _write_example_trace(decls, compressed_filename)
+
+        with open(plain_filename, 'r') as fh:
+            expected_contents = fh.read()
+        open_file = specminers.daikon.compression.open_file
+        with open_file(compressed_filename) as fh:
+            assert fh.read() == expected_contents
+        assert os.path.getsize(compressed_filename) < len(expected_contents)
+
+        expected = list(
+            specminers.daikon.TraceFileReader(decls).read(plain_filename))
+        reader = specminers.daikon.TraceFileReader(decls)
+        assert list(reader.read(compressed_filename)) == expected
+        reader = specminers.daikon.BulkTraceFileReader(decls)
+        assert list(reader.read(compressed_filename)) == expected
+        with pytest.raises(ValueError):
+            list(specminers.daikon.TraceFileReader(decls).read(
+                compressed_filename,
+                ppt='factory.MAV_CMD_NAV_TAKEOFF:::ENTER'))
+
+
+def test_write_many():
+    decls_filename = os.path.join(DIR_EXAMPLES, 'ardu.decls')
+    decls = specminers.daikon.Declarations.load(decls_filename)
+    ppt = decls['factory.MAV_CMD_DO_PARACHUTE:::ENTER']
+    values = {name: 0.5 for name in ppt}
+    values.update(p_action=2, mode='AUTO', armable=True, armed=False,
+                  ekf_ok=True)
+
+    with io.StringIO() as output:
+        writer = specminers.daikon.TraceWriter(decls, output)
+        writer.write(ppt, **values)
+        writer.write(ppt.name, **values)
+        expected = output.getvalue()
+
+    lines = expected.split('\n')
+    assert lines[:7] == ['', ppt.name, 'this_invocation_nonce', '1',
+                         'p_action', '2', '0']
+    assert '\nmode\n"AUTO"\n0\n' in expected
+    assert '\narmed\nFalse\n0\n' in expected
+
+    with io.StringIO() as output:
+        writer = specminers.daikon.TraceWriter(decls, output,
+                                               buffer_size=1 << 20)
+        row = [values[name] for name in ppt]
+        writer.write_many(ppt, [values, row])
+        assert output.getvalue() == ''
+        writer.flush()
+        assert output.getvalue() == expected
+        with pytest.raises(ValueError):
+            writer.write_many(ppt, [row[1:]])
+
+
+def test_background_trace_writer():
+    decls_filename = os.path.join(DIR_EXAMPLES, 'ardu.decls')
+    decls = specminers.daikon.Declarations.load(decls_filename)
+    ppt = decls['factory.MAV_CMD_DO_PARACHUTE:::ENTER']
+    values = {name: 0.5 for name in ppt}
+
+    with io.StringIO() as output:
+        writer = specminers.daikon.TraceWriter(decls, output)
+        for _ in range(100):
+            writer.write(ppt, **values)
+        expected = output.getvalue()
+
+    with io.StringIO() as output:
+        writer = specminers.daikon.TraceWriter(decls, output)
+        background = specminers.daikon.BackgroundTraceWriter(
+            writer, max_queue_size=8)
+        with background:
+            for _ in range(100):
+                background.write(ppt.name, **values)
+        assert output.getvalue() == expected
+        assert background.queued == background.written == 100
+        assert background.dropped == 0
+
+    # stall the background thread so that the queue fills up
+    class StalledOutput(io.StringIO):
+        def __init__(self):
+            super().__init__()
+            self.started = threading.Event()
+            self.resume = threading.Event()
+
+        def write(self, text):
+            self.started.set()
+            self.resume.wait()
+            return super().write(text)
+
+    expected_actions = {
+        specminers.daikon.OverflowPolicy.drop_newest: [0, 1, 2, 3, 4],
+        specminers.daikon.OverflowPolicy.drop_oldest: [0, 6, 7, 8, 9],
+    }
+    for policy, expected in expected_actions.items():
+        with StalledOutput() as output:
+            writer = specminers.daikon.TraceWriter(decls, output)
+            background = specminers.daikon.BackgroundTraceWriter(
+                writer, 4, policy)
+            background.write(ppt, **dict(values, p_action=0))
+            output.started.wait()
+            for i in range(1, 10):
+                background.write(ppt, **dict(values, p_action=i))
+            output.resume.set()
+            background.close()
+            assert background.written == 5
+            assert background.dropped == 5
+
+            lines = output.getvalue().split('\n')
+            actions = [int(lines[i + 1]) for i, line in enumerate(lines)
+                       if line == 'p_action']
+            nonces = [int(lines[i + 1]) for i, line in enumerate(lines)
+                      if line == 'this_invocation_nonce']
+            assert actions == expected
+            assert nonces == [1, 2, 3, 4, 5]
+
+    # a record with missing values is rejected by the caller, and a record
+    # that cannot be written does not prevent later records from being written
+    other = decls['factory.MAV_CMD_NAV_LAND:::ENTER']
+    with io.StringIO() as output:
+        writer = specminers.daikon.TraceWriter(
+            specminers.daikon.Declarations([ppt]), output)
+        with specminers.daikon.BackgroundTraceWriter(writer) as background:
+            background.write(ppt, **values)
+            with pytest.raises(KeyError):
+                background.write(ppt, p_alt=1.0)
+            background.write(other, **{name: 0 for name in other})
+            background.write(ppt, **values)
+            with pytest.raises(RuntimeError):
+                background.flush()
+            background.write(ppt, **values)
+        assert (background.written, background.failed) == (3, 1)
+        assert output.getvalue().count('this_invocation_nonce') == 3
+
+        # errors do not replace the exception that leaves the context
+        background = specminers.daikon.BackgroundTraceWriter(writer)
+        with pytest.raises(ZeroDivisionError):
+            with background:
+                background.write(other, **{name: 0 for name in other})
+                background.write(ppt, **values)
+                1 / 0
+        assert (background.written, background.failed) == (1, 1)
+        assert output.getvalue().count('this_invocation_nonce') == 4
+
+
+def test_compact_trace_record():
+    decls_filename = os.path.join(DIR_EXAMPLES, 'ardu.decls')
+    decls = specminers.daikon.Declarations.load(decls_filename)
+
+    with contextlib.ExitStack() as stack:
+        _, trace_filename = tempfile.mkstemp()
+        stack.callback(os.remove, trace_filename)
+        _write_example_trace(decls, trace_filename)
+
+        expected = list(
+            specminers.daikon.TraceFileReader(decls).read(trace_filename))
+        reader = specminers.daikon.BulkTraceFileReader(decls)
+        records = list(reader.read_compact(trace_filename))
+        assert [r.to_record() for r in records] == expected
+
+        record = records[3]
+        assert record.ppt == expected[3].ppt
+        assert record.nonce == 2
+        assert record == expected[3]
+        assert list(record) == list(expected[3])
+        assert record['altitude'] == expected[3]['altitude']
+        assert record.value('altitude') == 0.03
+        assert record.value_at(record.plan.positions['mode']) == '"GUIDED"'
+        assert record.modified('altitude') == 0
+
+
+def test_binary_trace():
+    decls_filename = os.path.join(DIR_EXAMPLES, 'ardu.decls')
+    decls = specminers.daikon.Declarations.load(decls_filename)
+    trace = specminers.daikon.trace
+
+    with contextlib.ExitStack() as stack:
+        filenames = []
+        for _ in range(3):
+            _, filename = tempfile.mkstemp()
+            stack.callback(os.remove, filename)
+            filenames.append(filename)
+        text_filename, binary_filename, copy_filename = filenames
+        _write_example_trace(decls, text_filename)
+
+        num_records = trace.text_to_binary(decls, text_filename,
+                                           binary_filename)
+        assert num_records == 200
+        assert os.path.getsize(binary_filename) \
+            < os.path.getsize(text_filename)
+
+        reader = trace.TraceBinaryReader(binary_filename)
+        assert list(reader.declarations) == list(decls)
+        assert str(reader.declarations) == str(decls)
+        expected = list(
+            specminers.daikon.TraceFileReader(decls).read(text_filename))
+        assert list(reader.read()) == expected
+
+        trace.binary_to_text(binary_filename, copy_filename)
+        with open(text_filename) as f, open(copy_filename) as g:
+            assert f.read() == g.read()
+
+        # records that cannot be packed are stored verbatim
+        ppt = decls['factory.MAV_CMD_NAV_TAKEOFF:::ENTER']
+        values = ['nonsensical' if n == 'altitude' else '0' for n in ppt]
+        modified = ['2' if n == 'altitude' else '1' for n in ppt]
+        with trace.TraceBinaryWriter.for_file(decls,
+                                              binary_filename) as writer:
+            writer.add_raw(ppt, None, values, modified)
+            writer.add(expected[5])
+        records = list(trace.TraceBinaryReader(binary_filename).read_raw())
+        assert records[0] == (ppt, None, values, modified)
+        assert records[1][1] == expected[5].nonce
+
+
+def test_declarations_cache():
+    decls_filename = os.path.join(DIR_EXAMPLES, 'ardu.decls')
+    expected = specminers.daikon.Declarations.load(decls_filename)
+
+    with tempfile.TemporaryDirectory() as dir_cache:
+        cache = specminers.cache.DiskCache(dir_cache)
+        decls = specminers.daikon.Declarations.load(decls_filename,
+                                                    cache=cache)
+        assert len(cache) == 1
+        assert decls == expected
+
+        decls = specminers.daikon.Declarations.load(decls_filename,
+                                                    cache=cache)
+        assert len(cache) == 1
+        assert decls == expected
+        assert str(decls) == str(expected)
+
+        # least recently used entries are evicted first
+        cache = specminers.cache.DiskCache(dir_cache, max_size=10)
+        cache.clear()
+        cache.put('a', b'12345')
+        cache.put('b', b'12345')
+        os.utime(os.path.join(dir_cache, 'a'), (0, 0))
+        os.utime(os.path.join(dir_cache, 'b'), (1, 1))
+        assert cache.get('a') == b'12345'
+        cache.put('c', b'1')
+        assert 'a' in cache and 'c' in cache and 'b' not in cache
+        assert cache.size == 6
+
+
+def test_parse_decls_single_pass():
+    from specminers.daikon.declarations import DeclarationsLoader
+    from specminers.daikon.decl_parser import parse_declarations
+    filename = os.path.join(DIR_EXAMPLES, 'ardu.decls')
+    expected = DeclarationsLoader.from_file(filename)
+    declarations = specminers.daikon.Declarations.load(filename)
+    assert list(declarations) == list(expected)
+    assert declarations == expected
+
+    ppt = declarations['factory.MAV_CMD_NAV_TAKEOFF:::ENTER']
+    assert ppt.typ == specminers.daikon.PptType.enter
+    assert ppt['p_alt'].flags == ('not_ordered', 'nomod')
+    assert ppt['p_alt'].comparability == 22
+
+    contents = """decl-version 2.0
+# a comment
+ppt Foo.bar():::OBJECT
+ppt-type object
+variable this.x
+  var-kind field x
+  enclosing-var this
+  dec-type int
+  rep-type int
+  constant 5
+"""
+    declarations = parse_declarations(contents.split('\n'))
+    ppt = declarations['Foo.bar():::OBJECT']
+    assert ppt.typ == specminers.daikon.PptType.obj
+    assert list(ppt) == ['this.x']
+    assert ppt['this.x'].dec_type == 'int'
+    assert ppt['this.x'].flags == ()
+
+    with pytest.raises(ValueError):
+        parse_declarations(['ppt Foo:::ENTER', 'variable x', '  dec-type int'])
+
+
+def test_lazy_decls():
+    filename = os.path.join(DIR_EXAMPLES, 'ardu.decls')
+    expected = specminers.daikon.Declarations.load(filename)
+    declarations = specminers.daikon.Declarations.load(filename, lazy=True)
+
+    assert len(declarations) == len(expected)
+    assert list(declarations) == list(expected)
+    assert 'factory.MAV_CMD_NAV_LAND:::EXIT0' in declarations
+    assert 'factory.MAV_CMD_NAV_LAND:::EXIT1' not in declarations
+    assert declarations.num_parsed == 0
+
+    name = 'factory.MAV_CMD_NAV_TAKEOFF:::ENTER'
+    assert declarations[name] == expected[name]
+    assert declarations[name] is declarations[name]
+    assert declarations.num_parsed == 1
+    with pytest.raises(KeyError):
+        declarations['factory.MAV_CMD_NAV_LAND:::EXIT1']
+
+    # the source of each program point is available without parsing it
+    source = declarations.header + ''.join(map(declarations.source,
+                                               declarations))
+    assert source == str(declarations)
+    assert declarations.num_parsed == 1
+
+    with tempfile.TemporaryDirectory() as dir_tmp:
+        copy_filename = os.path.join(dir_tmp, 'copy.decls')
+        declarations.save(copy_filename)
+        with open(filename) as f, open(copy_filename) as g:
+            assert f.read() == g.read()
+        assert declarations.num_parsed == 1
+
+        # eagerly loaded declarations are saved in a form that can be reloaded
+        expected.save(copy_filename)
+        assert specminers.daikon.Declarations.load(copy_filename) == expected
+
+    assert declarations == expected
+
+
+def test_stream_invariants():
+    decls_filename = os.path.join(DIR_EXAMPLES, 'ardu.decls')
+    inv_filename = os.path.join(DIR_EXAMPLES, 'ardu.inv')
+    decls = specminers.daikon.Declarations.load(decls_filename)
+    reader = specminers.daikon.InvariantReader(decls)
+
+    stream = reader.read_file(inv_filename)
+    ppt, invariants = next(stream)
+    assert ppt.name == 'factory.MAV_CMD_DO_CHANGE_SPEED:::ENTER'
+    assert all(isinstance(i, specminers.daikon.Invariant) for i in invariants)
+    assert sum(1 for _ in stream) == 19
+
+    # simulate the output of a process, delivered in arbitrary chunks
+    with open(inv_filename, 'rb') as f:
+        contents = f.read().replace(b'\n', b'\r\n') + b'Exiting Daikon.\r\n'
+    chunks = [contents[i:i + 1000] for i in range(0, len(contents), 1000)]
+    lines = specminers.daikon.helpers.iter_lines(chunks)
+    invariants = specminers.daikon.InvariantMap.from_stream(
+        decls, reader.read_lines(lines))
+    assert len(invariants) == len(decls)
+    assert invariants.size == NUM_ARDU_INVARIANTS
+
+    lines = specminers.daikon.helpers.iter_lines([b'a\xc3', b'\xa9\nb'])
+    assert list(lines) == ['a\xe9', 'b']
+
+
+def test_intern_invariants():
+    decls_filename = os.path.join(DIR_EXAMPLES, 'ardu.decls')
+    inv_filename = os.path.join(DIR_EXAMPLES, 'ardu.inv')
+    decls = specminers.daikon.Declarations.load(decls_filename)
+    reader = specminers.daikon.InvariantReader(decls)
+    Invariant = specminers.daikon.Invariant
+
+    expected = specminers.daikon.InvariantMap.from_stream(
+        decls, reader.read_file(inv_filename))
+    table = specminers.daikon.InvariantTable()
+    actual = specminers.daikon.InvariantMap.from_stream(
+        decls, reader.read_file(inv_filename), table=table)
+    assert actual.size == expected.size
+    assert list(actual) == list(expected)
+    assert len(table) < actual.size
+    for name in expected:
+        assert actual[name] == expected[name]
+        assert list(actual[name]) == list(expected[name])
+
+    # maps that share a table share the texts of their invariants
+    num_texts = len(table)
+    other = expected.intern(table)
+    assert len(table) == num_texts
+    name = 'factory.MAV_CMD_DO_CHANGE_SPEED:::ENTER'
+    assert other[name].ids == actual[name].ids
+    assert other[name][0] == expected[name][0]
+    assert other[name][1:3] == expected[name][1:3]
+    assert expected[name][0] in other[name]
+    assert Invariant('not an invariant') not in other[name]
+    assert len(table) == num_texts
+
+
+def test_index_invariants():
+    decls_filename = os.path.join(DIR_EXAMPLES, 'ardu.decls')
+    inv_filename = os.path.join(DIR_EXAMPLES, 'ardu.inv')
+    decls = specminers.daikon.Declarations.load(decls_filename)
+    reader = specminers.daikon.InvariantReader(decls)
+    invariants = specminers.daikon.InvariantMap.from_stream(
+        decls, reader.read_file(inv_filename))
+    index = specminers.daikon.InvariantIndex(invariants, decls)
+    Kind = specminers.daikon.InvariantKind
+    assert len(index) == invariants.size
+
+    def scan(predicate):
+        return [(name, inv) for name, invs in invariants.items()
+                for inv in invs if predicate(inv.text)]
+
+    found = index.find('latitude')
+    assert found
+    assert found == scan(lambda t: 'latitude' in t.replace(
+        'orig(latitude)', '').replace('home_latitude', ''))
+    assert index.find('orig( altitude )') \
+        == scan(lambda t: 'orig(altitude)' in t)
+    assert index.count('altitude', include_orig=True) \
+        >= index.count('altitude')
+
+    both = index.find('latitude', 'longitude', kind='linear')
+    assert both
+    for name, invariant in both:
+        kind, variables = specminers.daikon.index.analyse_invariant(
+            invariant.text)
+        assert kind == Kind.linear
+        assert {'latitude', 'longitude'} <= set(variables)
+    assert index.find('latitude', 'unknown') == []
+    assert index.count(kind=Kind.one_of) \
+        == len(scan(lambda t: ' one of ' in t))
+
+    analyse = specminers.daikon.index.analyse_invariant
+    assert analyse('mode == "GUIDED"') == (Kind.eq, ('mode',))
+    assert analyse('x - 2 * orig(y) + 1 == 0') \
+        == (Kind.linear, ('x', 'orig(y)'))
+    assert analyse('-x < y') == (Kind.lt, ('x', 'y'))
+    assert analyse('p one of { 1, 2 }') == (Kind.one_of, ('p',))
+
+
+def test_diff_invariants():
+    Invariant = specminers.daikon.Invariant
+    old = {
+        'a:::ENTER': [Invariant('x >= 0'), Invariant('y one of { 1, 2 }'),
+                      Invariant('x != orig( y )'), Invariant('z == 1.50')],
+        'a:::EXIT0': [Invariant('x == 0')],
+        'b:::ENTER': [Invariant('p < q')]
+    }
+    new = {
+        'a:::ENTER': [Invariant('x >= 1'), Invariant('y one of {2, 1}'),
+                      Invariant('x  !=  orig(y)'), Invariant('z == 1.5'),
+                      Invariant('x < z')],
+        'a:::EXIT0': [Invariant('x == 0')],
+        'c:::ENTER': [Invariant('r > 0')]
+    }
+    diffs = list(specminers.daikon.diff_invariants(old, new))
+    assert [d.ppt for d in diffs] \
+        == ['a:::ENTER', 'a:::EXIT0', 'b:::ENTER', 'c:::ENTER']
+
+    diff = diffs[0]
+    assert diff.added == [Invariant('x < z')]
+    assert diff.removed == []
+    assert diff.changed == [(Invariant('x >= 0'), Invariant('x >= 1'))]
+    assert len(diff.unchanged) == 3
+    assert diffs[1].is_empty
+    assert diffs[2].removed == [Invariant('p < q')]
+    assert diffs[3].added == [Invariant('r > 0')]
+
+    diffs = specminers.daikon.diff_invariants(old, new,
+                                              include_unchanged=False)
+    assert [d.ppt for d in diffs] == ['a:::ENTER', 'b:::ENTER', 'c:::ENTER']
+
+
+def test_check_invariants():
+    pytest.importorskip('numpy')
+    from specminers.daikon.checker import InvariantChecker, compile_invariant
+    Invariant = specminers.daikon.Invariant
+
+    decls_filename = os.path.join(DIR_EXAMPLES, 'ardu.decls')
+    decls = specminers.daikon.Declarations.load(decls_filename)
+    enter = 'factory.MAV_CMD_NAV_TAKEOFF:::ENTER'
+    exit_ = 'factory.MAV_CMD_NAV_TAKEOFF:::EXIT0'
+    invariants = specminers.daikon.InvariantMap.build(decls, {
+        enter: [Invariant('altitude >= 0'),
+                Invariant('altitude < 1'),
+                Invariant('mode == "GUIDED"'),
+                Invariant('100 * altitude - -1 * 11.89013788794762'
+                          ' - p_alt == 0'),
+                Invariant('p_current one of { 1, 2 }'),
+                Invariant('unknown > 0')],
+        exit_: [Invariant('altitude > orig(altitude)'),
+                Invariant('p_alt - orig(p_alt) == 1'),
+                Invariant('altitude == orig(altitude)')]
+    })
+    checker = InvariantChecker(decls, invariants)
+    assert checker.num_skipped == 2
+    assert len(checker.compiled(enter)) == 4
+
+    with contextlib.ExitStack() as stack:
+        _, trace_filename = tempfile.mkstemp()
+        stack.callback(os.remove, trace_filename)
+        _write_example_trace(decls, trace_filename)
+        results = checker.check_files([trace_filename])
+
+    # altitude is 0.01 * i, where ENTER records have an even i
+    result = results[enter]
+    assert result.counts == {Invariant('altitude < 1'): 50}
+    rows = result.violations[Invariant('altitude < 1')]
+    assert list(result.nonces[rows]) == list(range(51, 101))
+    assert result.num_checked[Invariant('altitude >= 0')] == 100
+
+    result = results[exit_]
+    assert result.counts == {Invariant('altitude == orig(altitude)'): 100}
+    assert len(result.violating_records()) == 100
+
+    compiled = compile_invariant(Invariant('-a - b - -c * 2 == 0'))
+    assert compiled.variables == frozenset(['a', 'b', 'c'])
+    assert compiled.orig_variables == frozenset()
+    with pytest.raises(ValueError):
+        compile_invariant(Invariant('a one of { 1, 2 }'))
+
+
+def test_monitor_invariants():
+    from specminers.daikon.monitor import InvariantMonitor
+    Invariant = specminers.daikon.Invariant
+
+    decls_filename = os.path.join(DIR_EXAMPLES, 'ardu.decls')
+    decls = specminers.daikon.Declarations.load(decls_filename)
+    enter = 'factory.MAV_CMD_NAV_TAKEOFF:::ENTER'
+    exit_ = 'factory.MAV_CMD_NAV_TAKEOFF:::EXIT0'
+    invariants = specminers.daikon.InvariantMap.build(decls, {
+        enter: [Invariant('altitude >= 0'),
+                Invariant('altitude < 1'),
+                Invariant('mode == "GUIDED"'),
+                Invariant('100 * altitude - -1 * 11.89013788794762'
+                          ' - p_alt == 0'),
+                Invariant('p_current one of { 1, 2 }'),
+                Invariant('unknown > 0')],
+        exit_: [Invariant('altitude > orig(altitude)'),
+                Invariant('p_alt - orig(p_alt) == 1'),
+                Invariant('altitude == orig(altitude)')]
+    })
+    violations = []
+    monitor = InvariantMonitor(decls, invariants, violations.append)
+    assert monitor.num_skipped_invariants == 2
+
+    with contextlib.ExitStack() as stack:
+        _, trace_filename = tempfile.mkstemp()
+        stack.callback(os.remove, trace_filename)
+        writer = stack.enter_context(
+            specminers.daikon.TraceWriter.for_file(decls, trace_filename))
+        monitor.attach(writer)
+        land = decls['factory.MAV_CMD_NAV_LAND:::ENTER']
+        writer.write(land, **{name: 0 for name in land})
+        _write_example_records(decls, writer)
+
+    # altitude is 0.01 * i, where ENTER records have an even i
+    assert monitor.num_checked == 200
+    assert monitor.num_skipped == 1
+    assert monitor.num_violations == 150
+    entry_violations = [v for v in violations if v.ppt.name == enter]
+    assert len(entry_violations) == 50
+    assert all(v.invariants == (Invariant('altitude < 1'),)
+               for v in entry_violations)
+    exit_violations = [v for v in violations if v.ppt.name == exit_]
+    assert all(v.invariants == (Invariant('altitude == orig(altitude)'),)
+               for v in exit_violations)
+
+    # records are checked directly without an entry record
+    violated = monitor.check(exit_, 1000, {'altitude': 1.0, 'p_alt': 0.0})
+    assert violated == []
+    violated = monitor.check(enter, 3, {'altitude': float('nan'),
+                                        'p_alt': 0.0,
+                                        'mode': '"LAND"'})
+    assert violated == [Invariant('mode == "GUIDED"')]
+
+    # strings that are not used by any invariant may be omitted
+    monitor.observe(decls[exit_], 1001, {'altitude': 1.0, 'p_alt': 0.0})
+
+
+def test_cached_is_installed(monkeypatch):
+    import specminers.docker_tool
+    calls = []
+
+    class FakeImages:
+        def get(self, name):
+            calls.append(name)
+
+    class FakeClient:
+        images = FakeImages()
+
+        def close(self):
+            pass
+
+    monkeypatch.setattr(specminers.docker_tool, '_INSTALLED_IMAGES', set())
+    monkeypatch.setattr(specminers.docker_tool.docker, 'from_env', FakeClient)
+    assert specminers.Daikon.is_installed()
+    assert specminers.Daikon.is_installed()
+    assert len(calls) == 1
+    assert specminers.Daikon.is_installed(refresh=True)
+    assert len(calls) == 2
+
+
+def test_container_pool(fake_daemon):
+    _, filename = tempfile.mkstemp(suffix='.decls')
+    pool = specminers.ContainerPool(fake_daemon, 'image', size=1,
+                                    idle_timeout=None)
+    with contextlib.ExitStack() as stack:
+        stack.callback(os.remove, filename)
+        stack.enter_context(pool)
+
+        with pool.job([filename]) as job:
+            assert job.filenames[0].startswith(job.directory + '/')
+            assert job.shell.check_output(f'cat {job.filenames[0]}') == ''
+            host_directory = job.container.host_path(job.directory)
+            assert os.path.isdir(host_directory)
+        assert not os.path.exists(host_directory)
+
+        # the container is reused by subsequent jobs
+        with pool.job([filename]) as job:
+            container = job.container
+        assert pool.num_provisioned == 1
+        assert pool.num_reused == 1
+
+        # failed commands do not cause the container to be discarded
+        with pytest.raises(dockerblade.CalledProcessError):
+            with pool.job([filename]) as job:
+                job.shell.check_call('false')
+        assert pool.num_idle == 1
+        assert not container.removed
+
+        # other errors do
+        with pytest.raises(KeyError):
+            with pool.job([filename]) as job:
+                raise KeyError
+        assert container.removed
+        assert pool.num_idle == 0
+
+        # unhealthy containers are replaced
+        pool.warm()
+        assert pool.num_provisioned == 2
+        fake_daemon.live_containers[0].healthy = False
+        with pool.job([filename]) as job:
+            assert job.container.healthy
+        assert pool.num_unhealthy == 1
+        assert pool.num_provisioned == 3
+
+        # containers that are idle for too long are destroyed
+        pool.idle_timeout = 0.0
+        pool.release(pool.acquire())
+        assert pool.num_idle == 0
+
+    assert fake_daemon.live_containers == []
+    assert not os.path.exists(pool.workspace)
+    with pytest.raises(RuntimeError):
+        pool.acquire()
+
+
+def test_daikon_with_pool(fake_daemon, monkeypatch):
+    monkeypatch.setattr(specminers.Daikon, 'is_installed',
+                        classmethod(lambda cls: True))
+    decls_filename = os.path.join(DIR_EXAMPLES, 'ardu.decls')
+    decls = specminers.daikon.Declarations.load(decls_filename)
+    with specminers.ContainerPool(fake_daemon, 'specminers/daikon') as pool:
+        daikon = specminers.Daikon(client=fake_daemon, pool=pool)
+        for _ in range(3):
+            output = daikon(decls_filename)
+            assert output.startswith('=' * 75)
+        invariants = specminers.daikon.InvariantMap.from_stream(
+            decls, daikon.invariants(decls, decls_filename))
+        assert invariants.size == NUM_ARDU_INVARIANTS
+        assert pool.num_provisioned == 1
+
+    # without a pool, each job is given a fresh container
+    daikon = specminers.Daikon(client=fake_daemon)
+    daikon(decls_filename)
+    daikon(decls_filename)
+    assert len(fake_daemon.containers) == 3
+    assert fake_daemon.live_containers == []
+
+
+def test_daikon_local_backend(tmp_path, monkeypatch):
+    from conftest import write_stub_java
+    java = write_stub_java(str(tmp_path))
+    log_filename = str(tmp_path / 'java.log')
+    monkeypatch.setenv('STUB_JAVA_LOG', log_filename)
+    monkeypatch.delenv('DAIKONDIR', raising=False)
+    monkeypatch.delenv('CLASSPATH', raising=False)
+    decls_filename = os.path.join(DIR_EXAMPLES, 'ardu.decls')
+    decls = specminers.daikon.Declarations.load(decls_filename)
+
+    daikon = specminers.Daikon(backend='local', java=java,
+                               classpath='/opt/daikon.jar',
+                               jvm_flags=['-Xmx1g'])
+    assert daikon.selected_backend == 'local'
+    output = daikon(decls_filename)
+    assert output.startswith('=' * 75)
+    invariants = specminers.daikon.InvariantMap.from_stream(
+        decls, daikon.invariants(decls, decls_filename))
+    assert invariants.size == NUM_ARDU_INVARIANTS
+    with open(log_filename) as f:
+        calls = f.read().splitlines()
+    assert calls[0].startswith('-Xmx1g -cp /opt/daikon.jar daikon.Daikon ')
+    assert calls[0].endswith(f' {decls_filename}')
+    assert calls[1].startswith(
+        '-Xmx1g -cp /opt/daikon.jar daikon.PrintInvariants ')
+
+    # the backend is selected automatically only if requested
+    assert specminers.Daikon(java=java,
+                             backend='auto').selected_backend == 'docker'
+    daikon_dir = tmp_path / 'daikon'
+    daikon_dir.mkdir()
+    (daikon_dir / 'daikon.jar').touch()
+    monkeypatch.setenv('DAIKONDIR', str(daikon_dir))
+    assert specminers.Daikon(java=java,
+                             backend='auto').selected_backend == 'local'
+    assert specminers.Daikon(java=str(tmp_path / 'missing'),
+                             backend='auto').selected_backend == 'docker'
+    assert specminers.Daikon(java=java).selected_backend == 'docker'
+
+    with pytest.raises(RuntimeError):
+        specminers.Daikon(backend='local',
+                          java=str(tmp_path / 'missing'))(decls_filename)
+    with pytest.raises(ValueError):
+        specminers.Daikon(backend='remote')
+
+    # failures are reported as they are for containers
+    monkeypatch.setenv('STUB_JAVA_FAIL', 'daikon.PrintInvariants')
+    with pytest.raises(dockerblade.CalledProcessError):
+        daikon = specminers.Daikon(backend='local', java=java)
+        list(daikon.stream(decls_filename))
+
+
+def test_mine_parallel(tmp_path):
+    from conftest import write_stub_java
+    from specminers.daikon.sharding import assign_shards, group_program_points
+    decls_filename = os.path.join(DIR_EXAMPLES, 'ardu.decls')
+    decls = specminers.daikon.Declarations.load(decls_filename)
+    trace_filename = str(tmp_path / 'trace.dtrace')
+    methods = ['factory.MAV_CMD_NAV_TAKEOFF', 'factory.MAV_CMD_NAV_LAND',
+               'factory.MAV_CMD_NAV_WAYPOINT']
+    with specminers.daikon.TraceWriter.for_file(decls,
+                                                trace_filename) as writer:
+        for i in range(30):
+            for suffix in (':::ENTER', ':::EXIT0'):
+                ppt = decls[methods[i % len(methods)] + suffix]
+                writer.write(ppt, **{name: i for name in ppt})
+
+    groups = group_program_points(decls)
+    assert len(groups) == len(decls) // 2
+    assert all(len({name.partition(':::')[0] for name in g}) == 1
+               for g in groups)
+    assert assign_shards([['a:::ENTER'], ['b:::ENTER', 'b:::EXIT0'],
+                          ['c:::ENTER']],
+                         {'b:::ENTER': 10, 'c:::ENTER': 5}, num_shards=2) \
+        == [['b:::ENTER', 'b:::EXIT0'], ['c:::ENTER', 'a:::ENTER']]
+
+    daikon = specminers.Daikon(backend='local',
+                               java=write_stub_java(str(tmp_path)))
+    expected = specminers.daikon.InvariantMap.from_stream(
+        decls, daikon.invariants(decls, decls_filename, trace_filename))
+    actual = daikon.mine_parallel(decls_filename, trace_filename,
+                                  workers=2, num_shards=3)
+    assert list(actual) == list(expected)
+    assert actual.size == expected.size > 0
+    for name in expected:
+        assert list(actual[name]) == list(expected[name])
+
+
+def test_daikon_result_cache(tmp_path, fake_daemon, monkeypatch):
+    from conftest import write_stub_java
+    java = write_stub_java(str(tmp_path))
+    log_filename = str(tmp_path / 'java.log')
+    monkeypatch.setenv('STUB_JAVA_LOG', log_filename)
+    decls_filename = os.path.join(DIR_EXAMPLES, 'ardu.decls')
+    cache = specminers.cache.DiskCache(str(tmp_path / 'cache'))
+
+    def num_calls():
+        if not os.path.exists(log_filename):
+            return 0
+        with open(log_filename) as f:
+            return len(f.read().splitlines())
+
+    daikon = specminers.Daikon(backend='local', java=java, cache=cache)
+    output = daikon(decls_filename)
+    assert num_calls() == 2
+    assert (cache.hits, cache.misses) == (0, 1)
+    assert len(cache) == 2
+    assert daikon(decls_filename) == output
+    assert list(daikon.stream(decls_filename)) == output.splitlines()
+    assert num_calls() == 2
+    assert (cache.hits, cache.misses) == (2, 1)
+
+    # the serialized invariants are cached alongside the output
+    serialized = str(tmp_path / 'mined.inv.gz')
+    daikon.serialize(serialized, decls_filename)
+    assert num_calls() == 2
+    with open(serialized) as f:
+        assert f.read() + 'Exiting Daikon.\n' == output
+
+    # results depend on the contents of the inputs and the options
+    copy_filename = str(tmp_path / 'copy.decls')
+    with open(decls_filename) as f, open(copy_filename, 'w') as g:
+        g.write(f.read())
+    daikon(copy_filename)
+    assert num_calls() == 2
+    with open(copy_filename, 'a') as f:
+        f.write('\n')
+    assert list(daikon.stream(copy_filename)) == output.splitlines()
+    assert num_calls() == 4
+    specminers.Daikon(backend='local', java=java, cache=cache,
+                      jvm_flags=['-Xmx1g'])(decls_filename)
+    assert num_calls() == 6
+    assert len(cache) == 6
+
+    # a hit does not consult Docker, and failed runs are not cached
+    monkeypatch.setattr(specminers.Daikon, 'is_installed',
+                        classmethod(lambda cls: True))
+    with specminers.ContainerPool(fake_daemon, 'specminers/daikon') as pool:
+        daikon = specminers.Daikon(client=fake_daemon, pool=pool,
+                                   backend='docker', cache=cache)
+        monkeypatch.setenv('STUB_JAVA_FAIL', 'daikon.PrintInvariants')
+        with pytest.raises(dockerblade.CalledProcessError):
+            list(daikon.stream(decls_filename))
+        monkeypatch.delenv('STUB_JAVA_FAIL')
+        assert daikon(decls_filename) == output
+        assert daikon(decls_filename) == output
+        assert len(fake_daemon.containers) == 1
+        daikon.serialize(serialized, copy_filename)
+        assert len(fake_daemon.containers) == 1
+
+    # entries are evicted once the cache is full
+    small = specminers.cache.DiskCache(str(tmp_path / 'cache'),
+                                       max_size=len(output) * 3)
+    small.evict()
+    assert small.size <= len(output) * 3
+
+
+def test_daikon_trace_session(tmp_path, fake_daemon, monkeypatch):
+    from conftest import write_stub_java
+    monkeypatch.setattr(specminers.Daikon, 'is_installed',
+                        classmethod(lambda cls: True))
+    decls_filename = os.path.join(DIR_EXAMPLES, 'ardu.decls')
+    decls = specminers.daikon.Declarations.load(decls_filename)
+    trace_filename = str(tmp_path / 'trace.dtrace')
+    with specminers.daikon.TraceWriter.for_file(decls,
+                                                trace_filename) as writer:
+        _write_example_records(decls, writer, 20)
+    local = specminers.Daikon(backend='local',
+                              java=write_stub_java(str(tmp_path)))
+    expected = specminers.daikon.InvariantMap.from_stream(
+        decls, local.invariants(decls, decls_filename, trace_filename))
+    assert [name for name in expected if expected[name]] \
+        == ['factory.MAV_CMD_NAV_TAKEOFF:::ENTER',
+            'factory.MAV_CMD_NAV_TAKEOFF:::EXIT0']
+
+    with specminers.ContainerPool(fake_daemon, 'specminers/daikon') as pool:
+        for daikon in [local,
+                       specminers.Daikon(client=fake_daemon, backend='docker'),
+                       specminers.Daikon(client=fake_daemon, pool=pool,
+                                         backend='docker')]:
+            with daikon.session(decls, buffer_size=64) as session:
+                _write_example_records(decls, session.writer, 20)
+                with pytest.raises(RuntimeError):
+                    session.invariants
+            actual = session.invariants
+            assert list(actual) == list(expected)
+            assert actual.size == expected.size
+            assert session.close() is actual
+        assert pool.num_provisioned == 1
+    assert any(' - ' in command or command.endswith(' -')
+               for command in fake_daemon.commands)
+
+    # an exception stops Daikon and destroys its container
+    daikon = specminers.Daikon(client=fake_daemon, backend='docker')
+    with pytest.raises(KeyError):
+        with daikon.session(decls) as session:
+            session.writer.write(
+                decls['factory.MAV_CMD_DO_CHANGE_SPEED:::ENTER'])
+            raise KeyError
+    with pytest.raises(RuntimeError):
+        session.close()
+    assert fake_daemon.live_containers == []
+
+    # failures are reported when the session is closed
+    monkeypatch.setenv('STUB_JAVA_FAIL', 'daikon.Daikon')
+    session = local.session(decls)
+    with pytest.raises(dockerblade.CalledProcessError):
+        session.close()
+
+
+def test_daikon_single_jvm(tmp_path, monkeypatch):
+    from conftest import write_stub_java
+    java = write_stub_java(str(tmp_path))
+    log_filename = str(tmp_path / 'java.log')
+    monkeypatch.setenv('STUB_JAVA_LOG', log_filename)
+    decls_filename = os.path.join(DIR_EXAMPLES, 'ardu.decls')
+    decls = specminers.daikon.Declarations.load(decls_filename)
+
+    def calls():
+        with open(log_filename) as f:
+            return [line.split()[0] for line in f.read().splitlines()]
+
+    local = specminers.Daikon(backend='local', java=java)
+    expected = specminers.daikon.InvariantMap.from_stream(
+        decls, local.invariants(decls, decls_filename))
+    assert calls() == ['daikon.Daikon', 'daikon.PrintInvariants']
+
+    daikon = specminers.Daikon(backend='local', java=java, single_jvm=True)
+    actual = specminers.daikon.InvariantMap.from_stream(
+        decls, daikon.invariants(decls, decls_filename))
+    assert calls()[2:] == ['daikon.Daikon']
+    assert list(actual) == list(expected)
+    assert actual.size == expected.size
+
+    # the serialized invariants are kept and can be used without re-mining
+    output, serialized = specminers.Daikon(backend='local', java=java).mine(
+        str(tmp_path / 'mined.inv.gz'), decls_filename)
+    assert calls()[3:] == ['daikon.Daikon']
+    assert output.startswith('Processing trace data')
+    assert serialized.filename == str(tmp_path / 'mined.inv.gz')
+    assert serialized.invariants(decls).size == expected.size
+    name = 'factory.MAV_CMD_DO_CHANGE_SPEED:::ENTER'
+    text = serialized.text(ppt_select_pattern='CHANGE_SPEED:::ENTER')
+    assert text.splitlines() == ['=' * 75, name] \
+        + [str(inv) for inv in expected[name]] + ['Exiting Daikon.']
+    merged = serialized.merge(str(tmp_path / 'merged.inv.gz'), serialized)
+    assert merged.invariants(decls).size == expected.size
+    assert calls()[4:] == ['daikon.PrintInvariants'] * 2 \
+        + ['daikon.MergeInvariants', 'daikon.PrintInvariants']
+
+    # results of a single JVM are cached separately
+    cache = specminers.cache.DiskCache(str(tmp_path / 'cache'))
+    daikon = specminers.Daikon(backend='local', java=java, cache=cache)
+    for _ in range(2):
+        output_, _ = daikon.mine(str(tmp_path / 'cached.inv.gz'),
+                                 decls_filename)
+        assert output_ == output
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert daikon(decls_filename) != output
+    assert calls()[8:] \
+        == ['daikon.Daikon', 'daikon.Daikon', 'daikon.PrintInvariants']
+
+
+def test_async_daikon(tmp_path, fake_daemon, monkeypatch):
+    import asyncio
+    from conftest import write_stub_java
+    monkeypatch.setattr(specminers.Daikon, 'is_installed',
+                        classmethod(lambda cls: True))
+    decls_filename = os.path.join(DIR_EXAMPLES, 'ardu.decls')
+    decls = specminers.daikon.Declarations.load(decls_filename)
+    docker = specminers.Daikon(client=fake_daemon, backend='docker')
+    expected = docker(decls_filename)
+
+    # track the number of containers that are in use at once
+    peak = [0]
+    provision = fake_daemon.provision
+
+    def tracked_provision(*args, **kwargs):
+        container = provision(*args, **kwargs)
+        peak[0] = max(peak[0], len(fake_daemon.live_containers))
+        return container
+    monkeypatch.setattr(fake_daemon, 'provision', tracked_provision)
+
+    def run(coroutine):
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(coroutine)
+        finally:
+            loop.close()
+
+    async def main(daikon):
+        async with daikon:
+            # the event loop is not blocked while jobs run
+            ticks = [0]
+
+            async def tick():
+                while True:
+                    await asyncio.sleep(0.01)
+                    ticks[0] += 1
+            ticker = asyncio.ensure_future(tick())
+            outputs = await asyncio.gather(
+                *[daikon(decls_filename) for _ in range(5)])
+            lines = [line async for line in daikon.stream(decls_filename)]
+            invariants = await daikon.invariants(decls, decls_filename)
+            ticker.cancel()
+            assert ticks[0] > 10
+            return outputs, lines, invariants
+
+    monkeypatch.setenv('STUB_JAVA_DELAY', '0.1')
+    daikon = specminers.AsyncDaikon(docker, max_concurrency=2)
+    outputs, lines, invariants = run(main(daikon))
+    assert outputs == [expected] * 5
+    assert lines == expected.splitlines()
+    assert invariants.size == NUM_ARDU_INVARIANTS
+    assert peak[0] == 2
+    assert fake_daemon.live_containers == []
+
+    # timeouts and cancellation stop Daikon and destroy its container
+    monkeypatch.setenv('STUB_JAVA_DELAY', '30')
+
+    async def cancel(daikon):
+        async with daikon:
+            task = asyncio.ensure_future(daikon(decls_filename))
+            await asyncio.sleep(0.2)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            with pytest.raises(asyncio.TimeoutError):
+                await daikon(decls_filename, timeout=0.2)
+            stream = daikon.stream(decls_filename)
+            with pytest.raises(asyncio.TimeoutError):
+                async for _ in stream:
+                    pass
+
+    num_containers = len(fake_daemon.containers)
+    started_at = time.monotonic()
+    run(cancel(specminers.AsyncDaikon(docker, timeout=0.2)))
+    assert time.monotonic() - started_at < 10
+    assert len(fake_daemon.containers) == num_containers + 3
+    assert fake_daemon.live_containers == []
+    assert all(p.poll() is not None
+               for c in fake_daemon.containers for p in c.processes)
+
+    with specminers.ContainerPool(fake_daemon, 'specminers/daikon') as pool:
+        daikon = specminers.Daikon(client=fake_daemon, backend='docker',
+                                   pool=pool)
+        run(cancel(specminers.AsyncDaikon(daikon, timeout=0.2)))
+        assert pool.num_idle == 0
+    assert fake_daemon.live_containers == []
+
+    java = write_stub_java(str(tmp_path))
+    local = specminers.Daikon(backend='local', java=java)
+    run(cancel(specminers.AsyncDaikon(local, timeout=0.2)))
+    assert time.monotonic() - started_at < 20
+
+    # failures are reported
+    monkeypatch.setenv('STUB_JAVA_DELAY', '0')
+    monkeypatch.setenv('STUB_JAVA_FAIL', 'daikon.Daikon')
+    with pytest.raises(dockerblade.CalledProcessError):
+        run(specminers.AsyncDaikon(local)(decls_filename))